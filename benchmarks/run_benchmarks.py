@@ -0,0 +1,302 @@
+"""
+Benchmark suite of the Letterboxd-list-scraper. All benchmarks run offline, against the saved HTML fixtures in
+'benchmarks/fixtures' and a local stub HTTP server, and the results are written out as JSON so they can be compared across releases.
+
+Benchmarks:
+    film_parse:     Parse time per film (film page, stats and rating histogram) for every extractor backend.
+    scrape_page:    Throughput of 'scrape_page()' in films per second, for a varying amount of film threads.
+    end_to_end:     Wall time of a complete ScrapeInstance run for 1, 10 and 100 lists, and for a single list with 20 pages
+                    (with all columns and list-only, which makes no film requests).
+    uneven_lists:   Wall time of a complete ScrapeInstance run for one large list and three small lists, which depends on the global film scheduler.
+    startup:        Wall time of starting the CLI for '--version', '--help' and an invalid list URL, and the heavy modules that are loaded.
+    writers:        Time and peak memory of writing 10k films to every output format (Parquet and Arrow only if 'pyarrow' is installed).
+    film_memory:    Memory of keeping 100k scraped films in memory (as in the memo), as dicts and as compact FilmRecords.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output results.json] [--quick] [--latency 0.01]
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import StubServer, StubTransport, read_fixture
+from listscraper.scrape_functions import EXTRACTORS, scrape_page, parse_film_data, build_film_dict
+from listscraper.writer_class import WRITERS, ColumnarWriter, open_writer
+from listscraper.record_class import FilmRecord
+import listscraper.instance_class
+import listscraper.transport_class
+import importlib.util
+import contextlib
+import statistics
+import functools
+import tracemalloc
+import platform
+import argparse
+import datetime
+import tempfile
+import subprocess
+import json
+import time
+import io
+
+def median_time(function, repeat):
+    """
+    Runs a function 'repeat' times and returns the median duration in seconds.
+    """
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return statistics.median(durations)
+
+def bench_film_parse(repeat):
+    """
+    Measures the parse time per film of every extractor backend.
+    """
+
+    contents = {"film": read_fixture("film.html"), "stats": read_fixture("stats.html"), "histogram": read_fixture("histogram.html")}
+
+    results = []
+    for parser in EXTRACTORS:
+        seconds = median_time(lambda: parse_film_data(contents, None, None, None, parser), repeat)
+        results.append({"name": "film_parse", "params": {"parser": parser}, "seconds_per_film": seconds})
+
+    return results
+
+def bench_scrape_page(server, worker_counts, repeat):
+    """
+    Measures the throughput of 'scrape_page()' on a full list page for a varying amount of film threads.
+    """
+
+    url = server.list_url(0)
+
+    results = []
+    for workers in worker_counts:
+        transport = server.transport(workers)
+        page_films = []
+        seconds = median_time(lambda: page_films.extend(scrape_page(transport, url, url, ".csv", "list", True, False, workers)[0]), repeat)
+        transport.close()
+
+        films = len(page_films) // repeat
+        results.append({"name": "scrape_page", "params": {"film_threads": workers, "latency": server.latency},
+                        "seconds": seconds, "films": films, "films_per_second": films / seconds})
+
+    return results
+
+def bench_end_to_end(server, list_counts, threads, film_threads, list_only=False):
+    """
+    Measures the wall time of a complete ScrapeInstance run (scraping and writing out) for a varying amount of lists.
+    """
+
+    # All requests of the scrape instance go to the stub server
+    listscraper.transport_class.Transport = functools.partial(StubTransport, server.url)
+
+    results = []
+    for count in list_counts:
+        with tempfile.TemporaryDirectory() as output_path, contextlib.redirect_stdout(io.StringIO()):
+            urls = [server.list_url(k) for k in range(count)]
+            requests_before = server.requests
+
+            start = time.perf_counter()
+            listscraper.instance_class.ScrapeInstance(urls, "*", None, output_path, ".csv", None, False, True, threads, film_threads, no_cache=True, list_only=list_only)
+            seconds = time.perf_counter() - start
+
+        results.append({"name": "end_to_end", "params": {"lists": count, "films_per_list": server.films_per_list, "threads": threads,
+                                                          "film_threads": film_threads, "list_only": list_only, "latency": server.latency},
+                        "seconds": seconds, "requests": server.requests - requests_before})
+
+    return results
+
+def bench_uneven_lists(server, large, small, threads, film_threads):
+    """
+    Measures the wall time of a complete ScrapeInstance run for one large list and three small lists.
+    """
+
+    # All requests of the scrape instance go to the stub server
+    listscraper.transport_class.Transport = functools.partial(StubTransport, server.url)
+
+    server.list_sizes = {0: large}
+    server.films_per_list = small
+
+    with tempfile.TemporaryDirectory() as output_path, contextlib.redirect_stdout(io.StringIO()):
+        urls = [server.list_url(k) for k in range(4)]
+        requests_before = server.requests
+
+        start = time.perf_counter()
+        listscraper.instance_class.ScrapeInstance(urls, "*", None, output_path, ".csv", None, False, True, threads, film_threads, no_cache=True)
+        seconds = time.perf_counter() - start
+
+    server.list_sizes = {}
+    return [{"name": "uneven_lists", "params": {"large_list": large, "small_lists": small, "threads": threads,
+                                                 "film_threads": film_threads, "latency": server.latency},
+             "seconds": seconds, "requests": server.requests - requests_before}]
+
+def bench_writers(rows):
+    """
+    Measures the time and peak memory of streaming films to every output format, page by page.
+    """
+
+    meta, stats, _, _ = parse_film_data({"film": read_fixture("film.html"), "stats": read_fixture("stats.html"),
+                                         "histogram": read_fixture("histogram.html")}, None, None, None)
+
+    results = []
+    for extension in WRITERS:
+        if issubclass(WRITERS[extension], ColumnarWriter) and importlib.util.find_spec("pyarrow") is None:
+            continue
+
+        not_found = float("nan") if extension == ".csv" else None
+        record = FilmRecord(meta, stats)
+        films = [build_film_dict({}, f"https://letterboxd.com/film/film-{i}/", record, not_found) for i in range(rows)]
+
+        def write(path):
+            writer = open_writer(path, extension)
+            for start in range(0, rows, 72):
+                writer.write(films[start:start + 72])
+            writer.close()
+
+        with tempfile.TemporaryDirectory() as output_path:
+            path = os.path.join(output_path, "films" + extension)
+            seconds = median_time(lambda: write(path), 3)
+
+            # Memory is measured in a separate run, as tracing slows down the writer
+            tracemalloc.start()
+            write(path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            size = os.path.getsize(path)
+
+        results.append({"name": "writers", "params": {"format": extension, "rows": rows},
+                        "seconds": seconds, "peak_memory_bytes": peak, "file_bytes": size})
+
+    return results
+
+def bench_film_memory(count):
+    """
+    Measures the memory of keeping scraped films in memory, as the memo does for every film of a run: as the dicts that
+    the parser returns and as compact FilmRecords. Every film gets its own copies of all strings, like a freshly parsed film.
+    """
+
+    meta, stats, _, _ = parse_film_data({"film": read_fixture("film.html"), "stats": read_fixture("stats.html"),
+                                         "histogram": read_fixture("histogram.html")}, None, None, None)
+
+    def copy(value):
+        if isinstance(value, str):
+            return (" " + value)[1:]
+        if isinstance(value, list):
+            return [copy(item) for item in value]
+        return value
+
+    def parsed_film(i):
+        film_meta = {column: copy(value) for column, value in meta.items()}
+        film_meta["Film_title"] = f"Film {i}"
+        film_stats = {column: value + i for column, value in stats.items()}
+        return film_meta, film_stats
+
+    results = []
+    for name, build in {"dict": lambda i: parsed_film(i), "record": lambda i: FilmRecord(*parsed_film(i))}.items():
+        tracemalloc.start()
+        films = [build(i) for i in range(count)]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del films
+
+        results.append({"name": "film_memory", "params": {"representation": name, "films": count},
+                        "memory_bytes": memory, "bytes_per_film": memory / count})
+
+    return results
+
+# Modules that should only be loaded once scraping starts
+HEAVY_MODULES = ["bs4", "lxml", "tqdm", "requests", "urllib3", "numpy", "aiohttp", "pyarrow", "sqlite3", "asyncio"]
+
+def bench_startup(repeat):
+    """
+    Measures the wall time of starting the CLI in a new interpreter, for commands that exit before any scraping:
+    '--version', '--help' and an invalid list URL (input validation fails). The time of an empty interpreter is the baseline.
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    commands = {
+        "python": [sys.executable, "-c", "pass"],
+        "version": [sys.executable, "-m", "listscraper", "--version"],
+        "help": [sys.executable, "-m", "listscraper", "--help"],
+        "invalid_url": [sys.executable, "-m", "listscraper", "https://letterboxd.com/"],
+    }
+
+    results = []
+    for name, command in commands.items():
+        seconds = median_time(lambda: subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL), repeat)
+        results.append({"name": "startup", "params": {"command": name}, "seconds": seconds})
+
+    # Check which heavy modules are loaded when the input validation fails
+    check = ("import sys, io, contextlib\n"
+             "sys.argv = ['listscraper', 'https://letterboxd.com/']\n"
+             "from listscraper.__main__ import main\n"
+             "try:\n"
+             "    with contextlib.redirect_stdout(io.StringIO()): main()\n"
+             "except SystemExit:\n"
+             "    pass\n"
+             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", check], env=env, capture_output=True, text=True).stdout.strip()
+    results[-1]["heavy_modules_loaded"] = loaded.split(",") if loaded else []
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the benchmark suite of the Letterboxd-list-scraper and outputs the results as JSON.")
+    parser.add_argument("--output", type=str, help="path of the JSON results file. Default is to print the results.", default=None)
+    parser.add_argument("--quick", action="store_true", help="run smaller benchmarks, e.g. as a smoke test.")
+    parser.add_argument("--latency", type=float, help="artificial latency of the stub server in seconds. Default value is 0.01.", default=0.01)
+    args = parser.parse_args()
+
+    repeat = 3 if args.quick else 10
+    list_counts = [1, 10] if args.quick else [1, 10, 100]
+    rows = 1000 if args.quick else 10000
+    films = 10000 if args.quick else 100000
+
+    results = bench_startup(repeat)
+    results += bench_film_parse(repeat * 10)
+    results += bench_writers(rows)
+    results += bench_film_memory(films)
+
+    server = StubServer(films_per_list=72, latency=args.latency)
+    try:
+        results += bench_scrape_page(server, [1, 4, 16], repeat)
+
+        # End-to-end runs use small lists, so 100 lists stay feasible
+        server.films_per_list = 12
+        results += bench_end_to_end(server, list_counts, threads=4, film_threads=4)
+
+        # A single list with many pages, which depends on the pipelined pagination
+        server.films_per_list = 72 * (5 if args.quick else 20)
+        results += bench_end_to_end(server, [1], threads=1, film_threads=16)
+        results += bench_end_to_end(server, [1], threads=1, film_threads=16, list_only=True)
+
+        # One large and three small lists, whose films are shared out over all film threads by the scheduler
+        results += bench_uneven_lists(server, 72 * (2 if args.quick else 5), 20, threads=4, film_threads=1)
+    finally:
+        server.close()
+
+    report = {
+        "suite": "listscraper",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Written benchmark results to {args.output}!")
+    else:
+        print(json.dumps(report, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# A local stub of the Letterboxd pages that the scraper requests, built from the saved HTML fixtures
+# Lists are named "list-<k>" and contain films "film-<k>-<i>", so films are not shared between lists
+# The stub is also used by the behaviour tests in 'tests/'
+
+from listscraper.transport_class import Transport
+import http.server
+import threading
+import hashlib
+import time
+import re
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PER_PAGE = 72
+
+def read_fixture(name):
+    """
+    Returns the raw content of a saved HTML fixture.
+    """
+
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+def list_page(list_path, list_number, page, film_numbers):
+    """
+    Builds a list page in the format of a Letterboxd list, with a paginator and a 'next' button if the list has more pages.
+    'film_numbers' are the numbers of all films of the list, in their list order.
+    """
+
+    start = (page - 1) * PER_PAGE
+    films = "".join(f'<li class="poster-container numbered-list-item" data-owner-rating="{(i % 10) + 1}">'
+                    f'<div class="really-lazy-load poster film-poster linked-film-poster" data-film-slug="film-{list_number}-{i}" '
+                    f'data-target-link="/film/film-{list_number}-{i}/"><img alt="Film {list_number}-{i}" /></div></li>'
+                    for i in film_numbers[start:start + PER_PAGE])
+
+    next_button = ""
+    if start + PER_PAGE < len(film_numbers):
+        next_button = f'<a class="next" href="{list_path[1:]}page/{page + 1}/">Older</a>'
+
+    pages = max(1, -(-len(film_numbers) // PER_PAGE))
+    paginator = "".join(f'<li class="paginate-page"><a href="{list_path}page/{p}/">{p}</a></li>' if p != page else
+                        f'<li class="paginate-page paginate-current"><span>{p}</span></li>' for p in range(1, pages + 1))
+
+    return (f'<!DOCTYPE html><html><body><section class="list-set"><ul class="poster-list -p125 -grid film-list">{films}</ul>'
+            f'<div class="pagination"><div class="paginate-pages"><ul>{paginator}</ul></div>{next_button}</div></section></body></html>').encode()
+
+class StubServer:
+    """
+    Local HTTP server that serves list pages, film pages, stats and rating histograms built from the saved fixtures.
+    An artificial latency can be added to every response, to mimic the round trip to Letterboxd.
+    With 'etags', every response has an ETag and conditional requests for unchanged pages are answered with '304 Not Modified'.
+
+    Attributes:
+        films_per_list (int):   The amount of films in every list.
+        list_sizes (dict):      The amount of films of specific lists (by list number), which overrides films_per_list.
+        list_films (dict):      The numbers of the films of specific lists (by list number), in their list order, which overrides list_sizes.
+        failing (set):          Paths that are answered with '500 Internal Server Error'.
+        latency (float):        The artificial latency of every response in seconds.
+        etags (bool):           Whether responses have an ETag and conditional requests are answered.
+        url (str):              The base URL of the server.
+        requests (int):         The amount of requests that were served.
+        paths (dict):           The amount of requests of every path.
+        not_modified (int):     The amount of requests that were answered with '304 Not Modified'.
+
+    Methods:
+        list_url(k):    Returns the URL (as it would be on Letterboxd) of list number k.
+        transport():    Returns a Transport whose requests to Letterboxd are served by this server.
+        close():        Stops the server.
+    """
+
+    def __init__(self, films_per_list=72, latency=0, etags=False):
+        self.films_per_list = films_per_list
+        self.list_sizes = {}
+        self.list_films = {}
+        self.failing = set()
+        self.latency = latency
+        self.etags = etags
+        self.requests = 0
+        self.paths = {}
+        self.not_modified = 0
+        self.lock = threading.Lock()
+        self.pages = {"film": read_fixture("film.html"), "stats": read_fixture("stats.html"), "histogram": read_fixture("histogram.html")}
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                    server.paths[self.path] = server.paths.get(self.path, 0) + 1
+                if server.latency:
+                    time.sleep(server.latency)
+
+                content = None if self.path in server.failing else server.route(self.path)
+                status = 500 if self.path in server.failing else 200 if content is not None else 404
+                etag = f'"{hashlib.sha1(content).hexdigest()}"' if server.etags and content is not None else None
+
+                if etag and self.headers.get("If-None-Match") == etag:
+                    with server.lock:
+                        server.not_modified += 1
+                    status, content = 304, None
+
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(content or b"")))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(content or b"")
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def route(self, path):
+        """
+        Returns the content of a requested path, or None if the page does not exist.
+        """
+
+        match = re.fullmatch(r"(/bench/list/list-(\d+)/)(?:page/(\d+)/)?", path)
+        if match:
+            k = int(match[2])
+            film_numbers = self.list_films.get(k, range(self.list_sizes.get(k, self.films_per_list)))
+            return list_page(match[1], k, int(match[3] or 1), list(film_numbers))
+
+        if re.fullmatch(r"/csi/film/[\w-]+/stats/", path):
+            return self.pages["stats"]
+        if re.fullmatch(r"/csi/film/[\w-]+/rating-histogram/", path):
+            return self.pages["histogram"]
+        if re.fullmatch(r"/film/[\w-]+/", path):
+            return self.pages["film"]
+
+    def list_url(self, k):
+        return f"https://letterboxd.com/bench/list/list-{k}/"
+
+    def transport(self, pool_size=10):
+        return StubTransport(self.url, pool_size)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class StubTransport(Transport):
+    """
+    Transport that sends all requests for letterboxd.com to a StubServer instead.
+    """
+
+    def __init__(self, stub_url, pool_size=10, *args, **kwargs):
+        super().__init__(pool_size, *args, **kwargs)
+        self.stub_url = stub_url
+
+    def get(self, url):
+        return super().get(url.replace("https://letterboxd.com/", self.stub_url))
@@ -1,5 +1,8 @@
-from listscraper.cli import cli_arguments
-from listscraper.instance_class import ScrapeInstance
+from listscraper.cli import cli_arguments, serve_arguments, worker_arguments
+import importlib.util
+import time
+import sys
+import os
 
 
 def main():
@@ -12,13 +15,108 @@ def main():
     print("           Letterboxd-List-Scraper           ")
     print("=============================================")
 
+    # Serve mode keeps the scraper running and accepts lists as jobs
+    if sys.argv[1:2] == ["serve"]:
+        return serve(serve_arguments(sys.argv[2:]))
+
+    # Worker mode scrapes the films of a distributed scrape from the shared work queue
+    if sys.argv[1:2] == ["worker"]:
+        return work(worker_arguments(sys.argv[2:]))
+
     # Importing command line arguments and create a scrape instance
     args = cli_arguments()
-    LBscraper = ScrapeInstance(args.listURL, args.pages, args.output_name, args.output_path, args.output_file_extension, args.file, args.concat, args.quiet, args.threads)
+
+    # Imported after parsing the arguments, so '--help' and '--version' do not have to load the scraper
+    from listscraper.instance_class import ScrapeInstance
+    LBscraper = ScrapeInstance(args.listURL, args.pages, args.output_name, args.output_path, args.output_file_extension, args.file, args.concat, args.quiet, args.threads, args.film_threads,
+                              args.engine, args.max_requests, args.per_host,
+                              args.cache_dir, args.cache_ttl, args.stats_ttl, args.cache_size, args.no_cache, args.resume,
+                              args.rate, args.retries, args.adaptive, args.timeout, args.fields, args.parser, args.parse_workers,
+                              args.record, args.replay, args.replay_latency, args.metrics, args.metrics_json, args.metrics_port,
+                              args.incremental, args.refresh_after, None, args.queue, args.list_only)
 
     # # End message
     print(f"\nProgram successfully finished! Your {LBscraper.output_file_extension}(s) can be found in ./{LBscraper.output_path}/.")
     print(f"    Total run time was {LBscraper.endtime - LBscraper.starttime :.2f} seconds.")
+    print(f"    {LBscraper.memo.hits} of {LBscraper.memo.hits + LBscraper.memo.misses} film scrapes were shared between lists/pages (dedup hit rate {LBscraper.memo.hit_rate():.1%}).")
+
+
+def serve(args):
+    """
+    Starts the scraper in serve mode: the request layer and caches are opened once and jobs are accepted over a local HTTP API
+    until the server is stopped with Ctrl+C.
+    """
+
+    if args.record and args.replay:
+        sys.exit("    Please use either --record or --replay, not both.")
+    if args.replay and not os.path.exists(args.replay):
+        sys.exit(f"    The replay archive {args.replay} does not exist. Please check and try again.")
+    if args.engine == "async" and importlib.util.find_spec("aiohttp") is None:
+        sys.exit("    The async engine requires the 'aiohttp' package. Please install it with 'pip install aiohttp' and try again.")
+
+    from listscraper.instance_class import ScrapeResources
+    from listscraper.server_class import ScrapeServer
+
+    # Recording and replaying bypass the cache, so every response is recorded and replays are deterministic
+    use_cache = not (args.no_cache or args.cache_dir is None or args.record or args.replay)
+
+    # The metrics are always collected in serve mode, so they can be requested from the API
+    resources = ScrapeResources(args.threads, args.film_threads, args.engine, args.max_requests, args.per_host, args.cache_dir if use_cache else None,
+                                args.cache_ttl, args.stats_ttl, args.cache_size, args.rate, args.retries, args.adaptive, args.timeout,
+                                args.parser, args.parse_workers, args.record, args.replay, args.replay_latency, True, args.metrics_port)
+    server = ScrapeServer(resources, args.host, args.port, args.socket, args.queue, args.output_root)
+
+    print(f"Listening for jobs on {server.address} (press Ctrl+C to stop)...\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping the server once the running job is finished...")
+    finally:
+        server.close()
+
+        if args.metrics:
+            print("\nPerformance report:")
+            print(resources.metrics.summary())
+        if args.metrics_json:
+            resources.metrics.write_json(args.metrics_json)
+            print(f"    Written performance report to {args.metrics_json}!")
+        resources.close()
+
+
+def work(args):
+    """
+    Starts the scraper in worker mode: films are taken from the shared work queue of a distributed scrape until
+    the worker is stopped with Ctrl+C (or the queue stays empty for --idle-exit seconds).
+    """
+
+    from listscraper.instance_class import ScrapeResources
+    from listscraper.workqueue_class import open_work_queue
+    from listscraper.distributed_class import FilmWorker
+
+    use_cache = not (args.no_cache or args.cache_dir is None)
+    resources = ScrapeResources(args.threads, args.film_threads, "threads", args.max_requests, args.per_host, args.cache_dir if use_cache else None,
+                                args.cache_ttl, args.stats_ttl, args.cache_size, args.rate, args.retries, args.adaptive, args.timeout,
+                                args.parser, args.parse_workers, None, None, 0, args.metrics or args.metrics_json or args.metrics_port, args.metrics_port)
+    work_queue = open_work_queue(args.queue)
+    worker = FilmWorker(work_queue, resources, args.worker_name, args.lease, args.idle_exit)
+
+    print(f"Worker {worker.name} is scraping films from {args.queue} with {args.threads * args.film_threads} threads (press Ctrl+C to stop)...\n")
+    starttime = time.time()
+    try:
+        worker.run(args.threads * args.film_threads)
+    except KeyboardInterrupt:
+        print("\nStopping the worker once its current films are finished...")
+    finally:
+        work_queue.close()
+
+        print(f"\nWorker {worker.name} scraped {worker.done} films in {time.time() - starttime:.2f} seconds ({worker.failed} failed attempts).")
+        if args.metrics:
+            print("\nPerformance report:")
+            print(resources.metrics.summary())
+        if args.metrics_json:
+            resources.metrics.write_json(args.metrics_json)
+            print(f"    Written performance report to {args.metrics_json}!")
+        resources.close()
 
 
 if __name__ == "__main__":
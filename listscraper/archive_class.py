@@ -0,0 +1,113 @@
+from urllib.parse import quote, unquote
+import threading
+import zipfile
+import shutil
+import time
+import sys
+import os
+
+class ResponseArchive:
+    """
+    Compressed archive (a zip file) of recorded Letterboxd responses, keyed by their URL.
+    In record mode every response that is fetched during a run is added to the archive. In replay mode the archive
+    is served instead of letterboxd.com, so a scrape can be repeated offline and deterministically (e.g. for benchmarks).
+    Each response is stored as a separate entry named after its quoted URL, with its HTTP status code as the entry comment.
+    A zip file is only readable once its index is written when it is closed, so a recording goes to a temporary file
+    ('<path>.part') that replaces the archive when it is closed. A killed recording leaves the previous archive (if any) intact.
+
+    Attributes:
+        path (str):         The path of the archive file.
+        mode (str):         "w" to record a new archive, "a" to add to an existing one, "r" to replay it.
+        entries (dict):     The archive entries, keyed by the URL of their response.
+        temp_path (str):    The path of the temporary file that is recorded into, None in replay mode.
+
+    Methods:
+        record(url, status, content):   Adds a response to the archive, unless its URL was recorded before.
+        lookup(url):                    Returns the recorded status and content of a URL.
+        close():                        Closes the archive file.
+    """
+
+    def __init__(self, path, mode="r"):
+        """
+        Opens the archive file. Exits if the archive to replay or add to is incomplete (e.g. written by a recording that was killed).
+
+        Parameters:
+            path (str):     The path of the archive file.
+            mode (str):     "w" to record a new archive, "a" to add to an existing one, "r" to replay it.
+        """
+
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+
+        # A zip file without its index (e.g. of a recording that was killed) can not be replayed or added to
+        if (mode == "r" or (mode == "a" and os.path.exists(path))) and not zipfile.is_zipfile(path):
+            sys.exit(f"    The archive {path} is incomplete or not a zip file, it was probably written by a recording that was stopped.\n"
+                     f"    Please record it again{' without --resume' if mode == 'a' else ''}.")
+
+        if mode == "r":
+            self.temp_path = None
+            self.file = open(path, "rb")
+        else:
+            # The responses of an existing archive are copied to the temporary file, which the new responses are added to
+            self.temp_path = path + ".part"
+            if mode == "a" and os.path.exists(path):
+                shutil.copyfile(path, self.temp_path)
+                self.file = open(self.temp_path, "r+b")
+            else:
+                mode = "w"
+                self.file = open(self.temp_path, "w+b")
+
+        self.zip = zipfile.ZipFile(self.file, mode, compression=zipfile.ZIP_DEFLATED)
+        self.entries = {unquote(info.filename): info for info in self.zip.infolist()}
+
+    def record(self, url, status, content):
+        """
+        Adds a response to the archive, unless its URL was recorded before.
+
+        Parameters:
+            url (str):          The URL of the request.
+            status (int):       The HTTP status code of the response.
+            content (bytes):    The raw content of the response.
+        """
+
+        with self.lock:
+            if url in self.entries:
+                return
+
+            info = zipfile.ZipInfo(quote(url, safe=""), date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.comment = str(status).encode()
+            self.zip.writestr(info, content)
+            self.entries[url] = info
+
+    def lookup(self, url):
+        """
+        Returns the recorded response of a URL.
+
+        Returns:
+            status (int):       The HTTP status code of the response, 404 if the URL was not recorded.
+            content (bytes):    The raw content of the response.
+        """
+
+        with self.lock:
+            info = self.entries.get(url)
+            if info is None:
+                return 404, b""
+            return int(info.comment), self.zip.read(info)
+
+    def close(self):
+        """
+        Closes the archive file. In record mode this writes its index, and the temporary file replaces the archive.
+        """
+
+        with self.lock:
+            if self.file.closed:
+                return
+            self.zip.close()
+            if self.temp_path:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.file.close()
+            if self.temp_path:
+                os.replace(self.temp_path, self.path)
@@ -0,0 +1,240 @@
+from listscraper.scrape_functions import FILM_COLUMNS, PREFETCH_PAGES, LOOKAHEAD_PAGES, check_status, parse_list_page, paginator_urls, film_urls, film_pages, observe_cache, parse_film_data, stored_parses, store_parses, build_film_dict, reuse_film, scrape_poster, LIST_PAGE_COLUMNS
+from listscraper.record_class import FilmRecord
+from tqdm.asyncio import tqdm_asyncio
+import collections
+import asyncio
+import time
+
+# Coroutine versions of the scrape functions, used by the '--engine async' option.
+# All requests go through a single AsyncTransport, the parsing is identical to the threaded engine.
+
+async def fetch(transport, url):
+    """
+    Requests a Letterboxd page and returns its raw content, raises an error if the page could not be loaded.
+    """
+
+    status, content = await transport.get(url)
+    check_status(status, url)
+
+    return content
+
+async def async_scrape_list(transport, list_url, page_options, output_file_extension, list_type, quiet=False, concat=False, cache=None, memo=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None, log=None):
+    """
+    Scrapes a Letterboxd list. Takes into account any optional page selection.
+    Asynchronous generator version of 'scrape_list()', see there for the parameters.
+
+    Parameters:
+        transport (AsyncTransport):     The aiohttp session that is used for all requests.
+        cache (FilmCache):              The on-disk film cache, or None if caching is disabled.
+        memo (FilmMemo):                The in-process memo of films scraped during this run, or None.
+        fields (list):                  The columns that should be scraped. Default is all columns.
+        parser (str):                   The extractor backend used to parse the film pages ("lxml" or "bs4"). Default is "lxml".
+        parse_pool (ParsePool):         The pool of processes that parses the film pages, or None to parse them on the event loop.
+        metrics (Metrics):              The metrics that parse times, cache hits and films are recorded in, or None.
+        previous (PreviousOutput):      The previous output of the list in incremental mode, or None to scrape all films.
+        log (file):                     The stream that skipped pages are reported to, or None for stdout.
+
+    Yields:
+        page_url (str):          The URL of the scraped page.
+        next_url (str):          The URL of the next page if all pages are scraped, otherwise None.
+        page_films (list):       A list of dicts where each dict contains information on the films of one page of the LB list.
+    """
+
+    not_found = float("nan") if output_file_extension == ".csv" else None
+
+    # If all pages should be scraped, go through all available pages
+    if (page_options == []) or (page_options == "*"):
+
+        # The following list pages are requested ahead, and the films of the next page are scheduled before the
+        # current page is finished, so the transport stays busy while the last films of the current page finish
+        requested = {list_url: asyncio.ensure_future(async_fetch_list_page(transport, list_url, list_type))}
+        pending = collections.deque()
+        page_url = list_url
+        try:
+            while page_url is not None:
+                try:
+                    films, next_url, page_soup = await requested.pop(page_url)
+                except Exception:
+                    # If a list page could not be loaded, the pages before it are still finished (so they can be resumed from)
+                    while pending:
+                        done_url, done_next_url, tasks = pending.popleft()
+                        yield done_url, done_next_url, await async_collect_page_films(tasks, done_url, quiet, concat)
+                    raise
+
+                for url in paginator_urls(page_soup, next_url)[:PREFETCH_PAGES]:
+                    if url not in requested:
+                        requested[url] = asyncio.ensure_future(async_fetch_list_page(transport, url, list_type))
+
+                if fields == LIST_PAGE_COLUMNS:
+                    tasks = async_poster_futures(films, not_found, fields, metrics)
+                else:
+                    tasks = [asyncio.ensure_future(async_scrape_film(transport, film, not_found, cache, memo, fields, parser, parse_pool, metrics, previous)) for film in films]
+                pending.append((page_url, next_url, tasks))
+                page_url = next_url
+
+                # After the last page, all remaining pages are finished
+                while len(pending) > LOOKAHEAD_PAGES or (pending and page_url is None):
+                    done_url, done_next_url, tasks = pending.popleft()
+                    yield done_url, done_next_url, await async_collect_page_films(tasks, done_url, quiet, concat)
+        finally:
+            for task in list(requested.values()) + [task for _, _, tasks in pending for task in tasks]:
+                task.cancel()
+
+    # If page selection was input, go through the selected pages in their order, the following selected pages
+    # are requested ahead and their films are scheduled like above, so only a few pages are held in memory at once
+    else:
+        page_urls = [list_url + f"page/{p}/" for p in page_options]
+        requested = {}
+        pending = collections.deque()
+        try:
+            for i, (p, page_url) in enumerate(zip(page_options, page_urls)):
+                for j in range(i, min(i + PREFETCH_PAGES + 1, len(page_urls))):
+                    if j not in requested:
+                        requested[j] = asyncio.ensure_future(async_fetch_list_page(transport, page_urls[j], list_type))
+
+                try:
+                    films, _, _ = await requested.pop(i)
+                except Exception:
+                    # If a list page could not be loaded, the pages before it are still finished (so they can be resumed from)
+                    while pending:
+                        done_url, done_next_url, tasks = pending.popleft()
+                        yield done_url, done_next_url, await async_collect_page_films(tasks, list_url, quiet, concat)
+                    raise
+
+                if films == []:
+                    print(f"        No films on page {p}...", file=log)
+                    continue
+
+                if fields == LIST_PAGE_COLUMNS:
+                    tasks = async_poster_futures(films, not_found, fields, metrics)
+                else:
+                    tasks = [asyncio.ensure_future(async_scrape_film(transport, film, not_found, cache, memo, fields, parser, parse_pool, metrics, previous)) for film in films]
+                pending.append((page_url, None, tasks))
+
+                while len(pending) > LOOKAHEAD_PAGES:
+                    done_url, done_next_url, tasks = pending.popleft()
+                    yield done_url, done_next_url, await async_collect_page_films(tasks, list_url, quiet, concat)
+
+            # After the last selected page, all remaining pages are finished
+            while pending:
+                done_url, done_next_url, tasks = pending.popleft()
+                yield done_url, done_next_url, await async_collect_page_films(tasks, list_url, quiet, concat)
+        finally:
+            for task in list(requested.values()) + [task for _, _, tasks in pending for task in tasks]:
+                task.cancel()
+
+async def async_fetch_list_page(transport, page_url, list_type):
+    """
+    Requests a page of a LB list and finds its films and the link to the next page.
+    Coroutine version of 'fetch_list_page()', see there for the parameters.
+    """
+
+    status, content = await transport.get(page_url)
+
+    # Check to see page was downloaded correctly, a page that does not exist has no films
+    if status == 404:
+        return [], None, None
+    check_status(status, page_url)
+
+    return parse_list_page(content, list_type)
+
+async def async_collect_page_films(tasks, og_list_url, quiet=False, concat=False):
+    """
+    Waits for the scraped films of a page and returns them in the original list order.
+    Coroutine version of 'collect_page_films()', see there for the parameters.
+    """
+
+    # 'gather()' returns the films in the original list order
+    film_dicts = await tqdm_asyncio.gather(*tasks, disable=quiet) if tasks else []
+
+    page_films = []
+    for film_dict in film_dicts:
+
+        # Adds an extra column with OG list URL
+        if concat:
+            film_dict["List_URL"] = og_list_url
+
+        page_films.append(film_dict)
+
+    return page_films
+
+def async_poster_futures(films, not_found, fields=LIST_PAGE_COLUMNS, metrics=None):
+    """
+    Reads the films of a list page from their posters and returns them as finished futures of the event loop.
+    Version of 'poster_futures()' for the async engine, see there for the parameters.
+    """
+
+    loop = asyncio.get_running_loop()
+    futures = []
+    for film in films:
+        future = loop.create_future()
+        future.set_result(scrape_poster(film, not_found, fields, metrics))
+        futures.append(future)
+
+    return futures
+
+async def async_scrape_film(transport, film_html, not_found, cache=None, memo=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None):
+    """
+    Scrapes all available information regarding a film.
+    Coroutine version of 'scrape_film()', see there for the parameters.
+
+    Returns:
+        film_dict (dict):   A dictionary containing all the film's information.
+    """
+
+    film_url, stats_url, hist_url = film_urls(film_html)
+    slug = film_url.split('/')[-2]
+
+    if metrics:
+        metrics.observe_film()
+
+    film, stale = previous.get(slug) if previous else (None, False)
+    if film is not None:
+        stats = {}
+        if stale:
+            record = await async_scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, None, previous.refresh_fields, parser, parse_pool, metrics)
+            stats = record.columns(previous.refresh_fields)
+        previous.record(slug, "refreshed" if stale else "reused")
+        return reuse_film(film, film_html, stats, not_found, fields)
+
+    scrape_coro = lambda: async_scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, cache, fields, parser, parse_pool, metrics)
+    record = await memo.get_or_scrape_async(slug, scrape_coro) if memo else await scrape_coro()
+
+    if previous:
+        previous.record(slug, "added")
+
+    return build_film_dict(film_html, film_url, record, not_found, fields)
+
+async def async_scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, cache=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None):
+    """
+    Requests the Letterboxd pages of a film concurrently and extracts its general information and stats.
+    Coroutine version of 'scrape_film_data()', see there for the parameters.
+
+    Returns:
+        record (FilmRecord):    The general film information and stats of the film.
+    """
+
+    meta, stats = cache.get(slug, not_found) if cache else (None, None)
+
+    pages = film_pages(film_url, stats_url, hist_url, meta, stats, fields)
+    if metrics and cache:
+        observe_cache(metrics, pages, meta, stats)
+    contents = dict(zip(pages, await asyncio.gather(*[fetch(transport, url) for url in pages.values()])))
+
+    parsed = stored_parses(transport.responses, pages, parser, not_found)
+    contents = {page: content for page, content in contents.items() if page not in parsed}
+
+    start = time.perf_counter()
+    if parse_pool and contents:
+        meta, stats, new_meta, new_stats = await parse_pool.parse_async(parse_film_data, contents, meta, stats, not_found, parser, parsed)
+    else:
+        meta, stats, new_meta, new_stats = parse_film_data(contents, meta, stats, not_found, parser, parsed)
+    if metrics and contents:
+        metrics.observe_parse(time.perf_counter() - start)
+
+    store_parses(transport.responses, pages, contents, meta, stats, parser, not_found)
+
+    if cache:
+        cache.put(slug, new_meta, new_stats, not_found)
+
+    return FilmRecord(meta, stats)
@@ -0,0 +1,333 @@
+import threading
+import sqlite3
+import json
+import zlib
+import time
+import os
+
+class FilmCache:
+    """
+    Persistent on-disk cache of scraped films, stored in a SQLite database and keyed by the film slug (e.g. 'the-matrix').
+    The general film information (title, director, cast, etc.) and the stats (watches, likes, histogram, etc.) are stored separately,
+    because the stats change much faster than the rest. Each part has its own time-to-live.
+    When the database grows larger than its maximum size, the least recently used films are removed first.
+
+    Attributes:
+        cache_dir (str):        The directory that holds the database.
+        meta_ttl (float):       Time-to-live of the general film information in seconds.
+        stats_ttl (float):      Time-to-live of the film stats in seconds.
+        max_size (int):         The maximum size of all cached films in bytes.
+
+    Methods:
+        get(slug, not_found):               Returns the cached film information that has not expired yet.
+        put(slug, meta, stats, not_found):  Stores the film information in the cache.
+        evict():                            Removes the least recently used films until the cache fits in its maximum size.
+        close():                            Closes the database.
+    """
+
+    def __init__(self, cache_dir, meta_ttl=30, stats_ttl=1, max_size=200):
+        """
+        Opens (or creates) the cache database.
+
+        Parameters:
+            cache_dir (str):    The directory that holds the database, is created if necessary.
+            meta_ttl (float):   Time-to-live of the general film information in days.
+            stats_ttl (float):  Time-to-live of the film stats in days.
+            max_size (float):   The maximum size of all cached films in MB.
+        """
+
+        self.cache_dir = cache_dir
+        self.meta_ttl = meta_ttl * 86400
+        self.stats_ttl = stats_ttl * 86400
+        self.max_size = int(max_size * 1e6)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # The connection is shared by all threads, so all access goes through a lock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, "films.sqlite"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS films (
+                               slug TEXT PRIMARY KEY,
+                               meta TEXT, meta_time REAL,
+                               stats TEXT, stats_time REAL,
+                               last_access REAL, size INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS films_last_access ON films (last_access)")
+        self.db.commit()
+
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM films").fetchone()[0]
+
+    def get(self, slug, not_found):
+        """
+        Returns the cached information of a film. Parts that are missing or expired are returned as None.
+
+        Parameters:
+            slug (str):         The film slug.
+            not_found (object): Either NaN if output is CSV or 'None' if output is JSON, replaces missing values.
+
+        Returns:
+            meta (dict):    The general film information.
+            stats (dict):   The film stats.
+        """
+
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT meta, meta_time, stats, stats_time FROM films WHERE slug = ?", (slug,)).fetchone()
+            if row is None:
+                return None, None
+
+            self.db.execute("UPDATE films SET last_access = ? WHERE slug = ?", (now, slug))
+            self.db.commit()
+
+        meta, meta_time, stats, stats_time = row
+        meta = _loads(meta, not_found) if (meta is not None and now - meta_time < self.meta_ttl) else None
+        stats = _loads(stats, not_found) if (stats is not None and now - stats_time < self.stats_ttl) else None
+
+        return meta, stats
+
+    def put(self, slug, meta, stats, not_found):
+        """
+        Stores the information of a film. Parts that are given as None are left untouched.
+
+        Parameters:
+            slug (str):         The film slug.
+            meta (dict):        The newly scraped general film information, or None.
+            stats (dict):       The newly scraped film stats, or None.
+            not_found (object): The value that was used for missing values.
+        """
+
+        if meta is None and stats is None:
+            return
+
+        now = time.time()
+        meta = _dumps(meta, not_found) if meta is not None else None
+        stats = _dumps(stats, not_found) if stats is not None else None
+
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO films (slug, size) VALUES (?, 0)", (slug,))
+            if meta is not None:
+                self.db.execute("UPDATE films SET meta = ?, meta_time = ? WHERE slug = ?", (meta, now, slug))
+            if stats is not None:
+                self.db.execute("UPDATE films SET stats = ?, stats_time = ? WHERE slug = ?", (stats, now, slug))
+
+            old_size = self.db.execute("SELECT size FROM films WHERE slug = ?", (slug,)).fetchone()[0]
+            new_size = self.db.execute("SELECT LENGTH(COALESCE(meta, '')) + LENGTH(COALESCE(stats, '')) FROM films WHERE slug = ?", (slug,)).fetchone()[0]
+            self.db.execute("UPDATE films SET size = ?, last_access = ? WHERE slug = ?", (new_size, now, slug))
+            self.db.commit()
+            self.size += new_size - old_size
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used films until the cache is below 90% of its maximum size.
+        """
+
+        with self.lock:
+            rows = self.db.execute("SELECT slug, size FROM films ORDER BY last_access ASC").fetchall()
+            removed = []
+            for slug, size in rows:
+                if self.size <= 0.9 * self.max_size:
+                    break
+                removed.append((slug,))
+                self.size -= size
+
+            self.db.executemany("DELETE FROM films WHERE slug = ?", removed)
+            self.db.commit()
+
+    def close(self):
+        """
+        Closes the database.
+        """
+
+        with self.lock:
+            self.db.close()
+
+class ResponseCache:
+    """
+    Persistent on-disk cache of raw Letterboxd responses, stored in a SQLite database next to the film cache and keyed by URL.
+    Every response that has a validator (an 'ETag' or 'Last-Modified' header) is stored with its body. When the URL is
+    requested again, the transport sends a conditional request ('If-None-Match' / 'If-Modified-Since'), and if Letterboxd
+    answers '304 Not Modified' the cached body is used instead of downloading it again.
+    The parse result of a film page can be stored with its body, so a page that was not modified is not parsed again either.
+    When the database grows larger than its maximum size, the least recently used responses are removed first.
+
+    Attributes:
+        cache_dir (str):    The directory that holds the database.
+        max_size (int):     The maximum size of all cached responses in bytes.
+
+    Methods:
+        validators(url):                            Returns the headers of a conditional request for a cached URL.
+        get(url):                                   Returns the cached body of a URL.
+        put(url, headers, content):                 Stores a response with its validators.
+        parsed(url, parser, not_found):             Returns the stored parse result of the cached body of a URL.
+        put_parsed(url, parser, result, not_found): Stores the parse result of the cached body of a URL.
+        evict():                                    Removes the least recently used responses until the cache fits in its maximum size.
+        close():                                    Closes the database.
+    """
+
+    def __init__(self, cache_dir, max_size=200):
+        """
+        Opens (or creates) the cache database.
+
+        Parameters:
+            cache_dir (str):    The directory that holds the database, is created if necessary.
+            max_size (float):   The maximum size of all cached responses in MB.
+        """
+
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size * 1e6)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # The connection is shared by all threads, so all access goes through a lock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(self.cache_dir, "responses.sqlite"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                               url TEXT PRIMARY KEY,
+                               etag TEXT, last_modified TEXT,
+                               body BLOB, parser TEXT, parsed TEXT,
+                               last_access REAL, size INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.db.commit()
+
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def validators(self, url):
+        """
+        Returns the headers of a conditional request for a cached URL, or an empty dict if the URL is not cached.
+        """
+
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified FROM responses WHERE url = ?", (url,)).fetchone()
+
+        headers = {}
+        if row and row[0]:
+            headers["If-None-Match"] = row[0]
+        if row and row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def get(self, url):
+        """
+        Returns the cached body of a URL (after a '304 Not Modified' response), or None if it is not cached (anymore).
+        """
+
+        with self.lock:
+            row = self.db.execute("SELECT body FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+
+            self.db.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.db.commit()
+
+        return zlib.decompress(row[0])
+
+    def put(self, url, headers, content):
+        """
+        Stores a response with its validators, replacing the previous body and its parse result.
+        Responses without a validator can not be requested conditionally, so they are not stored, and the previous body
+        and parse result of the URL are removed (they belong to an outdated page).
+
+        Parameters:
+            url (str):          The URL of the request.
+            headers (dict):     The (case-insensitive) headers of the response.
+            content (bytes):    The raw content of the response.
+        """
+
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if etag is None and last_modified is None:
+            with self.lock:
+                row = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+                if row is not None:
+                    self.db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                    self.db.commit()
+                    self.size -= row[0]
+            return
+
+        body = zlib.compress(content)
+        with self.lock:
+            row = self.db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses (url, etag, last_modified, body, parser, parsed, last_access, size) VALUES (?, ?, ?, ?, NULL, NULL, ?, ?)",
+                            (url, etag, last_modified, body, time.time(), len(body)))
+            self.db.commit()
+            self.size += len(body) - (row[0] if row else 0)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def parsed(self, url, parser, not_found):
+        """
+        Returns the stored parse result of the cached body of a URL, or None if it was not parsed (with this parser) before.
+        A new body replaces the parse result, so a stored result always belongs to the body that was last received.
+        """
+
+        with self.lock:
+            row = self.db.execute("SELECT parsed FROM responses WHERE url = ? AND parser = ?", (url, parser)).fetchone()
+
+        return _loads(row[0], not_found) if row and row[0] is not None else None
+
+    def put_parsed(self, url, parser, result, not_found):
+        """
+        Stores the parse result of the cached body of a URL, if the URL is cached.
+        """
+
+        parsed = _dumps(result, not_found)
+        with self.lock:
+            row = self.db.execute("SELECT LENGTH(body), size FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+
+            self.db.execute("UPDATE responses SET parser = ?, parsed = ?, size = ? WHERE url = ?", (parser, parsed, row[0] + len(parsed), url))
+            self.db.commit()
+            self.size += row[0] + len(parsed) - row[1]
+
+    def evict(self):
+        """
+        Removes the least recently used responses until the cache is below 90% of its maximum size.
+        """
+
+        with self.lock:
+            rows = self.db.execute("SELECT url, size FROM responses ORDER BY last_access ASC").fetchall()
+            removed = []
+            for url, size in rows:
+                if self.size <= 0.9 * self.max_size:
+                    break
+                removed.append((url,))
+                self.size -= size
+
+            self.db.executemany("DELETE FROM responses WHERE url = ?", removed)
+            self.db.commit()
+
+    def close(self):
+        """
+        Closes the database.
+        """
+
+        with self.lock:
+            self.db.close()
+
+def _dumps(film_part, not_found):
+    """
+    Serializes part of a film dictionary, missing values are stored as null.
+    """
+
+    return json.dumps({key: (None if _is_missing(value, not_found) else value) for key, value in film_part.items()}, ensure_ascii=False)
+
+def _loads(string, not_found):
+    """
+    Deserializes part of a film dictionary, null values are replaced by the 'not_found' value.
+    """
+
+    return {key: (not_found if value is None else value) for key, value in json.loads(string).items()}
+
+def _is_missing(value, not_found):
+    """
+    Checks if a value is the 'not_found' value (NaN is not equal to itself, so it is checked separately).
+    """
+
+    return value is None or value is not_found or (isinstance(value, float) and value != value)
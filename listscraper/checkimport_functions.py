@@ -1,6 +1,8 @@
 # This file contains functions that checks the user-input and, if deemed valid, imports the relevant information
 # If user-input is not valid, a relevant error message is generated and printed
 
+from listscraper.utility_functions import FILM_COLUMNS, FILM_PAGE_COLUMNS, STATS_COLUMNS, HISTOGRAM_COLUMNS
+
 ROLES = [
     "actor",
     "additional-directing",
@@ -34,6 +36,18 @@ ROLES = [
     "writer",
 ]
 
+# Short names of single columns and groups of columns that can be selected with '--fields'
+FIELD_ALIASES = {
+    "title": ["Film_title"],
+    "year": ["Release_year"],
+    "rating": ["Average_rating"],
+    "url": ["Film_URL"],
+    "film": FILM_PAGE_COLUMNS,
+    "stats": STATS_COLUMNS,
+    "histogram": HISTOGRAM_COLUMNS,
+    "all": FILM_COLUMNS,
+}
+
 def checkimport_url(url_string):
     """
     Checks the input URL for correct syntax and imports relevant list information.
@@ -43,7 +57,7 @@ def checkimport_url(url_string):
         
         Returns:
             check (boolean):    True or False depending on if the input URL is recognized by the program.
-            type (str):         The list type (watchlist, list, films).
+            type (str):         The list type (watchlist, list, films, user).
             username (str):     The username of the lists owner.
             listname (str):     The program-assigned name for the list, extracted from the URL.
     """
@@ -69,6 +83,13 @@ def checkimport_url(url_string):
             username = url_chunks[3]
             listname = f"{username.lower()}-films"
             check = True
+
+        # All public lists, films and watchlist of a user, which are discovered when scraping starts
+        elif url_chunks[4] == "lists":
+            type = "user"
+            username = url_chunks[3]
+            listname = f"{username.lower()}-lists"
+            check = True
         
         # Letterboxd site generic lists
         elif url_chunks[3] == "films" and len(url_chunks) > 5:
@@ -116,10 +137,10 @@ def checkimport_output_output_file_extension(output_file_extension):
         extension (str):    The output file extension for the file.
     """
 
-    if output_file_extension == ".json" or output_file_extension == ".csv":
+    if output_file_extension in {".json", ".ndjson", ".csv", ".parquet", ".arrow"}:
         check = True
         extension = output_file_extension
-    elif output_file_extension == "json" or output_file_extension == "csv":
+    elif output_file_extension in {"json", "ndjson", "csv", "parquet", "arrow"}:
         check = True
         extension = "." + output_file_extension
     else:
@@ -211,4 +232,39 @@ def checkimport_pages(pages_string):
     except:
         check = False
 
-    return check, final_pages
\ No newline at end of file
+    return check, final_pages
+
+def checkimport_fields(fields_string):
+    """
+    Checks the input string of selected fields and converts it to the list of columns that should be scraped.
+    Fields can be column names (case-insensitive) or one of the short names in FIELD_ALIASES.
+    The 'Film_URL' column is always included, as it identifies the film.
+
+        Parameters:
+            fields_string (str):    The input after the "--fields" flag, or None if all columns should be scraped.
+
+        Returns:
+            check (boolean):    True or False depending on if all fields were recognized.
+            columns (list):     The selected columns, in their output order.
+    """
+
+    if fields_string is None:
+        check = True
+        return check, FILM_COLUMNS
+
+    lower_columns = {column.lower(): column for column in FILM_COLUMNS}
+    selected = {"Film_URL"}
+
+    for field in fields_string.strip("\'\"").replace(" ", "").split(","):
+        if field.lower() in FIELD_ALIASES:
+            selected.update(FIELD_ALIASES[field.lower()])
+        elif field.lower() in lower_columns:
+            selected.add(lower_columns[field.lower()])
+        else:
+            check = False
+            return check, []
+
+    check = True
+    columns = [column for column in FILM_COLUMNS if column in selected]
+
+    return check, columns
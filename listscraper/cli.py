@@ -1,9 +1,9 @@
 import argparse
 
-def cli_arguments():
+def cli_parser():
     """
-    Function that parses the user-input arguments from the command line interface (CLI)
-    and returns these arguments stored in an 'args' object.
+    Function that builds the parser of the user-input arguments of the command line interface (CLI).
+    The same parser is used for the arguments of the jobs that are submitted in serve mode.
     """
 
     parser=argparse.ArgumentParser(prog="listscraper", usage="%(prog)s [options] [list-url]",
@@ -24,7 +24,9 @@ def cli_arguments():
                         required=False, default="scraper_outputs")
 
     parser.add_argument("-ofe", "--output_file_extension", type=str,
-                        help="specify output file type, .csv or .json. Default output is .csv.",
+                        help="specify output file type, .csv, .json, .ndjson (newline-delimited JSON, one film per line), .parquet or .arrow (Arrow IPC). Default output is .csv.\n"
+                             "Parquet and Arrow files have a typed schema (integer counts, float ratings and lists of strings) and require the 'pyarrow' package.\n"
+                             "All output is streamed to disk page by page while scraping.",
                         required=False, default=".csv")
     
     parser.add_argument("-f", "--file", type=argparse.FileType('r'),
@@ -45,6 +47,33 @@ def cli_arguments():
                               "The string should contain NO spaces. Also note the requirement of quotation marks when using the less-than (<) or star (*) signs!"),
                         required=False, default="*")
 
+    parser.add_argument("--fields", type=str,
+                        help=("only scrape selected columns, separated by commas. Default is to scrape all columns.\n"
+                              "Fields are column names of the output (case-insensitive) or one of the following short names:\n"
+                              "\t title, year, rating, url \t the Film_title, Release_year, Average_rating and Film_URL columns\n"
+                              "\t film \t\t\t all columns from the film page (title, year, director, cast, genres, etc.)\n"
+                              "\t stats \t\t\t Watches, List_appearances and Likes\n"
+                              "\t histogram \t\t Fans, the rating histogram and Total_ratings\n"
+                              "Only the pages that contain the selected columns are requested, e.g. '--fields title,year,director,rating'\n"
+                              "makes one request per film instead of three. The Film_URL column is always included."),
+                        required=False, default=None)
+
+    parser.add_argument("--list-only", action="store_true",
+                        help=("option to only write out the columns that are found on the list page itself: Position, Film_title, Film_ID, Film_slug,\n"
+                              "Owner_rating and Film_URL. No film pages are requested, so a whole list page of films takes a single request.\n"
+                              "Can not be combined with --fields, --incremental or --queue."),
+                        required=False)
+
+    parser.add_argument("--parser", type=str, choices=["lxml", "bs4"],
+                        help="option to select the extractor backend that parses the film pages. The default 'lxml' backend parses each page once\n"
+                             "and finds all information with precompiled XPath expressions, 'bs4' is the slower BeautifulSoup reference implementation.",
+                        required=False, default="lxml")
+
+    parser.add_argument("--parse-workers", type=int,
+                        help="option to parse the film pages in a pool of worker processes instead of in the scraping threads, so parsing can use multiple CPU cores.\n"
+                             "The threads then only fetch the raw pages. Increase this when scraping with many threads is limited by the CPU. Default value is 0 (no pool).",
+                        required=False, default=0)
+
     parser.add_argument("--concat", action="store_true",
                         help="option to output all the scraped lists into a single concatenated file. An extra column is added that specifies the original list URL.",
                         required=False)
@@ -53,6 +82,116 @@ def cli_arguments():
                         help="option to tweak the number of CPU threads used. Increase this to speed up scraping of multiple lists simultaneously. Default value is 4.",
                         required=False, default=4)
 
+    parser.add_argument("--film-threads", type=int,
+                        help="option to tweak the number of film threads per list thread. Increase this to speed up scraping of large lists. Default value is 1.\n"
+                             "All lists share one pool of (threads * film-threads) film threads, which take films from the lists in turns,\n"
+                             "so a single large list uses all film threads once the other lists are finished.\n"
+                             "Lines of an input file (-f) can add '--priority <n>' to scrape the films of that list before lists with a lower priority (default 0).",
+                        required=False, default=1)
+
+    parser.add_argument("--engine", type=str, choices=["threads", "async"],
+                        help="option to select the scraping engine. The default 'threads' engine uses a pool of threads,\n"
+                             "the 'async' engine runs all requests on a single event loop and requires the 'aiohttp' package.",
+                        required=False, default="threads")
+
+    parser.add_argument("--max-requests", type=int,
+                        help="option to set the maximum amount of requests in flight at the same time when using '--engine async'. Default value is 64.",
+                        required=False, default=64)
+
+    parser.add_argument("--per-host", type=int,
+                        help="option to set the maximum amount of requests in flight to a single host when using '--engine async'. Default value is 16.",
+                        required=False, default=16)
+
+    parser.add_argument("--rate", type=float,
+                        help="option to limit the amount of requests per second to Letterboxd (shared by all threads). Default value is 0 (unlimited).",
+                        required=False, default=0)
+
+    parser.add_argument("--retries", type=int,
+                        help="option to set the maximum amount of retries of a request that failed or was throttled by Letterboxd. Default value is 5.\n"
+                             "Retries honour the 'Retry-After' header if given, otherwise they use an exponential backoff.",
+                        required=False, default=5)
+
+    parser.add_argument("--adaptive", action="store_true",
+                        help="option to adapt the amount of requests in flight to throttling: it is halved whenever Letterboxd throttles a request\n"
+                             "and slowly raised again while requests succeed. Only applies to the default 'threads' engine.",
+                        required=False)
+
+    parser.add_argument("--timeout", type=float,
+                        help="option to set the timeout of a single request in seconds. Default value is 30.",
+                        required=False, default=30)
+
+    parser.add_argument("--cache-dir", type=str,
+                        help="option to turn on the on-disk film cache in the given directory (e.g. '~/.cache/listscraper'). Films that were scraped before are read from the cache instead of requested again.\n"
+                             "By default there is no cache and all films are requested from Letterboxd.",
+                        required=False, default=None)
+
+    parser.add_argument("--cache-ttl", type=float,
+                        help="set the amount of days before the cached film information (title, director, cast, studios, etc.) expires. Default value is 30.",
+                        required=False, default=30)
+
+    parser.add_argument("--stats-ttl", type=float,
+                        help="set the amount of days before the cached film stats (watches, likes, fans, rating histogram, etc.) expire. Default value is 1.",
+                        required=False, default=1)
+
+    parser.add_argument("--cache-size", type=float,
+                        help="set the maximum size of the film cache in MB. The least recently used films are removed first. Default value is 200.",
+                        required=False, default=200)
+
+    parser.add_argument("--no-cache", action="store_true",
+                        help="option to turn off the film cache even if '--cache-dir' is given, all films are requested from Letterboxd.",
+                        required=False)
+
+    parser.add_argument("--resume", action="store_true",
+                        help="option to resume an interrupted run. Run the exact same command again with this flag added. Lists that were finished are skipped,\n"
+                             "the other lists continue after their last completed page and are appended to the existing output file(s).\n"
+                             "Progress is kept in a checkpoint journal in the output directory, which is removed when a run finishes successfully.",
+                        required=False)
+
+    parser.add_argument("--incremental", action="store_true",
+                        help="option to only scrape the films that were added to a list since the previous run. The previous output file of each list is read,\n"
+                             "films that are still in the list are taken from it and films that were removed are left out. Only the list pages are always requested.",
+                        required=False)
+
+    parser.add_argument("--refresh-after", type=float, metavar="DAYS",
+                        help="option to refresh the stats (watches, likes, fans, histogram) of films that were scraped more than DAYS days ago, when using '--incremental'.\n"
+                             "Default is to never refresh them.",
+                        required=False, default=None)
+
+    parser.add_argument("--record", type=str, metavar="ARCHIVE",
+                        help="option to record every response from Letterboxd (list pages, film pages, stats and rating histograms) in a compressed archive (.zip).\n"
+                             "The scrape can then be repeated offline with '--replay'. The film cache is not used while recording.",
+                        required=False, default=None)
+
+    parser.add_argument("--replay", type=str, metavar="ARCHIVE",
+                        help="option to scrape from an archive recorded with '--record' instead of from Letterboxd, e.g. for reproducible benchmarks.\n"
+                             "Pages that are not in the archive are treated as not found. The film cache is not used while replaying.",
+                        required=False, default=None)
+
+    parser.add_argument("--replay-latency", type=float,
+                        help="option to add an artificial latency (in seconds) to every replayed request, to mimic the timing of a real scrape. Default value is 0.",
+                        required=False, default=0)
+
+    parser.add_argument("--metrics", action="store_true",
+                        help="option to print a performance report at the end of the run: the latency, retries and downloaded bytes per endpoint\n"
+                             "(list page, film page, stats and rating histogram), the parse time per film, cache hits and films/s per list.",
+                        required=False)
+
+    parser.add_argument("--metrics-json", type=str, metavar="PATH",
+                        help="option to write the performance report (including the latency histograms) to a JSON file at the end of the run.",
+                        required=False, default=None)
+
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="option to serve the metrics in the Prometheus text format on http://localhost:PORT/metrics while the run is going on,\n"
+                             "e.g. to monitor long-running jobs.",
+                        required=False, default=None)
+
+    parser.add_argument("--queue", type=str, metavar="URL",
+                        help="option to scrape the films on other machines: the list pages are loaded here and their films are pushed to a shared work queue,\n"
+                             "from which the workers ('listscraper worker --queue URL') take them. The output files are still written here, in the original order.\n"
+                             "URL is 'redis://<host>:<port>/<db>' (requires the 'redis' package) or 'sqlite:///<path>' for a SQLite file (e.g. on a shared disk).\n"
+                             "Like in SQLAlchemy, 'sqlite:///queue.db' is relative to the current directory and 'sqlite:////data/queue.db' is an absolute path.",
+                        required=False, default=None)
+
     parser.add_argument("--quiet", action="store_true",
                         help="Stops describing everything the program does and no longer displays tqdm() progression bars.\
                         From testing this does not significantly increase program runtime, meaning this is turned off by default.",
@@ -73,6 +212,80 @@ def cli_arguments():
                         "\t python %(prog)s.py <list-url_1>\n"
                         "\t python %(prog)s.py <list-url_1> <list-url_2> <list-url_3>"))
 
-    args=parser.parse_args()
+    return parser
+
+def cli_arguments():
+    """
+    Function that parses the user-input arguments from the command line interface (CLI)
+    and returns these arguments stored in an 'args' object.
+    """
+
+    args=cli_parser().parse_args()
+
+    return args
+
+def serve_arguments(argv):
+    """
+    Function that parses the arguments of serve mode ('listscraper serve [options]') and returns them stored in an 'args' object.
+    These are the options of the request layer and caches (e.g. --threads, --rate, --cache-dir) that all jobs of the server share,
+    plus the address that the job API listens on. Lists are not given here, but submitted as jobs.
+    """
+
+    parser=cli_parser()
+    parser.prog = "listscraper serve"
+    parser.usage = "%(prog)s [options]"
+
+    group = parser.add_argument_group("serve mode")
+    group.add_argument("--host", type=str,
+                       help="set the host that the job API listens on. Default is 127.0.0.1 (local connections only).",
+                       required=False, default="127.0.0.1")
+
+    group.add_argument("--port", type=int,
+                       help="set the port that the job API listens on. Default value is 8765.",
+                       required=False, default=8765)
+
+    group.add_argument("--socket", type=str, metavar="PATH",
+                       help="option to listen on a Unix socket at PATH instead of on a TCP port.",
+                       required=False, default=None)
+
+    group.add_argument("--output-root", type=str, metavar="PATH",
+                       help="set the directory that all jobs write their output in, the -op of a job is a directory inside it. Default is 'scraper_outputs'.",
+                       required=False, default="scraper_outputs")
+
+    args=parser.parse_args(argv)
+    if args.listURL or args.file:
+        parser.error("lists are submitted as jobs in serve mode, please start the server without list URLs or -f.")
+
+    return args
+
+def worker_arguments(argv):
+    """
+    Function that parses the arguments of worker mode ('listscraper worker --queue URL [options]') and returns them stored in an 'args' object.
+    These are the work queue and the options of the request layer and caches of the worker (e.g. --threads, --rate, --cache-dir).
+    """
+
+    parser=cli_parser()
+    parser.prog = "listscraper worker"
+    parser.usage = "%(prog)s --queue URL [options]"
+
+    group = parser.add_argument_group("worker mode")
+    group.add_argument("--lease", type=float,
+                       help="set the amount of seconds that a film is leased to this worker. If the worker crashes, another worker scrapes the film\n"
+                            "once its lease expired. Default value is 300.",
+                       required=False, default=300)
+
+    group.add_argument("--worker-name", type=str,
+                       help="set the name of the worker in the work queue. Default is '<host>-<pid>'.",
+                       required=False, default=None)
+
+    group.add_argument("--idle-exit", type=float, metavar="SECONDS",
+                       help="option to stop the worker once the queue has been empty for SECONDS seconds. Default is to keep running.",
+                       required=False, default=None)
+
+    args=parser.parse_args(argv)
+    if args.queue is None:
+        parser.error("a worker needs the URL of the work queue, please give it with --queue.")
+    if args.listURL or args.file:
+        parser.error("a worker takes its films from the work queue, please start it without list URLs or -f.")
 
     return args
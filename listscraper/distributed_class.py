@@ -0,0 +1,217 @@
+from listscraper.utility_functions import FILM_PAGE_COLUMNS
+from listscraper.record_class import FilmRecord
+from listscraper.scrape_functions import film_urls, scrape_film_data
+import concurrent.futures
+import threading
+import socket
+import uuid
+import json
+import time
+import os
+
+# Seconds between two polls of the work queue, by the dispatcher for results and by idle workers for tasks
+POLL_INTERVAL = 0.2
+
+# The amount of polls for results in a row that may fail (e.g. a locked database or a lost connection to Redis), with a
+# doubling wait between them, before the films that are waited for are failed
+MAX_POLL_ERRORS = 5
+
+class FilmDispatcher:
+    """
+    The coordinator side of a distributed scrape. The films of every list page are pushed to the shared work queue
+    as soon as the page is loaded, and are scraped by the workers (possibly on other hosts, with their own IP addresses).
+    The list threads of the coordinator still walk the list pages, add the list-specific columns and write out the
+    films in their original order, they only wait for the film information instead of requesting it.
+    A collector thread polls the queue for the results of all films that are waited for. If the queue can not be read,
+    it polls again with a doubling wait, and fails the films that are waited for after MAX_POLL_ERRORS failed polls in a row.
+    The tasks of a run have IDs '<run>:<slug>', they are removed from the queue when the dispatcher is closed.
+
+    Attributes:
+        work_queue (SQLiteWorkQueue/RedisWorkQueue):    The shared work queue.
+        run (str):                                      The ID of this run.
+        log (file):                                     The stream that errors of the collector are printed to, the stdout if None.
+
+    Methods:
+        push(films, not_found, fields, previous):   Pushes the films of a list page to the work queue.
+        result(slug):                               Waits for the film information from the workers and returns it as a FilmRecord.
+        close():                                    Stops the collector thread and removes the tasks of this run from the queue.
+    """
+
+    def __init__(self, work_queue, log=None):
+        self.work_queue = work_queue
+        self.run = uuid.uuid4().hex[:12]
+        self.log = log
+
+        self.lock = threading.Lock()
+        self.futures = {}
+        self.closed = threading.Event()
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def push(self, films, not_found, fields, previous=None):
+        """
+        Pushes the films of a list page to the work queue. Films that were pushed before (e.g. by another list) are skipped,
+        and so are the films of the previous output in incremental mode, as these are not scraped again.
+
+        Parameters:
+            films (list):               The raw <li> HTML strings of the films on the list page.
+            not_found (object):         Either NaN if output is CSV or 'None' if output is JSON.
+            fields (list):              The columns that should be scraped.
+            previous (PreviousOutput):  The previous output of the list in incremental mode, or None.
+        """
+
+        tasks = []
+        for film_html in films:
+            film_url, stats_url, hist_url = film_urls(film_html)
+            slug = film_url.split('/')[-2]
+            if previous and previous.get(slug)[0] is not None:
+                continue
+
+            task_id = f"{self.run}:{slug}"
+            with self.lock:
+                if task_id in self.futures:
+                    continue
+                self.futures[task_id] = concurrent.futures.Future()
+
+            tasks.append((task_id, json.dumps({"slug": slug, "film_url": film_url, "stats_url": stats_url, "hist_url": hist_url,
+                                               "fields": fields, "not_found": not_found})))
+        if tasks:
+            self.work_queue.push(tasks)
+
+    def result(self, slug):
+        """
+        Waits for the film information from the workers and returns it as a FilmRecord.
+        Raises a RuntimeError if the workers could not scrape the film.
+        """
+
+        with self.lock:
+            future = self.futures[f"{self.run}:{slug}"]
+        return future.result()
+
+    def collect(self):
+        errors = 0
+        while not self.closed.wait(POLL_INTERVAL * 2 ** errors):
+            with self.lock:
+                waiting = [task_id for task_id, future in self.futures.items() if not future.done()]
+            if not waiting:
+                continue
+
+            # The list threads wait for these futures, so the collector never stops on an error of the queue
+            try:
+                finished = self.work_queue.results(waiting)
+            except Exception as e:
+                errors += 1
+                print(f"    Error while polling the work queue for results ({errors}/{MAX_POLL_ERRORS}): {e!r}", file=self.log)
+                if errors == MAX_POLL_ERRORS:
+                    for task_id in waiting:
+                        self.futures[task_id].set_exception(RuntimeError(f"The result of {task_id.split(':', 1)[1]} could not be read from the work queue: {e!r}"))
+                    errors = 0
+                continue
+            errors = 0
+
+            for task_id, (result, error) in finished.items():
+                if error is not None:
+                    self.futures[task_id].set_exception(RuntimeError(f"The workers could not scrape {task_id.split(':', 1)[1]}: {error}"))
+                    continue
+                try:
+                    self.futures[task_id].set_result(record_from_columns(json.loads(result)))
+                except Exception as e:
+                    self.futures[task_id].set_exception(RuntimeError(f"The workers returned an invalid result for {task_id.split(':', 1)[1]}: {e!r}"))
+
+    def close(self):
+        self.closed.set()
+        self.collector.join()
+        self.work_queue.remove(list(self.futures))
+        self.work_queue.close()
+
+class FilmWorker:
+    """
+    The worker side of a distributed scrape. Worker threads lease films from the shared work queue, scrape their general
+    information and stats with the request layer and film cache of this worker, and store the result in the queue.
+    A lease expires after a while, so the films of a worker that crashed are scraped by another worker.
+    A film that failed is released right away and tried again, at most MAX_ATTEMPTS times.
+
+    Attributes:
+        work_queue (SQLiteWorkQueue/RedisWorkQueue):    The shared work queue.
+        resources (ScrapeResources):                    The request layer and caches of this worker.
+        name (str):                                     The name of the worker, '<host>-<pid>' by default.
+        lease (float):                                  The duration of a lease in seconds.
+        idle_exit (float):                              Seconds without tasks after which the worker stops, None to never stop.
+        done (int):                                     The amount of films that were scraped.
+        failed (int):                                   The amount of failed attempts.
+
+    Methods:
+        run(threads):   Scrapes films with a number of worker threads until the worker is stopped (or idle for idle_exit seconds).
+        stop():         Stops the worker threads after their current film.
+    """
+
+    def __init__(self, work_queue, resources, name=None, lease=300, idle_exit=None):
+        self.work_queue = work_queue
+        self.resources = resources
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease = lease
+        self.idle_exit = idle_exit
+        self.done = 0
+        self.failed = 0
+
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def run(self, threads):
+        workers = [threading.Thread(target=self.work, daemon=True) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(1)
+        finally:
+            self.stop()
+            for worker in workers:
+                worker.join()
+
+    def work(self):
+        idle_since = time.time()
+        while not self.stopped.is_set():
+            task = self.work_queue.lease(self.name, self.lease)
+            if task is None:
+                if self.idle_exit is not None and time.time() - idle_since > self.idle_exit:
+                    return
+                self.stopped.wait(POLL_INTERVAL)
+                continue
+
+            task_id, payload = task
+            try:
+                values = self.scrape(json.loads(payload))
+            except Exception as e:
+                print(f"    Error while scraping {task_id.split(':', 1)[1]}: {e!r}")
+                self.work_queue.fail(task_id, repr(e))
+                with self.lock:
+                    self.failed += 1
+            else:
+                self.work_queue.complete(task_id, json.dumps(values))
+                with self.lock:
+                    self.done += 1
+            idle_since = time.time()
+
+    def scrape(self, task):
+        """
+        Scrapes the general information and stats of a film and returns the values of the selected columns.
+        """
+
+        resources = self.resources
+        record = scrape_film_data(resources.transport, task["slug"], task["film_url"], task["stats_url"], task["hist_url"], task["not_found"],
+                                  resources.cache, task["fields"], resources.parser, resources.parse_pool, resources.metrics)
+        return record.columns(task["fields"])
+
+    def stop(self):
+        self.stopped.set()
+
+def record_from_columns(values):
+    """
+    Builds a FilmRecord from the column values that a worker returned.
+    """
+
+    meta = {column: value for column, value in values.items() if column in FILM_PAGE_COLUMNS}
+    stats = {column: value for column, value in values.items() if column not in meta}
+    return FilmRecord(meta, stats)
@@ -0,0 +1,115 @@
+from listscraper.utility_functions import STATS_COLUMNS, HISTOGRAM_COLUMNS
+from listscraper.writer_class import read_output
+import threading
+import json
+import time
+import os
+
+class PreviousOutput:
+    """
+    The previous output of a list, used by the '--incremental' mode to only scrape the films that changed since the last run.
+    Films that are still in the list are taken from the previous output file instead of scraped again, new films are scraped
+    and films that were removed from the list are left out. Optionally, the stats of films that were scraped longer ago than
+    'refresh_after' are refreshed (only their stats and rating histogram pages are requested).
+    The time at which every film was scraped is kept in a hidden file next to the output file.
+    The new output is written to a temporary file, which only replaces the previous output file when the list is finished.
+
+    Attributes:
+        outpath (str):          The path of the output file.
+        temppath (str):         The path of the temporary file that the new output is written to.
+        statepath (str):        The path of the file with the scrape time of every film.
+        films (dict):           The films of the previous output, keyed by their slug.
+        scraped_at (dict):      The time at which every film was scraped, keyed by their slug.
+        refresh_after (float):  Seconds after which the stats of a film are refreshed, or None to never refresh them.
+        refresh_fields (list):  The selected stats columns, which are the columns that are refreshed.
+        counts (dict):          The amount of films that were "added", "refreshed" and "reused".
+
+    Methods:
+        get(slug):              Returns the previous film and whether its stats should be refreshed.
+        record(slug, kind):     Records how a film was obtained.
+        removed():              Returns the amount of films of the previous output that are no longer in the list.
+        finish():               Replaces the previous output file and saves the scrape times.
+    """
+
+    def __init__(self, outpath, output_file_extension, fields, refresh_after=None, log=None):
+        """
+        Reads the previous output file and scrape times of a list.
+        If the previous output has different columns than the selected fields, all films are scraped again.
+
+        Parameters:
+            outpath (str):                  The path of the output file.
+            output_file_extension (str):    Type of output file.
+            fields (list):                  The columns that are scraped.
+            refresh_after (float):          Days after which the stats of a film are refreshed. Default is to never refresh them.
+            log (file):                     The stream that the progress is printed to. Default is None (stdout).
+        """
+
+        self.outpath = outpath
+        self.temppath = outpath + ".part"
+        directory, filename = os.path.split(outpath)
+        self.statepath = os.path.join(directory, f".{filename}.scraped_at.json")
+
+        self.refresh_after = refresh_after * 86400 if refresh_after is not None else None
+        self.refresh_fields = [column for column in fields if column in STATS_COLUMNS + HISTOGRAM_COLUMNS]
+        self.counts = {"added": 0, "refreshed": 0, "reused": 0}
+        self.seen = set()
+        self.lock = threading.Lock()
+        self.log = log
+
+        films = read_output(outpath, output_file_extension)
+        if films and list(films[0].keys()) != list(fields):
+            print(f"        The columns of {outpath} differ from the selected fields, all films are scraped again.", file=self.log)
+            films = []
+        self.films = {film["Film_URL"].split('/')[-2]: film for film in films}
+
+        # Films of an output without scrape times (e.g. from a full scrape) count as scraped when the file was written
+        self.scraped_at = {}
+        if os.path.exists(self.statepath):
+            with open(self.statepath, encoding="utf-8") as f:
+                self.scraped_at = json.load(f)
+        if self.films:
+            modified = os.path.getmtime(outpath)
+            self.scraped_at = {slug: self.scraped_at.get(slug, modified) for slug in self.films}
+
+    def get(self, slug):
+        """
+        Returns the film from the previous output and whether its stats should be refreshed.
+
+        Returns:
+            film (dict):    The previous information of the film, or None if the film is new.
+            stale (bool):   True if the stats of the film are selected and older than 'refresh_after'.
+        """
+
+        with self.lock:
+            self.seen.add(slug)
+            film = self.films.get(slug)
+
+        stale = (film is not None and self.refresh_after is not None and self.refresh_fields != []
+                 and time.time() - self.scraped_at.get(slug, 0) > self.refresh_after)
+        return film, stale
+
+    def record(self, slug, kind):
+        """
+        Records how a film was obtained: "added" (new film), "refreshed" (stats were refreshed) or "reused" (unchanged).
+        """
+
+        with self.lock:
+            self.counts[kind] += 1
+            if kind != "reused":
+                self.scraped_at[slug] = time.time()
+
+    def removed(self):
+        return len(self.films.keys() - self.seen)
+
+    def finish(self):
+        """
+        Replaces the previous output file with the new output and saves the scrape times of all films that are still in the list.
+        """
+
+        if os.path.exists(self.temppath):
+            os.replace(self.temppath, self.outpath)
+
+        with open(self.statepath, "w", encoding="utf-8") as f:
+            json.dump({slug: self.scraped_at[slug] for slug in self.seen if slug in self.scraped_at}, f)
+
+        print(f"        {self.counts['added']} new, {self.counts['refreshed']} refreshed, {self.counts['reused']} unchanged and {self.removed()} removed films.", file=self.log)
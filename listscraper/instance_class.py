@@ -1,11 +1,13 @@
 from listscraper.list_class import List
+from listscraper.writer_class import open_writer
+from listscraper.journal_class import Journal
+from listscraper.utility_functions import LIST_PAGE_COLUMNS
 import listscraper.checkimport_functions as cef
 import concurrent.futures # for pool of threads
+import importlib.util
 import time
 import sys
 import os
-import csv
-import json
 
 class ScrapeInstance:
     """
@@ -22,21 +24,60 @@ class ScrapeInstance:
         concat (bool):                  Option to turn on list concatenation read from optional '--concat' flag. Default is False.
         quiet(bool):                    Turn off tqdm loading bars read from optional '-vo' flag. Default is False.
         threads (int):                  Amount of threads used for scraping read from optional '--threads' flag. Default is 4. 
+        film_threads (int):             Amount of film threads per list thread, shared by all lists, read from optional '--film-threads' flag. Default is 1.
+        engine (str):                   Scraping engine read from optional '--engine' flag, either "threads" or "async". Default is "threads".
+        max_requests (int):             Maximum amount of requests in flight for the async engine, read from optional '--max-requests' flag. Default is 64.
+        per_host (int):                 Maximum amount of requests in flight to a single host for the async engine, read from optional '--per-host' flag. Default is 16.
+        cache_dir (str):                Directory of the on-disk film cache read from optional '--cache-dir' flag. Default is None (no cache).
+        cache_ttl (float):              Days before the cached general film information expires, read from optional '--cache-ttl' flag. Default is 30.
+        stats_ttl (float):              Days before the cached film stats expire, read from optional '--stats-ttl' flag. Default is 1.
+        cache_size (float):             Maximum size of the film cache in MB read from optional '--cache-size' flag. Default is 200.
+        no_cache (bool):                Turn off the film cache read from optional '--no-cache' flag. Default is False.
+        resume (bool):                  Resume an interrupted run using its checkpoint journal, read from optional '--resume' flag. Default is False.
+        rate (float):                   Maximum amount of requests per second read from optional '--rate' flag. Default is 0 (unlimited).
+        retries (int):                  Maximum amount of retries of a failed request read from optional '--retries' flag. Default is 5.
+        adaptive (bool):                Adjust the amount of requests in flight to throttling, read from optional '--adaptive' flag. Default is False.
+        timeout (float):                Timeout of a single request in seconds read from optional '--timeout' flag. Default is 30.
+        fields (list):                  The columns that should be scraped, read from optional '--fields' flag. Default is all columns.
+        parser (str):                   The extractor backend used to parse the film pages, read from optional '--parser' flag. Default is "lxml".
+        parse_workers (int):            Amount of processes used to parse the film pages, read from optional '--parse-workers' flag. Default is 0 (parse in the scraping threads).
+        record (str):                   Path of the archive that all responses are recorded in, read from optional '--record' flag. Default is no recording.
+        replay (str):                   Path of the archive that responses are served from instead of Letterboxd, read from optional '--replay' flag. Default is None.
+        replay_latency (float):         Artificial latency of every replayed request in seconds, read from optional '--replay-latency' flag. Default is 0.
+        metrics (bool):                 Print a performance report at the end of the run, read from optional '--metrics' flag. Default is False.
+        metrics_json (str):             Path of the JSON performance report, read from optional '--metrics-json' flag. Default is no report.
+        metrics_port (int):             Port on which the metrics are served in the Prometheus text format, read from optional '--metrics-port' flag. Default is None.
+        incremental (bool):             Only scrape the films that are not in the previous output files, read from optional '--incremental' flag. Default is False.
+        refresh_after (float):          Days after which the stats of a film are refreshed in incremental mode, read from optional '--refresh-after' flag. Default is never.
+        queue (str):                    URL of the shared work queue of a distributed scrape, read from optional '--queue' flag. Default is None (films are scraped locally).
+        list_only (bool):               Only write out the columns that are found on the list page, without any film requests, read from optional '--list-only' flag. Default is False.
+        log (file):                     The stream that the progress of the run is printed to, e.g. the log of a job in serve mode. Default is None (stdout).
 
     Methods:
         import_from_infile(infile):
             Imports the list URLs and their options from the .txt file into List objects.
         import_from_commandline(inputURLs):
             Imports the list URLs and their options from the command line into List objects.
-        concatenate_lists():
-            Concatenates all the films in the List objects into one big list.
+        import_users(listobjs):
+            Replaces every user by List objects of the user's films, watchlist and all public lists.
         scrape_all_and_writeout(listobjs, maxworkers=4):
-            Scrapes all the films from the List objects using their LB link.
+            Scrapes all the films from the List objects using their LB link and streams them to file(s).
+        scrape_and_write_list(listobj):
+            Scrapes a single List object and streams its films to file.
+        scrape_all_async(listobjs):
+            Scrapes all the films from the List objects on a single event loop.
+        report_metrics():
+            Prints and/or writes out the performance metrics of the run.
     """
 
-    def __init__(self, inputURLs, pages, output_name, output_path, output_file_extension, infile, concat, quiet, threads):
+    def __init__(self, inputURLs, pages, output_name, output_path, output_file_extension, infile, concat, quiet, threads, film_threads=1, engine="threads", max_requests=64, per_host=16,
+                 cache_dir=None, cache_ttl=30, stats_ttl=1, cache_size=200, no_cache=False, resume=False,
+                 rate=0, retries=5, adaptive=False, timeout=30, fields=None, parser="lxml", parse_workers=0,
+                 record=None, replay=None, replay_latency=0, metrics=False, metrics_json=None, metrics_port=None,
+                 incremental=False, refresh_after=None, resources=None, queue=None, list_only=False, log=None):
         """
         Initializes the program by running various checks if input values and syntax were correct.
+        The request layer and caches are opened for this run, unless the shared resources of a long-running server are given.
 
         (new) Attributes:
 
@@ -44,6 +85,14 @@ class ScrapeInstance:
             global_output_name (str):   The output name that will be used if no '-on' input was given.
 
             Nthreads (int):             The amount of worker threads that should be used for scraping.
+            Nfilmthreads (int):         The amount of film threads per list thread, all lists share a pool of (Nthreads * Nfilmthreads) film threads.
+            resources (ScrapeResources):    The request layer and caches of the run (or of the server), see ScrapeResources.
+            limiter, transport, archive, cache, responses, parse_pool, metrics:
+                                        The resources, kept as attributes of the instance for the scrape methods.
+            memo (FilmMemo):            The in-process memo that makes all lists share a single scrape per film.
+            scheduler (FilmScheduler):  The global scheduler whose threads scrape the films of all lists (threads engine only).
+            dispatcher (FilmDispatcher):    The dispatcher that pushes the films to the workers of a distributed scrape, None otherwise.
+            journal (Journal):          The checkpoint journal in the output directory, used to resume interrupted runs.
             starttime(time.obj):        Time at the start of the program.
             lists_to_scrape (list):     Collection of all imported List objects that should be scraped.
             endtime (time.obj):         Time at the end of the program.
@@ -56,12 +105,69 @@ class ScrapeInstance:
         self.infile = infile
         self.concat = concat
         self.quiet = quiet
+        self.resume = resume
+        self.incremental = incremental
+        self.refresh_after = refresh_after
+        self.log = log
 
         output_file_extension_check, self.output_file_extension = cef.checkimport_output_output_file_extension(output_file_extension)
         if not output_file_extension_check:
             sys.exit(f"    Incorrect output file extension was given. Please check and try again.")  
+
+        fields_check, self.fields = cef.checkimport_fields(fields)
+        if not fields_check:
+            sys.exit(f"    Unknown field(s) were given with --fields. Please use the column names of the output or 'title', 'year', 'rating', 'film', 'stats' or 'histogram'.")
+        if list_only:
+            if fields is not None:
+                sys.exit("    A --list-only scrape always writes out the columns of the list page, please leave out --fields.")
+            self.fields = LIST_PAGE_COLUMNS
         
         self.Nthreads = threads
+        self.Nfilmthreads = film_threads
+        self.engine = engine
+        self.max_requests = max_requests
+        self.per_host = per_host
+        self.retries = retries
+        self.timeout = timeout
+        self.parser = parser
+        self.parse_workers = parse_workers
+        self.replay_latency = replay_latency
+        self.print_metrics = metrics
+        self.metrics_json = metrics_json
+
+        # A server keeps the settings of the request layer and caches that it was started with
+        if resources:
+            self.Nthreads, self.Nfilmthreads, self.engine = resources.threads, resources.film_threads, resources.engine
+            self.max_requests, self.per_host, self.retries, self.timeout = resources.max_requests, resources.per_host, resources.retries, resources.timeout
+            self.parser, self.parse_workers = resources.parser, resources.parse_workers
+            cache_dir, no_cache, rate, adaptive = resources.cache_dir, resources.cache is None, resources.rate, resources.adaptive
+            record, replay, replay_latency = resources.record, resources.replay, resources.replay_latency
+            self.replay_latency = replay_latency
+            metrics, metrics_json, metrics_port = resources.metrics is not None, None, None
+            self.print_metrics, self.metrics_json = False, None
+
+        if incremental and (concat or resume):
+            sys.exit("    The --incremental mode can not be combined with --concat or --resume.")
+        if refresh_after is not None and not incremental:
+            sys.exit("    The --refresh-after flag can only be used in --incremental mode.")
+        if list_only and (incremental or queue):
+            sys.exit("    A --list-only scrape makes no film requests, so it can not be combined with --incremental or --queue.")
+
+        if record and replay:
+            sys.exit("    Please use either --record or --replay, not both.")
+        if queue and self.engine == "async":
+            sys.exit("    A distributed scrape (--queue) uses the threads engine, please leave out --engine async.")
+        if replay and not os.path.exists(replay):
+            sys.exit(f"    The replay archive {replay} does not exist. Please check and try again.")
+
+        # Recording and replaying bypass the cache, so every response is recorded and replays are deterministic
+        use_cache = not (no_cache or cache_dir is None or record or replay)
+
+        if self.engine == "async" and importlib.util.find_spec("aiohttp") is None:
+            sys.exit("    The async engine requires the 'aiohttp' package. Please install it with 'pip install aiohttp' and try again.")
+        if self.output_file_extension in {".parquet", ".arrow"} and importlib.util.find_spec("pyarrow") is None:
+            sys.exit("    The .parquet and .arrow output formats require the 'pyarrow' package. Please install it with 'pip install pyarrow' and try again.")
+
         self.starttime = time.time()
 
         self.lists_to_scrape = []
@@ -71,12 +177,25 @@ class ScrapeInstance:
         else:
             infilename = None
 
-        print(f"        infile:         {infilename}")
-        print(f"        output_path:    {self.output_path}")
-        print(f"        concat:         {self.concat}")
-        print(f"        threads:        {self.Nthreads}")
-        print(f"        verbose:        {not self.quiet}")
-        print("=============================================\n")
+        print(f"        infile:         {infilename}", file=self.log)
+        print(f"        output_path:    {self.output_path}", file=self.log)
+        print(f"        concat:         {self.concat}", file=self.log)
+        print(f"        threads:        {self.Nthreads}", file=self.log)
+        print(f"        film_threads:   {self.Nfilmthreads}", file=self.log)
+        print(f"        engine:         {self.engine}", file=self.log)
+        print(f"        parser:         {self.parser}", file=self.log)
+        print(f"        parse_workers:  {self.parse_workers}", file=self.log)
+        print(f"        fields:         {'all' if fields is None and not list_only else ','.join(self.fields)}", file=self.log)
+        print(f"        rate_limit:     {str(rate) + ' requests/s' if rate else None}{' (adaptive)' if adaptive else ''}", file=self.log)
+        print(f"        cache:          {cache_dir if use_cache else None}", file=self.log)
+        print(f"        resume:         {self.resume}", file=self.log)
+        print(f"        incremental:    {self.incremental}{f' (refresh stats after {refresh_after} days)' if refresh_after is not None else ''}", file=self.log)
+        print(f"        record:         {record}", file=self.log)
+        print(f"        replay:         {replay}{f' (latency {replay_latency} s)' if replay else ''}", file=self.log)
+        print(f"        queue:          {queue}", file=self.log)
+        print(f"        metrics:        {'on' if (metrics or metrics_json or metrics_port) else None}{f' (port {metrics_port})' if metrics_port else ''}", file=self.log)
+        print(f"        verbose:        {not self.quiet}", file=self.log)
+        print("=============================================\n", file=self.log)
 
         # Checks if only .txt or only command line URL were given
         if self.infile and self.inputURLs:
@@ -94,13 +213,53 @@ class ScrapeInstance:
         else:
             sys.exit("No scrapable URLs were provided! Please type 'python main.py --help' for more information")
 
-        print("Initialization successful!\n")
+        print("Initialization successful!\n", file=self.log)
 
         #=== Scraping and writing to file ===#
 
+        # The request layer and its dependencies are only imported once all input is valid, so '--help' and input errors return quickly
+        from listscraper.memo_class import FilmMemo
+
+        own_resources = resources is None
+        if own_resources:
+            resources = ScrapeResources(self.Nthreads, self.Nfilmthreads, self.engine, self.max_requests, self.per_host, cache_dir if use_cache else None, cache_ttl, stats_ttl, cache_size,
+                                        rate, self.retries, adaptive, self.timeout, self.parser, self.parse_workers, record, replay, self.replay_latency,
+                                        metrics or metrics_json or metrics_port, metrics_port, self.resume)
+        self.resources = resources
+        self.limiter, self.transport, self.archive = resources.limiter, resources.transport, resources.archive
+        self.limiter.log = self.log
+        self.cache, self.responses, self.parse_pool, self.metrics = resources.cache, resources.responses, resources.parse_pool, resources.metrics
+        self.memo = FilmMemo()
+
+        # In a distributed scrape the films are scraped by the workers, which take them from the shared work queue
+        if queue:
+            from listscraper.workqueue_class import open_work_queue
+            from listscraper.distributed_class import FilmDispatcher
+            self.dispatcher = FilmDispatcher(open_work_queue(queue), self.log)
+            print(f"Films are scraped by the workers of {queue}, start them with 'python -m listscraper worker --queue {queue}'.\n", file=self.log)
+        else:
+            self.dispatcher = None
+
         # Create output dir if necessary
         os.makedirs(self.output_path, exist_ok=True)
-        self.scrape_all_and_writeout(self.lists_to_scrape, self.Nthreads)
+        self.journal = Journal(self.output_path, self.resume)
+
+        self.lists_to_scrape, failed = self.import_users(self.lists_to_scrape)
+        failed += self.scrape_all_and_writeout(self.lists_to_scrape, self.Nthreads)
+        if self.dispatcher:
+            self.dispatcher.close()
+        if own_resources:
+            if self.metrics:
+                self.report_metrics()
+            resources.close()
+
+        # The journal is kept if any list failed, so the run can be resumed
+        if failed:
+            self.journal.close()
+            if self.incremental:
+                sys.exit(f"\n    Scraping of {failed} list(s) failed, their previous output was kept. Run the same command again to retry them.")
+            sys.exit(f"\n    Scraping of {failed} list(s) failed. Run the same command with '--resume' to continue where it stopped.")
+        self.journal.remove()
 
         self.endtime = time.time()
 
@@ -108,7 +267,7 @@ class ScrapeInstance:
     def import_from_infile(self, infile):
         """
         Imports the lines from a .txt file into List objects. 
-        Each line can contain specific list URLs and option flags (-p or -on) referring to that list.
+        Each line can contain specific list URLs and option flags (-p, -on or --priority) referring to that list.
         Lines starting with a "#" will be skipped.
 
         Parameters:
@@ -128,7 +287,7 @@ class ScrapeInstance:
         self.url_total = len(final_lines)
         self.url_count = 1
 
-        print(f"A total of {self.url_total} URLs were read-in from {self.infile.name}!\n")
+        print(f"A total of {self.url_total} URLs were read-in from {self.infile.name}!\n", file=self.log)
 
         for line in final_lines:
             chunks = line.split(' ')
@@ -150,8 +309,17 @@ class ScrapeInstance:
             else:
                 output_name = self.global_output_name
 
+            # Check for priority option on this line
+            if ("--priority" in chunks):
+                try:
+                    priority = int(chunks[chunks.index("--priority") + 1])
+                except (IndexError, ValueError):
+                    sys.exit(f"    The priority of {url} should be a whole number. Please try again!")
+            else:
+                priority = 0
+
             self.lists_to_scrape.append(List(url, page_options, output_name, self.global_output_name, self.output_file_extension, 
-                                             self.url_total, self.url_count, self.concat))
+                                             self.url_total, self.url_count, self.concat, priority, self.log))
             self.url_count += 1
 
     def import_from_commandline(self, inputURLs):
@@ -165,63 +333,286 @@ class ScrapeInstance:
         self.url_total = len(inputURLs)
         self.url_count = 1
 
-        print(f"A total of {self.url_total} URLs were found!\n")
+        print(f"A total of {self.url_total} URLs were found!\n", file=self.log)
 
         for url in inputURLs:
             self.lists_to_scrape.append(List(url, self.global_page_options, self.global_output_name, self.global_output_name, self.output_file_extension, 
-                                             self.url_total, self.url_count, self.concat))
+                                             self.url_total, self.url_count, self.concat, 0, self.log))
             self.url_count += 1
 
-    def concatenate_lists(self):
+    def import_users(self, list_objs):
         """
-        Concatenates all the films in the scraped List objects together. 
+        Replaces every user (given by the URL of their lists overview, 'https://letterboxd.com/<user>/lists/') by List objects
+        of the user's films, watchlist and all public lists. The lists of all users are discovered concurrently and then scraped
+        together with the other lists, so films that appear in multiple lists or users are only scraped once.
+        The output files of a user are written to a directory named after the user, the page selection and priority of the user apply to all of its lists.
+
+            Parameters:
+                list_objs (list):   The collection of imported List objects.
+
+            Returns:
+                list_objs (list):   The List objects with every user replaced by its lists.
+                failed (int):       The amount of users whose lists could not be discovered.
         """
 
-        self.concat_lists = []
-        for i, list in enumerate(self.lists_to_scrape):
-            if i == 0:
-                self.concat_lists.extend(list.films)
-            else:
-                self.concat_lists.extend(list.films[1:])
+        from listscraper.scrape_functions import scrape_user_lists
+
+        users = [listobj for listobj in list_objs if listobj.type == "user"]
+        if users == []:
+            return list_objs, 0
+
+        print(f"Discovering the lists of {len(users)} user(s)...\n", file=self.log)
+        with concurrent.futures.ThreadPoolExecutor(self.Nthreads) as executor:
+            futures = {user: executor.submit(scrape_user_lists, self.transport, user.url, user.username) for user in users}
+
+        user_list_objs = []
+        failed = 0
+        for listobj in list_objs:
+            if listobj.type != "user":
+                user_list_objs.append(listobj)
+                continue
+
+            try:
+                list_urls = futures[listobj].result()
+            except Exception as e:
+                print(f"    Error while discovering the lists of {listobj.username}: {e!r}", file=self.log)
+                failed += 1
+                continue
+
+            user_url = "/".join(listobj.url.split('/')[:4]) + "/"
+            urls = [user_url + "films/", user_url + "watchlist/"] + list_urls
+            print(f"Found {len(list_urls)} public list(s) of {listobj.username}!\n", file=self.log)
+
+            os.makedirs(os.path.join(self.output_path, listobj.username), exist_ok=True)
+            for url_count, url in enumerate(urls, 1):
+                output_name = os.path.join(listobj.username, cef.checkimport_url(url)[3])
+                user_list_objs.append(List(url, listobj.pagestring, output_name, self.global_output_name, self.output_file_extension,
+                                           len(urls), url_count, self.concat, listobj.priority, self.log))
+
+        return user_list_objs, failed
 
     def scrape_all_and_writeout(self, list_objs, max_workers=4):
         """
-        Starts the scraping of all lists from Letterboxd and subsequently writes out to file(s).
+        Starts the scraping of all lists from Letterboxd and streams their films to file(s) while scraping.
+        If concat is enabled, all lists stream into one shared file.
+        When resuming, lists that were finished in the interrupted run are skipped.
 
             Parameters:
                 target_lists (list):   The collection of List objects that have to be scraped.
                 max_workers (int):     The max amount of threads to generate (default = 4).
+
+            Returns:
+                failed (int):           The amount of lists for which scraping failed.
         """
-        print(f"Starting the scraping process with {max_workers} available threads...\n")
 
-        # Writes out when each list has been scraped
-        if self.concat == False:
+        if self.resume:
+            for listobj in list_objs:
+                entry = self.journal.entry(listobj.journal_key())
+                if entry and entry["done"]:
+                    print(f"    Skipping {listobj.url}, it was already finished.", file=self.log)
 
-            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
-                _ = [executor.submit(listobj.scrape_and_write, self.output_path, self.quiet, self.concat) for listobj in list_objs]
-
-        # Waits for all lists to finish before writing out
-        elif self.concat == True:
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
-                _ = [executor.submit(listobj.scrape, self.quiet, self.concat) for listobj in list_objs]
+        if self.concat == True:
 
-            self.concatenate_lists()
-            
             # Checks if manual name for concatenated file was given, and otherwise uses a default
             if self.global_output_name == None:
                 self.global_output_name = "concatenated_lists"
 
-            # Write out to path
             outpath = os.path.join(self.output_path, self.global_output_name + self.output_file_extension)
-            if self.output_file_extension == ".json":
-                with open(outpath, "w", encoding="utf-8") as jsonf:
-                    jsonf.write(json.dumps(self.concat_lists, indent=4, ensure_ascii=False))
+            # The lists write to the file in turns, so the last recorded page of any list is the end of the recorded films
+            entries = [self.journal.entry(listobj.journal_key()) for listobj in list_objs if self.journal.entry(listobj.journal_key())]
+            position = max(entry["position"] for entry in entries) if entries else None
+            self.concat_writer = open_writer(outpath, self.output_file_extension, entries != [], position)
+
+        # Scrapes all lists on one event loop
+        if self.engine == "async":
+            import asyncio
+            print(f"Starting the scraping process with at most {self.max_requests} requests in flight...\n", file=self.log)
+            results = asyncio.run(self.scrape_all_async(list_objs))
+
+        # The list threads walk the list pages and write out the films, while the films of all lists are scraped
+        # by the workers of one global scheduler, so a large list is not limited to the film threads of a single list
+        else:
+            from listscraper.scheduler_class import FilmScheduler
+
+            self.scheduler = FilmScheduler(max_workers * self.Nfilmthreads)
+            print(f"Starting the scraping process with {max_workers} list threads and {self.scheduler.workers} film threads...\n", file=self.log)
+
+            # Lists with a higher priority are started first, the other lists keep their input order
+            order = sorted(list_objs, key=lambda listobj: -listobj.priority)
+            with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+                futures = {listobj: executor.submit(self.scrape_and_write_list, listobj) for listobj in order}
+            self.scheduler.close()
+            results = [futures[listobj].exception() for listobj in list_objs]
+
+        failed = 0
+        for listobj, result in zip(list_objs, results):
+            if isinstance(result, BaseException):
+                print(f"    Error while scraping {listobj.url}: {result!r}", file=self.log)
+                failed += 1
+
+        if self.concat == True:
+            self.concat_writer.close()
+
+            if sum(listobj.film_count for listobj in list_objs) == 0:
+                print(f"    No films found to write out. Please try a different selection.", file=self.log)
+            else:
+                print(f"    Written concatenated lists to {self.global_output_name}{self.output_file_extension}!", file=self.log)
+
+        return failed
+
+    def scrape_and_write_list(self, listobj):
+        """
+        Scrapes a single list and streams its films to its own file, or to the shared file if concat is enabled.
+        The films of the list are scraped by the global film scheduler, through the queue of the list.
+
+            Parameters:
+                listobj (List):     The List object that has to be scraped.
+        """
+
+        film_queue = self.scheduler.queue(listobj.journal_key(), listobj.priority)
+        if self.concat == True:
+            listobj.scrape(self.transport, self.concat_writer, self.quiet, self.concat, self.Nfilmthreads, self.cache, self.memo, self.journal, self.fields, self.parser, self.parse_pool, self.metrics, None, film_queue, self.dispatcher)
+        else:
+            previous = listobj.load_previous(self.output_path, self.fields, self.refresh_after) if self.incremental else None
+            listobj.scrape_and_write(self.transport, self.output_path, self.quiet, self.concat, self.Nfilmthreads, self.cache, self.memo, self.journal, self.fields, self.parser, self.parse_pool, self.metrics, previous, film_queue, self.dispatcher)
+
+    async def scrape_all_async(self, list_objs):
+        """
+        Scrapes all lists concurrently on a single event loop, sharing one aiohttp session for all requests.
+
+            Parameters:
+                list_objs (list):   The collection of List objects that have to be scraped.
+
+            Returns:
+                results (list):     For each list None, or the exception that made its scraping fail.
+        """
+
+        async def scrape_one(listobj):
+            if self.concat == True:
+                await listobj.scrape_async(transport, self.concat_writer, self.quiet, self.concat, self.cache, self.memo, self.journal, self.fields, self.parser, self.parse_pool, self.metrics)
             else:
-                header = list( self.concat_lists[0].keys() )
-                with open(outpath, 'w', newline="", encoding = "utf-8") as f:
-                    write = csv.DictWriter(f, delimiter=",", fieldnames=header)
-                    write.writeheader()
-                    write.writerows(self.concat_lists)
-            
-            return print(f"    Written concatenated lists to {self.global_output_name}{self.output_file_extension}!")
+                previous = listobj.load_previous(self.output_path, self.fields, self.refresh_after) if self.incremental else None
+                writer = listobj.open_output(self.output_path, self.journal, previous)
+                try:
+                    await listobj.scrape_async(transport, writer, self.quiet, self.concat, self.cache, self.memo, self.journal, self.fields, self.parser, self.parse_pool, self.metrics, previous)
+                except:
+                    writer.close()
+                    raise
+                listobj.close_output(writer, previous)
+
+        from listscraper.transport_class import AsyncTransport, AsyncReplayTransport
+        import asyncio
+
+        if self.archive and self.archive.mode == "r":
+            async_transport = AsyncReplayTransport(self.archive, self.replay_latency, self.metrics)
+        else:
+            async_transport = AsyncTransport(self.max_requests, self.per_host, self.limiter, self.retries, self.timeout, self.archive, self.metrics, self.responses)
+
+        async with async_transport as transport:
+            return await asyncio.gather(*[scrape_one(listobj) for listobj in list_objs], return_exceptions=True)
+
+    def report_metrics(self):
+        """
+        Prints the summary table of the performance metrics and/or writes them to the JSON report.
+        """
+
+        if self.print_metrics:
+            print("\nPerformance report:", file=self.log)
+            print(self.metrics.summary(), file=self.log)
+
+        if self.metrics_json:
+            self.metrics.write_json(self.metrics_json)
+            print(f"    Written performance report to {self.metrics_json}!", file=self.log)
+
+class ScrapeResources:
+    """
+    The request layer and caches of the scraper: the rate limiter, the pooled HTTP session, the film and response caches,
+    the archive of recorded responses, the pool of parse processes and the performance metrics.
+    A ScrapeInstance normally opens them for a single run. A long-running server opens them once and all of its jobs share them,
+    so the connections, caches and rate limiter stay warm between jobs.
+
+    Attributes:
+        (settings):                 The settings that the resources were opened with, named after the flags of the command line
+                                    (threads, film_threads, engine, max_requests, per_host, cache_dir, rate, retries, etc.).
+        limiter (RateLimiter):      The rate limiter that is shared by all requests.
+        transport (Transport):      The pooled HTTP session that is shared by all lists, with a connection for every thread.
+                                    In replay mode this is a ReplayTransport that serves the recorded archive.
+        archive (ResponseArchive):  The archive of recorded responses in record or replay mode, None otherwise.
+        cache (FilmCache):          The on-disk film cache that is shared by all lists, None if caching is turned off.
+        responses (ResponseCache):  The on-disk cache of raw responses for conditional requests, None if caching is turned off.
+        parse_pool (ParsePool):     The pool of processes that parses the film pages, None if they are parsed in the scraping threads.
+        metrics (Metrics):          The performance metrics, None if no metrics were asked for.
+
+    Methods:
+        close():    Closes all resources.
+    """
+
+    def __init__(self, threads, film_threads, engine, max_requests, per_host, cache_dir, cache_ttl, stats_ttl, cache_size,
+                 rate, retries, adaptive, timeout, parser, parse_workers, record, replay, replay_latency, metrics, metrics_port=None, resume=False):
+        """
+        Opens the resources. Caching is turned off if cache_dir is None.
+        """
+
+        from listscraper.transport_class import Transport, ReplayTransport
+        from listscraper.archive_class import ResponseArchive
+        from listscraper.ratelimit_class import RateLimiter
+        from listscraper.cache_class import FilmCache, ResponseCache
+        from listscraper.parsepool_class import ParsePool
+        from listscraper.metrics_class import Metrics
+        from listscraper.scrape_functions import PREFETCH_PAGES
+
+        self.threads = threads
+        self.film_threads = film_threads
+        self.engine = engine
+        self.max_requests = max_requests
+        self.per_host = per_host
+        self.cache_dir = cache_dir
+        self.rate = rate
+        self.retries = retries
+        self.adaptive = adaptive
+        self.timeout = timeout
+        self.parser = parser
+        self.parse_workers = parse_workers
+        self.record = record
+        self.replay = replay
+        self.replay_latency = replay_latency
+
+        max_inflight = max_requests if engine == "async" else threads * film_threads
+        self.limiter = RateLimiter(rate, adaptive, max_inflight)
+        self.cache = FilmCache(cache_dir, cache_ttl, stats_ttl, cache_size) if cache_dir else None
+        self.responses = ResponseCache(cache_dir, cache_size) if cache_dir else None
+        self.metrics = Metrics() if metrics else None
+
+        if record:
+            self.archive = ResponseArchive(record, "a" if resume else "w")
+        elif replay:
+            self.archive = ResponseArchive(replay, "r")
+        else:
+            self.archive = None
+
+        if metrics_port:
+            self.metrics.serve(metrics_port)
+
+        if replay:
+            self.transport = ReplayTransport(self.archive, replay_latency, self.metrics)
+        else:
+            # Every list thread adds its share of the film threads and the threads that request its list pages ahead
+            self.transport = Transport(threads * (film_threads + PREFETCH_PAGES), self.limiter, retries, timeout, self.archive, self.metrics, self.responses)
+        self.parse_pool = ParsePool(parse_workers) if parse_workers > 0 else None
+
+    def close(self):
+        """
+        Closes the HTTP session, archive, parse processes and caches, and stops serving the metrics.
+        """
+
+        self.transport.close()
+        if self.archive:
+            self.archive.close()
+        if self.parse_pool:
+            self.parse_pool.close()
+        if self.cache:
+            self.cache.close()
+        if self.responses:
+            self.responses.close()
+        if self.metrics:
+            self.metrics.close()
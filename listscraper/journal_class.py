@@ -0,0 +1,113 @@
+import threading
+import json
+import os
+
+class Journal:
+    """
+    Checkpoint journal of a run, used to resume scrapes that were interrupted (e.g. by throttling or a crash).
+    Every page that has been written to the output file is recorded on a new line of an append-only JSON-lines file,
+    together with the URL of the next page, the slugs of its films and the position of its end in the output file
+    (see FilmWriter), so a resumed run can remove films that were written after the last recorded page. Finished lists are recorded as well.
+    A partially written last line (from a crash during writing) is ignored when the journal is read.
+
+    Attributes:
+        path (str):     The path of the journal file.
+        entries (dict): The progress of each list, keyed by its journal key.
+
+    Methods:
+        entry(key):                                 Returns the recorded progress of a list, or None if it was not started.
+        record_page(key, page_url, next_url, films, position):  Records a page of a list that has been written out.
+        record_done(key):                           Records a list that has been scraped completely.
+        remove():                                   Removes the journal file after a successful run.
+    """
+
+    def __init__(self, output_path, resume=False):
+        """
+        Opens the journal in the output directory. Unless the run is resumed, any previous journal is discarded.
+
+        Parameters:
+            output_path (str):  The directory of the output files.
+            resume (bool):      Whether to read the progress of a previous run.
+        """
+
+        self.path = os.path.join(output_path, ".listscraper_journal.jsonl")
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        if resume and os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._apply(record)
+
+        mode = "a" if resume else "w"
+        self.file = open(self.path, mode, encoding="utf-8")
+
+    def entry(self, key):
+        """
+        Returns the recorded progress of a list, or None if the list was not started.
+
+        Returns:
+            entry (dict):   Dictionary with the completed page URLs ("pages"), the URL of the next page ("next_url"),
+                            the slugs of all written films ("films"), the position of the end of the last page in the output file
+                            ("position", 0 if no page was written) and whether the list is finished ("done").
+        """
+
+        return self.entries.get(key)
+
+    def record_page(self, key, page_url, next_url, films, position=0):
+        """
+        Records a page of a list that has been written to the output file.
+
+        Parameters:
+            key (str):          The journal key of the list.
+            page_url (str):     The URL of the completed page.
+            next_url (str):     The URL of the next page of the list, or None if there is no next page (or pages were selected).
+            films (list):       The slugs of the films on the page.
+            position (int):     The position of the end of the page in the output file, see FilmWriter.
+        """
+
+        self._write({"list": key, "page": page_url, "next_url": next_url, "films": films, "position": position})
+
+    def record_done(self, key):
+        """
+        Records a list that has been scraped completely.
+        """
+
+        self._write({"list": key, "done": True})
+
+    def close(self):
+        """
+        Closes the journal file.
+        """
+
+        with self.lock:
+            self.file.close()
+
+    def remove(self):
+        """
+        Closes and removes the journal file, used after a successful run.
+        """
+
+        self.close()
+        os.remove(self.path)
+
+    def _write(self, record):
+        with self.lock:
+            self._apply(record)
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def _apply(self, record):
+        entry = self.entries.setdefault(record["list"], {"pages": set(), "next_url": None, "films": set(), "position": 0, "done": False})
+        if record.get("done"):
+            entry["done"] = True
+        else:
+            entry["pages"].add(record["page"])
+            entry["next_url"] = record["next_url"]
+            entry["films"].update(record["films"])
+            entry["position"] = record.get("position", 0)
@@ -1,8 +1,9 @@
-from listscraper.scrape_functions import scrape_list
+from listscraper.utility_functions import FILM_COLUMNS
+from listscraper.writer_class import open_writer
+from listscraper.incremental_class import PreviousOutput
 import listscraper.checkimport_functions as cef
+import time
 import sys
-import csv
-import json
 import os
 
 class List:
@@ -17,14 +18,23 @@ class List:
         output_file_extension (str):    Type of file outputted.
         url_total (int):                Total amount of lists that have to be scraped.
         url_count (int):                The number of the current list.
+        priority (int):                 The priority of the list's films in the global film scheduler, higher is scraped first.
+        log (file):                     The stream that the progress of the list is printed to, None for stdout.
 
     Methods:
-        scrape():               Starts scraping the list from Letterboxd.
-        write_to_file():        Writes the objects's films to a file.
+        scrape():               Starts scraping the list from Letterboxd and streams the films to a writer.
+        scrape_async():         Coroutine version of scrape(), used by the async engine.
+        load_previous():        Reads the previous output of the list for the incremental mode.
+        open_output():          Opens the streaming writer of the object's output file.
+        close_output():         Closes the writer of the object's output file.
         scrape_and_write():     Wrapper function to both scrape and write out to file.
+        scrape_url():           Returns the URL from which the list should be scraped.
+        journal_key():          Returns the key of the list in the checkpoint journal.
+        resume_point():         Finds where scraping should (re)start based on the checkpoint journal.
+        write_page():           Writes the films of a page to the output file and records it in the checkpoint journal.
     """
     
-    def __init__(self, list_url, pagestring, output_name, global_output_name, output_file_extension, url_total, url_count, concat):
+    def __init__(self, list_url, pagestring, output_name, global_output_name, output_file_extension, url_total, url_count, concat, priority=0, log=None):
         """
         Constructs necessary attributes of the list object.
 
@@ -39,13 +49,17 @@ class List:
             output_name (str):              The final output name of the file.
             output_file_extension (str):    Type of output file.
             page_options (list):            List of integers corresponding to all selected pages.
+            priority (int):                 The priority of the list in the global film scheduler. Default is 0.
+            log (file):                     The stream that the progress of the list is printed to. Default is None (stdout).
         """
         
         self.url = list_url
         self.pagestring = pagestring.strip("\'\"").replace(" ", "")
         self.output_file_extension = output_file_extension
+        self.priority = priority
+        self.log = log
 
-        print(f"Checking inputs for URL {url_count}/{url_total}...")
+        print(f"Checking inputs for URL {url_count}/{url_total}...", file=self.log)
 
         # URL input check
         urlcheck, self.type, self.username, self.listname = cef.checkimport_url(self.url)
@@ -63,57 +77,212 @@ class List:
             sys.exit(f"    The input syntax of the pages (-p flag) was not correct. Please try again!")
 
         ## Summary of all properties before scraping starts
-        print(f"    url:         {self.url}")
-        print(f"    username:    {self.username}")
-        print(f"    type:        {self.type}")
-        print(f"    page_select: {self.pagestring}")
-        print(f"    output_name: {self.output_name}\n")
+        print(f"    url:         {self.url}", file=self.log)
+        print(f"    username:    {self.username}", file=self.log)
+        print(f"    type:        {self.type}", file=self.log)
+        print(f"    page_select: {self.pagestring}", file=self.log)
+        print(f"    priority:    {self.priority}", file=self.log)
+        print(f"    output_name: {self.output_name}\n", file=self.log)
 
-    def scrape(self, quiet, concat):
+    def scrape(self, transport, writer, quiet, concat, film_threads=1, cache=None, memo=None, journal=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None, film_executor=None, dispatcher=None):
         """
         Scrapes the Letterboxd list by using the List object's URL
-        and stores information on each film in a new attribute.
+        and streams the information on each film to the writer, page by page.
+
+        Parameters:
+            transport (Transport):  The pooled HTTP session that is shared by all lists.
+            writer (FilmWriter):    The streaming writer of the output file.
+            film_threads (int):     Amount of threads used to scrape the films of each page concurrently.
+            cache (FilmCache):      The on-disk film cache, or None if caching is disabled.
+            memo (FilmMemo):        The in-process memo of films scraped during this run, or None.
+            journal (Journal):      The checkpoint journal of the run. Pages that were recorded in it are skipped.
+            fields (list):          The columns that should be scraped. Default is all columns.
+            parser (str):           The extractor backend used to parse the film pages ("lxml" or "bs4").
+            parse_pool (ParsePool): The pool of processes that parses the film pages, or None.
+            metrics (Metrics):      The metrics that the films per list and their scrape time are recorded in, or None.
+            previous (PreviousOutput):  The previous output of the list in incremental mode, or None to scrape all films.
+            film_executor (ListQueue):  The queue of the list in the global FilmScheduler, or None to use a pool of film_threads threads.
+            dispatcher (FilmDispatcher):    The dispatcher of a distributed scrape, whose workers scrape the films, or None.
 
         Attribute:
-            films (list):   The list of films with all scraped information.
+            film_count (int):   The amount of films that were scraped.
+        """
+
+        print(f"    Scraping {self.url}...", file=self.log)
+
+        resume_point = self.resume_point(journal)
+        if resume_point is None:
+            return
+        
+        # The scrape functions (and their parsing dependencies) are only imported once scraping starts
+        from listscraper.scrape_functions import scrape_list
+
+        start_url, page_options, done_films = resume_point
+        starttime, start_count = time.perf_counter(), self.film_count
+        for page_url, next_url, page_films in scrape_list(transport, start_url, page_options, self.output_file_extension, self.type, quiet, concat, film_threads, cache, memo, fields, parser, parse_pool, metrics, previous, film_executor, dispatcher, self.log):
+            self.write_page(writer, journal, page_url, next_url, page_films, done_films)
+
+        if metrics:
+            metrics.observe_list(self.url, self.film_count - start_count, time.perf_counter() - starttime)
+        if journal:
+            journal.record_done(self.journal_key())
+
+    async def scrape_async(self, transport, writer, quiet, concat, cache=None, memo=None, journal=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None):
+        """
+        Scrapes the Letterboxd list on the event loop of the async engine
+        and streams the information on each film to the writer, page by page.
+
+        Parameters:
+            transport (AsyncTransport): The aiohttp session that is shared by all lists.
+            writer (FilmWriter):        The streaming writer of the output file.
+            cache (FilmCache):          The on-disk film cache, or None if caching is disabled.
+            memo (FilmMemo):            The in-process memo of films scraped during this run, or None.
+            journal (Journal):          The checkpoint journal of the run. Pages that were recorded in it are skipped.
+            fields (list):              The columns that should be scraped. Default is all columns.
+            parser (str):               The extractor backend used to parse the film pages ("lxml" or "bs4").
+            parse_pool (ParsePool):     The pool of processes that parses the film pages, or None.
+            metrics (Metrics):          The metrics that the films per list and their scrape time are recorded in, or None.
+            previous (PreviousOutput):  The previous output of the list in incremental mode, or None to scrape all films.
+        """
+
+        print(f"    Scraping {self.url}...", file=self.log)
+
+        resume_point = self.resume_point(journal)
+        if resume_point is None:
+            return
+
+        from listscraper.async_scrape_functions import async_scrape_list
+
+        start_url, page_options, done_films = resume_point
+        starttime, start_count = time.perf_counter(), self.film_count
+        async for page_url, next_url, page_films in async_scrape_list(transport, start_url, page_options, self.output_file_extension, self.type, quiet, concat, cache, memo, fields, parser, parse_pool, metrics, previous, self.log):
+            self.write_page(writer, journal, page_url, next_url, page_films, done_films)
+
+        if metrics:
+            metrics.observe_list(self.url, self.film_count - start_count, time.perf_counter() - starttime)
+        if journal:
+            journal.record_done(self.journal_key())
+
+    def journal_key(self):
+        """
+        Returns the key of the list in the checkpoint journal.
+        """
+
+        return f"{self.output_name} {self.url}"
+
+    def resume_point(self, journal):
+        """
+        Finds where scraping should (re)start, based on the progress of this list in the checkpoint journal.
+
+        Parameters:
+            journal (Journal):  The checkpoint journal of the run, or None.
+
+        Returns:
+            start_url (str):        The URL of the first page that should be scraped.
+            page_options (list):    The selected pages that still have to be scraped (empty list if all pages are scraped).
+            done_films (set):       The slugs of the films that were already written out.
+            (None is returned if there is nothing left to scrape.)
         """
 
-        print(f"    Scraping {self.url}...")
+        self.film_count = 0
+        entry = journal.entry(self.journal_key()) if journal else None
+        if entry is None:
+            return self.scrape_url(), self.page_options, set()
+
+        self.film_count = len(entry["films"])
+        if entry["done"]:
+            return
+
+        # All pages: continue from the page after the last completed one
+        if self.page_options == []:
+            if entry["next_url"] is None:
+                return
+            print(f"        Resuming from {entry['next_url']}...", file=self.log)
+            return entry["next_url"], self.page_options, entry["films"]
+
+        # Page selection: skip all completed pages
+        page_options = [p for p in self.page_options if self.scrape_url() + f"page/{p}/" not in entry["pages"]]
+        if page_options == []:
+            return
+        print(f"        Resuming with pages {page_options}...", file=self.log)
+        return self.scrape_url(), page_options, entry["films"]
+
+    def write_page(self, writer, journal, page_url, next_url, page_films, done_films):
+        """
+        Writes the films of a scraped page to the output file and records the page in the checkpoint journal.
+        Films that were already written out by a previous (interrupted) run are left out.
+        In a list-only scrape, the films are numbered here by their position in the output of the list.
+        """
+
+        if done_films:
+            page_films = [film for film in page_films if film["Film_URL"].split('/')[-2] not in done_films]
+
+        if page_films and "Position" in page_films[0]:
+            for position, film in enumerate(page_films, self.film_count + 1):
+                film["Position"] = position
+
+        # The page is recorded before another page can be written to the file, with the position of its end in the file
+        def checkpoint(position):
+            journal.record_page(self.journal_key(), page_url, next_url, [film["Film_URL"].split('/')[-2] for film in page_films], position)
+
+        writer.write(page_films, checkpoint if journal else None)
+        self.film_count += len(page_films)
+
+    def scrape_url(self):
+        """
+        Returns the URL from which the list should be scraped.
+        """
 
         # If list is of generic LB site, URL should be slightly altered
         if self.type == "LBfilms":
-            scrape_url = "films/ajax".join(self.url.split("films"))         # 'ajax' is inserted
+            return "films/ajax".join(self.url.split("films"))         # 'ajax' is inserted
         else:
-            scrape_url = self.url
+            return self.url
+
+    def load_previous(self, output_path, fields, refresh_after=None):
+        """
+        Reads the previous output file of the list, so only new films have to be scraped in incremental mode.
+        """
 
-        self.films = scrape_list(scrape_url, self.page_options, self.output_file_extension, self.type, quiet, concat)
+        return PreviousOutput(os.path.join(output_path, self.output_name), self.output_file_extension, fields, refresh_after, self.log)
 
-    def write_to_file(self, output_path):
+    def open_output(self, output_path, journal=None, previous=None):
         """
-        Writes the films of the List object to a file.
+        Opens the streaming writer of the List object's output file. The file is created when the first films are written.
+        If the checkpoint journal shows that this list was started before, the films are appended to the existing file,
+        after the last page that was recorded in the journal.
+        In incremental mode, the films are written to a temporary file that replaces the previous output when the list is finished.
         """
 
-        if len(self.films) == 1:
-            return print(f"        No films found to write out for list {self.listname}. Please try a different selection.")
+        if previous:
+            return open_writer(previous.temppath, self.output_file_extension)
 
-        outpath = os.path.join(output_path, self.output_name)
-        if self.output_file_extension == ".json":
-            with open(outpath, "w", encoding="utf-8") as jsonf:
-                jsonf.write(json.dumps(self.films, indent=4, ensure_ascii=False))
-        else:
-            header = list( self.films[0].keys() )
-            with open(outpath, 'w', newline="", encoding = "utf-8") as f:
-                write = csv.DictWriter(f, delimiter=",", fieldnames=header)
-                write.writeheader()
-                write.writerows(self.films)
-    
-        return print(f"    Written to {self.output_name}!")
-    
+        entry = journal.entry(self.journal_key()) if journal else None
+        return open_writer(os.path.join(output_path, self.output_name), self.output_file_extension, entry is not None, entry and entry["position"])
+
+    def close_output(self, writer, previous=None):
+        """
+        Closes the writer of the List object's output file.
+        """
+
+        writer.close()
+        if previous:
+            previous.finish()
+
+        if self.film_count == 0:
+            return print(f"        No films found to write out for list {self.listname}. Please try a different selection.", file=self.log)
+
+        return print(f"    Written to {self.output_name}!", file=self.log)
 
-    def scrape_and_write(self, output_path, quiet, concat):
+    def scrape_and_write(self, transport, output_path, quiet, concat, film_threads=1, cache=None, memo=None, journal=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None, film_executor=None, dispatcher=None):
         """
         Function to initiate scraping from URL and writing to file of the LB list.
         """
 
-        self.scrape(quiet, concat)
-        self.write_to_file(output_path)
\ No newline at end of file
+        writer = self.open_output(output_path, journal, previous)
+        try:
+            self.scrape(transport, writer, quiet, concat, film_threads, cache, memo, journal, fields, parser, parse_pool, metrics, previous, film_executor, dispatcher)
+        except:
+            writer.close()
+            raise
+        self.close_output(writer, previous)
@@ -0,0 +1,99 @@
+import concurrent.futures
+import threading
+import asyncio
+
+class FilmMemo:
+    """
+    In-process memo of all films that are (being) scraped during a run, keyed by the film slug.
+    When the same film appears in multiple lists or pages, only the first request scrapes it.
+    Concurrent requests for the same film wait for that scrape to finish and then share its result.
+    Only the general film information and stats are shared (as a compact FilmRecord), list-specific columns (e.g. 'Owner_rating') are added per list.
+
+    Attributes:
+        hits (int):     The amount of film scrapes that were shared with an earlier (or in-flight) scrape.
+        misses (int):   The amount of film scrapes that actually had to be done.
+
+    Methods:
+        get_or_scrape(slug, scrape):                Returns the memoized film, or scrapes it if it was not requested before.
+        get_or_scrape_async(slug, scrape_coro):     Coroutine version of get_or_scrape(), used by the async engine.
+        hit_rate():                                 Returns the fraction of film scrapes that were shared.
+    """
+
+    def __init__(self):
+        """
+        Constructs an empty memo.
+        """
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+        self.films = {}
+
+    def get_or_scrape(self, slug, scrape):
+        """
+        Returns the memoized film, or scrapes it if it was not requested before. Thread-safe.
+
+        Parameters:
+            slug (str):         The film slug.
+            scrape (function):  Function without arguments that scrapes the film.
+
+        Returns:
+            The result of 'scrape()', shared by all requests of the same film.
+        """
+
+        with self.lock:
+            future = self.films.get(slug)
+            owner = future is None
+            if owner:
+                future = self.films[slug] = concurrent.futures.Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(scrape())
+            except BaseException as e:
+                # Forget the failed scrape, so the film is tried again when it is requested next
+                with self.lock:
+                    del self.films[slug]
+                future.set_exception(e)
+
+        return future.result()
+
+    async def get_or_scrape_async(self, slug, scrape_coro):
+        """
+        Returns the memoized film, or scrapes it if it was not requested before.
+        Coroutine version of get_or_scrape(), all calls should come from the same event loop.
+
+        Parameters:
+            slug (str):                 The film slug.
+            scrape_coro (function):     Coroutine function without arguments that scrapes the film.
+
+        Returns:
+            The result of 'scrape_coro()', shared by all requests of the same film.
+        """
+
+        task = self.films.get(slug)
+        if task is None:
+            task = self.films[slug] = asyncio.ensure_future(scrape_coro())
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Forget the failed scrape, so the film is tried again when it is requested next
+            if self.films.get(slug) is task:
+                del self.films[slug]
+            raise
+
+    def hit_rate(self):
+        """
+        Returns the fraction of film scrapes that were shared with an earlier scrape.
+        """
+
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
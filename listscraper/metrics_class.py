@@ -0,0 +1,302 @@
+from urllib.parse import urlparse
+import http.server
+import threading
+import json
+import time
+
+# Upper bounds (in seconds) of the latency histogram buckets, the last bucket (+Inf) is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# The Letterboxd endpoints that requests are grouped by
+ENDPOINTS = ("list", "film", "stats", "histogram")
+
+def endpoint_of(url):
+    """
+    Returns the Letterboxd endpoint of a URL: "stats", "histogram", "film" or (for all other pages) "list".
+    """
+
+    path = urlparse(url).path
+    if path.startswith("/csi/film/"):
+        return "histogram" if path.endswith("/rating-histogram/") else "stats"
+    if path.startswith("/film/"):
+        return "film"
+    return "list"
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets, in the same form as a Prometheus histogram.
+
+    Attributes:
+        buckets (list):     The amount of observations per bucket (not cumulative), the last bucket is +Inf.
+        count (int):        The amount of observations.
+        sum (float):        The sum of all observations.
+        max (float):        The largest observation.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+            i += 1
+        self.buckets[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by interpolating within its bucket (like 'histogram_quantile()' in Prometheus).
+        """
+
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def report(self):
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": self.max,
+                "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], self.buckets))}
+
+class Metrics:
+    """
+    Collects the performance metrics of a run, shared by the transport and all scrape functions.
+    Requests are timed per Letterboxd endpoint (list page, film page, stats and rating histogram), together with the
+    downloaded bytes, statuses and retries. The scrape functions add the parse time per film, cache hits and the films per list.
+    All methods are thread-safe.
+
+    Attributes:
+        starttime (float):  The time at which the metrics were created.
+        requests (dict):    The latency histogram of the requests per endpoint.
+        bytes (dict):       The amount of downloaded bytes per endpoint.
+        statuses (dict):    The amount of responses per (endpoint, status code), connection errors have status 0.
+        retries (dict):     The amount of retried requests per endpoint.
+        parse (Histogram):  The histogram of the parse time per film, for films whose pages were requested.
+                            With a parse pool this includes handing the pages to (and waiting for) a worker process.
+        films (int):        The amount of films that were scraped, including cached films and films shared between lists.
+        cache (dict):       The amount of cache hits and misses per section ("film" and "stats").
+        lists (dict):       The amount of films and the scrape time per list URL.
+
+    Methods:
+        observe_request(url, seconds, status, size):    Records a single request (one attempt).
+        observe_retry(url):                             Records a request that is retried.
+        observe_parse(seconds):                         Records the parse time of a film.
+        observe_film():                                 Records a scraped film.
+        observe_cache(section, hit):                    Records a lookup in the film cache.
+        observe_list(list_url, films, seconds):         Records a list that has been scraped.
+        report():                                       Returns all metrics as a dict.
+        summary():                                      Returns a summary table of all metrics.
+        write_json(path):                               Writes the report to a JSON file.
+        prometheus():                                   Returns all metrics in the Prometheus text format.
+        serve(port, host):                              Serves the Prometheus metrics over HTTP (on 127.0.0.1) while the run is going on.
+        close():                                        Stops serving the metrics.
+    """
+
+    def __init__(self):
+        """
+        Constructs empty metrics.
+        """
+
+        self.starttime = time.time()
+        self.lock = threading.Lock()
+        self.server = None
+
+        self.requests = {endpoint: Histogram() for endpoint in ENDPOINTS}
+        self.bytes = dict.fromkeys(ENDPOINTS, 0)
+        self.statuses = {}
+        self.retries = dict.fromkeys(ENDPOINTS, 0)
+        self.parse = Histogram()
+        self.films = 0
+        self.cache = {"film": {"hits": 0, "misses": 0}, "stats": {"hits": 0, "misses": 0}}
+        self.lists = {}
+
+    def observe_request(self, url, seconds, status, size):
+        """
+        Records a single request (one attempt).
+
+        Parameters:
+            url (str):          The URL of the request.
+            seconds (float):    The time until the full content was received.
+            status (int):       The HTTP status code of the response, 0 if the request failed.
+            size (int):         The amount of downloaded bytes.
+        """
+
+        endpoint = endpoint_of(url)
+        with self.lock:
+            self.requests[endpoint].observe(seconds)
+            self.bytes[endpoint] += size
+            self.statuses[endpoint, status] = self.statuses.get((endpoint, status), 0) + 1
+
+    def observe_retry(self, url):
+        with self.lock:
+            self.retries[endpoint_of(url)] += 1
+
+    def observe_parse(self, seconds):
+        with self.lock:
+            self.parse.observe(seconds)
+
+    def observe_film(self):
+        with self.lock:
+            self.films += 1
+
+    def observe_cache(self, section, hit):
+        with self.lock:
+            self.cache[section]["hits" if hit else "misses"] += 1
+
+    def observe_list(self, list_url, films, seconds):
+        """
+        Records a list that has been scraped (or the part that was scraped in this run, when resuming).
+        """
+
+        with self.lock:
+            entry = self.lists.setdefault(list_url, {"films": 0, "seconds": 0.0})
+            entry["films"] += films
+            entry["seconds"] += seconds
+
+    def report(self):
+        """
+        Returns all metrics as a dict, which can be written out as JSON.
+        """
+
+        with self.lock:
+            return {
+                "elapsed_seconds": time.time() - self.starttime,
+                "requests": {endpoint: dict(histogram.report(), bytes=self.bytes[endpoint], retries=self.retries[endpoint],
+                                            statuses={str(status): n for (e, status), n in sorted(self.statuses.items()) if e == endpoint})
+                             for endpoint, histogram in self.requests.items()},
+                "parse": self.parse.report(),
+                "films": self.films,
+                "films_parsed": self.parse.count,
+                "cache": {section: dict(counts) for section, counts in self.cache.items()},
+                "lists": {list_url: dict(entry, films_per_second=entry["films"] / entry["seconds"] if entry["seconds"] else 0.0)
+                          for list_url, entry in self.lists.items()},
+            }
+
+    def summary(self):
+        """
+        Returns a summary table of all metrics, which is printed at the end of a run.
+        """
+
+        report = self.report()
+        ms = lambda seconds: f"{seconds * 1000:.1f}"
+
+        lines = [f"    {'endpoint':<10} {'requests':>8} {'retries':>7} {'MB':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"]
+        for endpoint, r in report["requests"].items():
+            if r["count"]:
+                lines.append(f"    {endpoint:<10} {r['count']:>8} {r['retries']:>7} {r['bytes'] / 1e6:>8.2f} "
+                             f"{ms(r['mean']):>8} {ms(r['p50']):>8} {ms(r['p95']):>8} {ms(r['max']):>8}")
+
+        p = report["parse"]
+        lines.append(f"\n    Parse time per film: mean {ms(p['mean'])} ms, p95 {ms(p['p95'])} ms.")
+        lines.append(f"    Films: {report['films']} scraped, of which {p['count']} were parsed from requested pages (the others were cached or shared between lists/pages).")
+
+        cache = report["cache"]
+        if any(counts["hits"] or counts["misses"] for counts in cache.values()):
+            lines.append("    Cache hits: " + ", ".join(f"{section} {counts['hits']}/{counts['hits'] + counts['misses']}" for section, counts in cache.items()) + ".")
+
+        for list_url, entry in report["lists"].items():
+            lines.append(f"    {list_url}: {entry['films']} films in {entry['seconds']:.2f} s ({entry['films_per_second']:.1f} films/s)")
+
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """
+        Writes the report of all metrics to a JSON file.
+        """
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4)
+
+    def prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+
+        report = self.report()
+        label = lambda value: str(value).replace("\\", "\\\\").replace('"', '\\"')
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f"# HELP listscraper_{name} {description}")
+            lines.append(f"# TYPE listscraper_{name} {kind}")
+            for suffix, labels, value in samples:
+                labelstring = ",".join(f'{key}="{label(v)}"' for key, v in labels.items())
+                lines.append(f"listscraper_{name}{suffix}{{{labelstring}}} {value}" if labels else f"listscraper_{name}{suffix} {value}")
+
+        def histogram_samples(r, labels):
+            cumulative = 0
+            for le, n in r["buckets"].items():
+                cumulative += n
+                yield "_bucket", dict(labels, le=le), cumulative
+            yield "_sum", labels, r["sum"]
+            yield "_count", labels, r["count"]
+
+        metric("request_duration_seconds", "histogram", "Latency of the requests to Letterboxd per endpoint.",
+               [sample for endpoint, r in report["requests"].items() for sample in histogram_samples(r, {"endpoint": endpoint})])
+        metric("response_bytes_total", "counter", "Downloaded bytes per endpoint.",
+               [("", {"endpoint": endpoint}, r["bytes"]) for endpoint, r in report["requests"].items()])
+        metric("responses_total", "counter", "Responses per endpoint and HTTP status code (0 for connection errors).",
+               [("", {"endpoint": endpoint, "status": status}, n) for endpoint, r in report["requests"].items() for status, n in r["statuses"].items()])
+        metric("request_retries_total", "counter", "Retried requests per endpoint.",
+               [("", {"endpoint": endpoint}, r["retries"]) for endpoint, r in report["requests"].items()])
+        metric("film_parse_duration_seconds", "histogram", "Parse time per film.", list(histogram_samples(report["parse"], {})))
+        metric("films_total", "counter", "Films that were scraped, including cached films and films shared between lists.", [("", {}, report["films"])])
+        metric("cache_lookups_total", "counter", "Lookups in the film cache per section and result.",
+               [("", {"section": section, "result": result}, counts[result]) for section, counts in report["cache"].items() for result in ("hits", "misses")])
+        metric("list_films_total", "counter", "Films per scraped list.",
+               [("", {"list": list_url}, entry["films"]) for list_url, entry in report["lists"].items()])
+        metric("list_duration_seconds", "gauge", "Scrape time per list.",
+               [("", {"list": list_url}, entry["seconds"]) for list_url, entry in report["lists"].items()])
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves the Prometheus metrics on 'http://<host>:<port>/metrics' from a background thread, until close() is called.
+        The metrics are only served to local connections by default.
+        """
+
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                content = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """
+        Stops serving the metrics.
+        """
+
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
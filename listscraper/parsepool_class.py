@@ -0,0 +1,73 @@
+import concurrent.futures
+import multiprocessing
+import threading
+import asyncio
+
+class ParsePool:
+    """
+    Class that holds the pool of worker processes that parse the raw content of the film pages.
+    The threads (or coroutines) that make the requests only fetch the raw pages and hand them to this pool,
+    so parsing is not limited to a single core by the GIL.
+    The amount of pages waiting to be parsed is bounded: when all slots are taken, fetching waits until a parse has finished.
+
+    Attributes:
+        workers (int):      The amount of worker processes.
+        max_pending (int):  The maximum amount of films that are waiting for (or being) parsed.
+
+    Methods:
+        parse(function, *args):         Runs a parse function in a worker process and returns its result.
+        parse_async(function, *args):   Coroutine version of parse(), used by the async engine.
+        close():                        Shuts down the worker processes.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        """
+        Constructs the pool, the worker processes are started when the first page is parsed.
+
+        Parameters:
+            workers (int):      The amount of worker processes.
+            max_pending (int):  The maximum amount of films that are waiting for (or being) parsed. Default is twice the amount of workers,
+                                so every worker has a film queued when it finishes its current one.
+        """
+
+        self.workers = workers
+        self.max_pending = max_pending if max_pending else 2 * workers
+
+        # Workers are spawned instead of forked, as forking a process with running threads is unsafe
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.async_slots = None
+
+    def parse(self, function, *args):
+        """
+        Runs a parse function in a worker process and returns its result. Blocks while all slots are taken.
+
+        Parameters:
+            function (function):    The parse function, it and its arguments have to be picklable.
+            *args:                  The arguments of the parse function.
+
+        Returns:
+            The result of 'function(*args)'.
+        """
+
+        with self.slots:
+            return self.executor.submit(function, *args).result()
+
+    async def parse_async(self, function, *args):
+        """
+        Runs a parse function in a worker process and returns its result. Waits while all slots are taken.
+        Coroutine version of parse(), all calls should come from the same event loop.
+        """
+
+        if self.async_slots is None:
+            self.async_slots = asyncio.Semaphore(self.max_pending)
+
+        async with self.async_slots:
+            return await asyncio.wrap_future(self.executor.submit(function, *args))
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+
+        self.executor.shutdown()
@@ -0,0 +1,160 @@
+from email.utils import parsedate_to_datetime
+import threading
+import datetime
+import random
+import math
+import time
+
+# Statuses for which a request is retried, 429 and 503 mean that Letterboxd is throttling us
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+class RateLimiter:
+    """
+    Class that limits the requests to Letterboxd, shared by all threads (or coroutines) of a run.
+    Requests are spaced out by a token bucket that allows at most 'rate' requests per second (with short bursts).
+    In adaptive mode, the amount of requests in flight is also limited and adjusted to the observed throttling:
+    it is halved whenever Letterboxd throttles a request and slowly raised again while requests succeed.
+
+    Attributes:
+        rate (float):           Maximum amount of requests per second, 0 means unlimited.
+        adaptive (bool):        Whether the amount of requests in flight is adjusted to the observed throttling.
+        max_inflight (int):     The maximum amount of requests in flight in adaptive mode.
+        inflight_limit (int):   The current limit of requests in flight in adaptive mode.
+        log (file):             The stream that throttling is reported to, the stdout if None. Every run (or job of a server) points it to its own log.
+
+    Methods:
+        wait_time():            Reserves a token and returns how long to wait before the request may be made.
+        acquire():              Blocks until a request may be made.
+        release():              Signals that a request acquired with acquire() has finished.
+        record(throttled):      Records the outcome of a request, used to adjust the limit in adaptive mode.
+    """
+
+    def __init__(self, rate=0, adaptive=False, max_inflight=4, log=None):
+        """
+        Constructs the limiter.
+
+        Parameters:
+            rate (float):           Maximum amount of requests per second, 0 means unlimited.
+            adaptive (bool):        Whether the amount of requests in flight is adjusted to the observed throttling.
+            max_inflight (int):     The maximum (and starting) amount of requests in flight in adaptive mode.
+            log (file):             The stream that throttling is reported to, or None for stdout.
+        """
+
+        self.rate = rate
+        self.burst = max(1.0, rate)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+
+        self.adaptive = adaptive
+        self.max_inflight = max_inflight
+        self.inflight_limit = max_inflight
+        self.inflight = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self.log = log
+
+        self.lock = threading.Lock()
+        self.slot_available = threading.Condition(self.lock)
+
+    def wait_time(self):
+        """
+        Reserves a token of the bucket and returns how long to wait before the request may be made.
+
+        Returns:
+            wait (float):   Time to wait in seconds.
+        """
+
+        if not self.rate:
+            return 0.0
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+
+            # Tokens can go negative, the request then waits until its token has been refilled
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self):
+        """
+        Blocks until a request may be made, i.e. until a token is available and (in adaptive mode) the amount of requests in flight is below the limit.
+        """
+
+        time.sleep(self.wait_time())
+
+        if self.adaptive:
+            with self.slot_available:
+                while self.inflight >= self.inflight_limit:
+                    self.slot_available.wait()
+                self.inflight += 1
+
+    def release(self):
+        """
+        Signals that a request acquired with acquire() has finished.
+        """
+
+        if self.adaptive:
+            with self.slot_available:
+                self.inflight -= 1
+                self.slot_available.notify()
+
+    def record(self, throttled):
+        """
+        Records the outcome of a request. In adaptive mode, the limit of requests in flight is halved when a request was throttled
+        (at most once per second, as requests in flight are throttled together) and raised by one after a full limit's worth of successes.
+
+        Parameters:
+            throttled (bool):   Whether Letterboxd throttled the request.
+        """
+
+        if not self.adaptive:
+            return
+
+        with self.slot_available:
+            if throttled:
+                self.successes = 0
+                now = time.monotonic()
+                if now - self.last_decrease > 1.0 and self.inflight_limit > 1:
+                    self.inflight_limit = max(1, self.inflight_limit // 2)
+                    self.last_decrease = now
+                    print(f"        Throttled by Letterboxd, lowering to {self.inflight_limit} request(s) in flight...", file=self.log)
+            else:
+                self.successes += 1
+                if self.successes >= self.inflight_limit and self.inflight_limit < self.max_inflight:
+                    self.inflight_limit += 1
+                    self.successes = 0
+                    self.slot_available.notify()
+
+def retry_delay(attempt, retry_after=None, base=1.0, cap=60.0):
+    """
+    Returns how long to wait before retrying a failed request.
+    The 'Retry-After' header is honoured if Letterboxd sent a valid one (a finite amount of seconds or an HTTP date),
+    otherwise an exponential backoff with full jitter is used. The delay is never negative.
+
+    Parameters:
+        attempt (int):      The number of the failed attempt, starting at 0.
+        retry_after (str):  The value of the 'Retry-After' header (seconds or an HTTP date), or None.
+        base (float):       The backoff of the first retry in seconds.
+        cap (float):        The maximum backoff in seconds.
+
+    Returns:
+        delay (float):  Time to wait in seconds.
+    """
+
+    if retry_after:
+        try:
+            seconds = float(retry_after)
+        except ValueError:
+            try:
+                retry_date = parsedate_to_datetime(retry_after)
+                return min(max(0.0, (retry_date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()), cap * 5)
+            except (TypeError, ValueError):
+                pass
+        else:
+            # 'nan' and 'inf' are ignored and a negative value counts as 0, as the sleep fails on a negative delay
+            if math.isfinite(seconds):
+                return min(max(0.0, seconds), cap * 5)
+
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,76 @@
+from listscraper.utility_functions import FILM_PAGE_COLUMNS, STATS_COLUMNS, HISTOGRAM_COLUMNS
+from array import array
+import sys
+
+# The star columns of the rating histogram ("½" to "★★★★★"), stored as one integer array
+HISTOGRAM_STARS = HISTOGRAM_COLUMNS[1:-1]
+HISTOGRAM_INDEX = {stars: i for i, stars in enumerate(HISTOGRAM_STARS)}
+
+# Columns whose values repeat between films, their strings are interned so every film shares the same string objects
+INTERNED_COLUMNS = {"Director", "Original_language"}
+INTERNED_LIST_COLUMNS = {"Cast", "Genres", "Countries", "Spoken_languages", "Studios"}
+
+# The other columns are stored in a slot named after the lowercase column name
+SLOT_COLUMNS = [column for column in FILM_PAGE_COLUMNS + STATS_COLUMNS + HISTOGRAM_COLUMNS if column not in HISTOGRAM_INDEX]
+
+class FilmRecord:
+    """
+    Compact record of the general information and stats of a film, which are the same for every list that the film is in.
+    Records are kept in the memo for the whole run, so they use slots instead of a dict, the rating histogram is a
+    fixed-size integer array instead of ten dict entries, and repeating strings (director, cast, genres, countries,
+    languages and studios) are interned and stored in tuples. A film dict is only built when the film is written out.
+    Sections that were not scraped (e.g. because their columns were not selected) are left empty.
+
+    Methods:
+        get(column):        Returns the value of a column.
+        columns(fields):    Returns the values of the selected columns that the record contains, as a dict.
+    """
+
+    __slots__ = [column.lower() for column in SLOT_COLUMNS] + ["histogram"]
+
+    def __init__(self, meta, stats):
+        """
+        Constructs the record from the general film information and film stats.
+
+        Parameters:
+            meta (dict):    The general film information from 'parse_film_page()'.
+            stats (dict):   The film stats from 'parse_film_stats()'.
+        """
+
+        for column, value in list(meta.items()) + list(stats.items()):
+            if column in HISTOGRAM_INDEX:
+                continue
+            if column in INTERNED_COLUMNS and isinstance(value, str):
+                value = sys.intern(value)
+            elif column in INTERNED_LIST_COLUMNS and isinstance(value, list):
+                value = tuple(sys.intern(item) for item in value)
+            setattr(self, column.lower(), value)
+
+        self.histogram = array("q", [stats[stars] for stars in HISTOGRAM_STARS]) if HISTOGRAM_STARS[0] in stats else None
+
+    def get(self, column):
+        """
+        Returns the value of a column, lists are returned as new lists. Raises an AttributeError if the column was not scraped.
+        """
+
+        index = HISTOGRAM_INDEX.get(column)
+        if index is not None:
+            if self.histogram is None:
+                raise AttributeError(column)
+            return self.histogram[index]
+
+        value = getattr(self, column.lower())
+        return list(value) if type(value) is tuple else value
+
+    def columns(self, fields):
+        """
+        Returns the values of the selected columns that the record contains, as a dict.
+        """
+
+        values = {}
+        for column in fields:
+            try:
+                values[column] = self.get(column)
+            except AttributeError:
+                continue
+        return values
@@ -0,0 +1,145 @@
+import concurrent.futures
+import collections
+import threading
+
+class FilmScheduler:
+    """
+    Global scheduler of the films of all lists that are scraped with the threads engine.
+    A fixed pool of worker threads scrapes the films from a queue per list. The workers take films from the lists in turns
+    (round-robin), so a large list can not hold up the small lists, and once the small lists are finished all workers continue
+    with the large list. Lists with a higher priority are always served first, lists with the same priority take turns.
+    The throughput is therefore bounded by the amount of workers (connections), not by the size of the largest list.
+
+    Attributes:
+        workers (int):      The amount of worker threads.
+
+    Methods:
+        queue(key, priority):   Returns the queue of a list, which is used like an executor to schedule its films.
+        close():                Stops the worker threads once all scheduled films are finished.
+    """
+
+    def __init__(self, workers):
+        """
+        Starts the worker threads.
+
+        Parameters:
+            workers (int):  The amount of worker threads, i.e. the amount of films that are scraped at the same time.
+        """
+
+        self.workers = workers
+
+        self.condition = threading.Condition()
+        self.turns = collections.deque()
+        self.closed = False
+
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def queue(self, key, priority=0):
+        """
+        Returns the queue of a list, which is used like an executor to schedule its films.
+
+        Parameters:
+            key (str):          The key of the list, e.g. its key in the checkpoint journal.
+            priority (int):     The priority of the list, lists with a higher priority are served first. Default is 0.
+        """
+
+        return ListQueue(self, key, priority)
+
+    def schedule(self, list_queue, task):
+        with self.condition:
+            if not list_queue.tasks:
+                self.turns.append(list_queue)
+            list_queue.tasks.append(task)
+            self.condition.notify()
+
+    def next_task(self):
+        """
+        Returns the next film to scrape: the first list in turn among the lists with the highest priority.
+        Should be called while holding the condition.
+        """
+
+        priority = max(list_queue.priority for list_queue in self.turns)
+        list_queue = next(list_queue for list_queue in self.turns if list_queue.priority == priority)
+        self.turns.remove(list_queue)
+
+        task = list_queue.tasks.popleft()
+        if list_queue.tasks:
+            self.turns.append(list_queue)
+        return task
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.turns and not self.closed:
+                    self.condition.wait()
+                if not self.turns:
+                    return
+                future, function, args = self.next_task()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = function(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        """
+        Stops the worker threads once all scheduled films are finished.
+        """
+
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join()
+
+class ListQueue:
+    """
+    The queue of a single list in the FilmScheduler. It has the 'submit()' and 'shutdown()' methods of an executor,
+    so the scrape functions use it in the same way as the pool of film threads of a list.
+
+    Attributes:
+        key (str):          The key of the list.
+        priority (int):     The priority of the list.
+        tasks (deque):      The films of the list that are waiting for a worker.
+
+    Methods:
+        submit(function, *args):                    Schedules a function call and returns its Future.
+        shutdown(wait=True, cancel_futures=False):  Cancels the waiting films and/or waits for all films of the list.
+    """
+
+    def __init__(self, scheduler, key, priority=0):
+        self.scheduler = scheduler
+        self.key = key
+        self.priority = priority
+        self.tasks = collections.deque()
+        self.futures = set()
+
+    def submit(self, function, *args):
+        future = concurrent.futures.Future()
+        with self.scheduler.condition:
+            self.futures.add(future)
+        future.add_done_callback(self.finished)
+
+        self.scheduler.schedule(self, (future, function, args))
+        return future
+
+    def finished(self, future):
+        with self.scheduler.condition:
+            self.futures.discard(future)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self.scheduler.condition:
+            if cancel_futures:
+                for future, _, _ in self.tasks:
+                    future.cancel()
+            futures = list(self.futures)
+
+        if wait:
+            concurrent.futures.wait(futures)
@@ -1,83 +1,335 @@
-from listscraper.utility_functions import val2stars, stars2val
+from listscraper.utility_functions import val2stars, stars2val, FILM_COLUMNS, FILM_PAGE_COLUMNS, STATS_COLUMNS, HISTOGRAM_COLUMNS, LIST_PAGE_COLUMNS
+from listscraper.xpath_functions import xpath_film_page, xpath_stats, xpath_histogram
+from listscraper.record_class import FilmRecord
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 import requests
-import numpy as np
+import concurrent.futures # for pool of threads
+import collections
+import time
 import re
 
 _domain = 'https://letterboxd.com/'
 
-def scrape_list(list_url, page_options, output_file_extension, list_type, quiet=False, concat=False):
+# The columns that are found on each of the Letterboxd pages of a film, keyed as in 'film_pages()'
+PAGE_COLUMNS = {"film": FILM_PAGE_COLUMNS, "stats": STATS_COLUMNS, "histogram": HISTOGRAM_COLUMNS}
+
+# The amount of list pages that are requested ahead of the page whose films are scraped
+PREFETCH_PAGES = 2
+
+# The amount of pages whose films are scheduled before the films of the current page are written out
+LOOKAHEAD_PAGES = 1
+
+def scrape_list(transport, list_url, page_options, output_file_extension, list_type, quiet=False, concat=False, film_threads=1, cache=None, memo=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None, film_executor=None, dispatcher=None, log=None):
     """
     Scrapes a Letterboxd list. Takes into account any optional page selection.
+    The films are yielded page by page as soon as they are scraped, so they can be streamed to the output file.
+    Scraping is pipelined: the following list pages are requested ahead, and the films of the next page are scraped
+    while the last films of the current page finish, so the film threads never wait for a list page.
+    In a list-only scrape (fields are LIST_PAGE_COLUMNS) the films are read from the list page itself, without any film requests.
 
     Parameters:
+        transport (Transport):          The pooled HTTP session that is used for all requests.
         list_url (str):                 The URL link of the first page of the LB list.
         page_options (str/list):        Either a "*" to scrape all pages, or a list with specific page integers.
         output_file_extension (str):    Type of file extension, for usage in 'scrape_page()'.
         list_type (str):                Type of list to be scraped, for usage in 'scrape_page()'.
         quiet (bool):                   Option to turn-off tqdm (not much increased speed noticed. Default is off.)
         concat (bool):                  If set true it will add an extra column with the original list name to the scraped data.
-
-    Returns:
-        list_films (list):       A list of dicts where each dict contains information on the films in the LB list.
+        film_threads (int):             Amount of threads used to scrape the films of a single page, for usage in 'scrape_page()'.
+        cache (FilmCache):              The on-disk film cache, for usage in 'scrape_film()'.
+        memo (FilmMemo):                The in-process memo of films scraped during this run, for usage in 'scrape_film()'.
+        fields (list):                  The columns that should be scraped, for usage in 'scrape_film()'. Default is all columns.
+        parser (str):                   The extractor backend used to parse the film pages ("lxml" or "bs4"), for usage in 'scrape_film()'.
+        parse_pool (ParsePool):         The pool of processes that parses the film pages, for usage in 'scrape_film()'. Default is to parse in the current thread.
+        metrics (Metrics):              The metrics of the run, for usage in 'scrape_film()'.
+        previous (PreviousOutput):      The previous output of the list in incremental mode, for usage in 'scrape_film()'.
+        film_executor (ListQueue):      The queue of the list in the global FilmScheduler that scrapes the films.
+                                        Default is None, in which case the list gets its own pool of 'film_threads' threads.
+        dispatcher (FilmDispatcher):    The dispatcher that the films are pushed to in a distributed scrape, so they are scraped by the workers.
+                                        Default is None (the films are scraped here).
+        log (file):                     The stream that skipped pages are reported to. Default is None (stdout).
+
+    Yields:
+        page_url (str):          The URL of the scraped page.
+        next_url (str):          The URL of the next page if all pages are scraped, otherwise None.
+        page_films (list):       A list of dicts where each dict contains information on the films of one page of the LB list.
     """
 
-    list_films = []
+    not_found = float("nan") if output_file_extension == ".csv" else None
 
-    # If all pages should be scraped, go through all available pages
-    if (page_options == []) or (page_options == "*"):
-        while True:
-            page_films, page_soup = scrape_page(list_url, list_url, output_file_extension, list_type, quiet, concat)
-            list_films.extend(page_films)
+    # The list pages are requested ahead in their own threads, while the films are scraped by the global scheduler
+    # or, without a scheduler, by one pool for the whole list
+    page_executor = concurrent.futures.ThreadPoolExecutor(PREFETCH_PAGES)
+    if film_executor is None:
+        film_executor = concurrent.futures.ThreadPoolExecutor(film_threads)
+    try:
+        # If all pages should be scraped, go through all available pages, else only go to the selected pages
+        if (page_options == []) or (page_options == "*"):
+            pages = follow_list_pages(page_executor, transport, list_url, list_type)
+        else:
+            pages = select_list_pages(page_executor, transport, list_url, page_options, list_type, log)
 
-            # Check if there is another page of ratings and if yes, continue to that page
-            next_button = page_soup.find('a', class_='next')
-            if next_button is None:
+        # The films of the following page are scheduled before the current page is finished, so the film threads
+        # continue with the next page instead of waiting for the last films of the current page
+        pending = collections.deque()
+        while True:
+            try:
+                page_url, next_url, films, og_list_url = next(pages)
+            except StopIteration:
                 break
+            except Exception:
+                # If a list page could not be loaded, the pages before it are still finished (so they can be resumed from)
+                while pending:
+                    yield finish_page(*pending.popleft(), quiet, concat)
+                raise
+
+            if fields == LIST_PAGE_COLUMNS:
+                futures = poster_futures(films, not_found, fields, metrics)
             else:
-                list_url = _domain + next_button['href']
-    
-    # If page selection was input, only go to those pages
-    else:
-        for p in page_options:
-            new_link = list_url + f"page/{p}/"
-            try:
-                page_films, page_soup = scrape_page(new_link, list_url, output_file_extension, list_type, quiet, concat)
-                list_films.extend(page_films)
-            except:
-                print(f"        No films on page {p}...")
-                continue    
-    
-    return list_films
+                if dispatcher:
+                    dispatcher.push(films, not_found, fields, previous)
+                futures = [film_executor.submit(scrape_film, transport, film, not_found, cache, memo, fields, parser, parse_pool, metrics, previous, dispatcher) for film in films]
+            pending.append((page_url, next_url, futures, og_list_url))
+
+            if len(pending) > LOOKAHEAD_PAGES:
+                yield finish_page(*pending.popleft(), quiet, concat)
+
+        while pending:
+            yield finish_page(*pending.popleft(), quiet, concat)
+    finally:
+        film_executor.shutdown(cancel_futures=True)
+        page_executor.shutdown(cancel_futures=True)
+
+def follow_list_pages(page_executor, transport, list_url, list_type):
+    """
+    Goes through all pages of a LB list, starting at 'list_url', by following the 'next' buttons.
+    The following pages are requested ahead: the last page number is read from the paginator, so up to PREFETCH_PAGES
+    pages are already requested while the current page is scraped. Without a paginator only the next page is requested ahead.
+
+    Parameters:
+        page_executor (ThreadPoolExecutor): The threads that request the list pages.
+        transport (Transport):              The pooled HTTP session that is used for all requests.
+        list_url (str):                     The URL of the first page that should be scraped.
+        list_type (str):                    Type of list, for usage in 'find_page_films()'.
+
+    Yields:
+        page_url (str):         The URL of the page.
+        next_url (str):         The URL of the next page, or None if this is the last page.
+        films (list):           The <li> objects of the films on the page (empty if the page has no films).
+        og_list_url (str):      The URL that is written to the 'List_URL' column with '--concat' (the page URL).
+    """
+
+    requested = {list_url: page_executor.submit(fetch_list_page, transport, list_url, list_type)}
+    page_url = list_url
+    while True:
+        films, next_url, page_soup = requested.pop(page_url).result()
+
+        for url in paginator_urls(page_soup, next_url)[:PREFETCH_PAGES]:
+            if url not in requested:
+                requested[url] = page_executor.submit(fetch_list_page, transport, url, list_type)
+
+        yield page_url, next_url, films, page_url
 
-def scrape_page(list_url, og_list_url, output_file_extension, list_type, quiet=False, concat=False):
+        if next_url is None:
+            break
+        page_url = next_url
+
+def select_list_pages(page_executor, transport, list_url, page_options, list_type, log=None):
+    """
+    Goes through the selected pages of a LB list, up to PREFETCH_PAGES pages are requested ahead.
+    Pages without films are skipped. See 'follow_list_pages()' for the parameters and yielded values.
     """
-    Scrapes the page of a LB list URL, finds all its films and iterates over each film URL
+
+    page_urls = [list_url + f"page/{p}/" for p in page_options]
+    requested = {}
+    for i, (p, page_url) in enumerate(zip(page_options, page_urls)):
+        for j in range(i, min(i + PREFETCH_PAGES + 1, len(page_urls))):
+            if j not in requested:
+                requested[j] = page_executor.submit(fetch_list_page, transport, page_urls[j], list_type)
+
+        films, _, _ = requested.pop(i).result()
+        if films == []:
+            print(f"        No films on page {p}...", file=log)
+            continue
+
+        yield page_url, None, films, list_url
+
+def fetch_list_page(transport, page_url, list_type):
+    """
+    Requests a page of a LB list and finds its films and the link to the next page.
+
+    Parameters:
+        transport (Transport):  The pooled HTTP session that is used for all requests.
+        page_url (str):         The URL of the LB list page.
+        list_type (str):        Type of list, for usage in 'find_page_films()'.
+
+    Returns:
+        films (list):               The <li> objects of the films on the page (empty if the page does not exist or has no films).
+        next_url (str):             The URL of the next page, or None if this is the last page.
+        page_soup (BeautifulSoup):  The parsed HTML of the page, or None if the page does not exist.
+    """
+
+    page_response = transport.get(page_url)
+
+    # Check to see page was downloaded correctly, a page that does not exist has no films
+    if page_response.status_code == 404:
+        return [], None, None
+    check_status(page_response.status_code, page_url)
+
+    return parse_list_page(page_response.content, list_type)
+
+def parse_list_page(content, list_type):
+    """
+    Finds the films and the link to the next page in the raw content of a LB list page, see 'fetch_list_page()'.
+    """
+
+    page_soup = BeautifulSoup(content, 'lxml')
+
+    # Check if there is another page of ratings
+    next_button = page_soup.find('a', class_='next')
+    next_url = None if next_button is None else _domain + next_button['href']
+
+    return find_page_films(page_soup, list_type) or [], next_url, page_soup
+
+def paginator_urls(page_soup, next_url):
+    """
+    Returns the URLs of all following pages of a LB list, from the next page up to the last page in the paginator.
+    If the page numbers cannot be read, only the URL of the next page is returned (or none if this is the last page).
+    """
+
+    if next_url is None:
+        return []
+
+    match = re.fullmatch(r"(.*/page/)(\d+)/", next_url)
+    paginator = page_soup.find('div', class_='paginate-pages')
+    if match is None or paginator is None:
+        return [next_url]
+
+    last_page = max([int(string) for string in paginator.stripped_strings if string.isdigit()], default=0)
+    return [f"{match[1]}{p}/" for p in range(int(match[2]), max(last_page, int(match[2])) + 1)]
+
+def scrape_page(transport, list_url, og_list_url, output_file_extension, list_type, quiet=False, concat=False, film_threads=1, cache=None, memo=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None):
+    """
+    Scrapes a single page of a LB list URL, finds all its films and iterates over each film URL
     to find the relevant information.
 
     Parameters:
+        transport (Transport):          The pooled HTTP session that is used for all requests.
         list_url (str):                 Link of the LB page that should be scraped.
         og_list_url (str):              The original input list URL (without any "/page/" strings added)
         output_file_extension (str):    Type of file extension, specifies 'not_found' entry.
         list_type (str):                Type of list, different specifications for different types.
         quiet (bool):                   Option to turn-off tqdm.
         concat (bool):                  Checks if concat is enabled.
+        film_threads (int):             Amount of threads used to scrape the films on this page concurrently.
+        cache (FilmCache):              The on-disk film cache, for usage in 'scrape_film()'.
+        memo (FilmMemo):                The in-process memo of films scraped during this run, for usage in 'scrape_film()'.
+        fields (list):                  The columns that should be scraped, for usage in 'scrape_film()'.
+        parser (str):                   The extractor backend used to parse the film pages, for usage in 'scrape_film()'.
+        parse_pool (ParsePool):         The pool of processes that parses the film pages, for usage in 'scrape_film()'.
+        metrics (Metrics):              The metrics of the run, for usage in 'scrape_film()'.
+        previous (PreviousOutput):      The previous output of the list in incremental mode, for usage in 'scrape_film()'.
 
     Returns:
-        page_films (list):      List of dicts containing information on each film on the LB page.
+        page_films (list):      List of dicts containing information on each film on the LB page (empty if the page does not exist).
         page_soup (str):        The HTML string of the entire LB page.
     """
-    
+
+    films, _, page_soup = fetch_list_page(transport, list_url, list_type)
+    not_found = float("nan") if output_file_extension == ".csv" else None
+
+    if fields == LIST_PAGE_COLUMNS:
+        return collect_page_films(poster_futures(films, not_found, fields, metrics), og_list_url, quiet, concat), page_soup
+
+    # Scrape the films concurrently, they are collected in the original list order
+    with concurrent.futures.ThreadPoolExecutor(film_threads) as executor:
+        futures = [executor.submit(scrape_film, transport, film, not_found, cache, memo, fields, parser, parse_pool, metrics, previous) for film in films]
+        page_films = collect_page_films(futures, og_list_url, quiet, concat)
+
+    return page_films, page_soup
+
+def finish_page(page_url, next_url, futures, og_list_url, quiet=False, concat=False):
+    """
+    Waits for the scraped films of a page that was scheduled in 'scrape_list()' and returns the values that it yields.
+    """
+
+    return page_url, next_url, collect_page_films(futures, og_list_url, quiet, concat)
+
+def collect_page_films(futures, og_list_url, quiet=False, concat=False):
+    """
+    Waits for the scraped films of a page and returns them in the original list order.
+
+    Parameters:
+        futures (list):         The futures of 'scrape_film()' for every film on the page.
+        og_list_url (str):      The list URL that is added as an extra column if concat is enabled.
+        quiet (bool):           Option to turn-off tqdm.
+        concat (bool):          Checks if concat is enabled.
+
+    Returns:
+        page_films (list):      List of dicts containing information on each film on the LB page.
+    """
+
     page_films = []
-    page_response = requests.get(list_url)
-    
-    # Check to see page was downloaded correctly
-    if page_response.status_code != 200:
-        return print("Error: Could not load page.")
+    for future in futures if quiet else tqdm(futures):
+        film_dict = future.result()
+
+        # Adds an extra column with OG list URL
+        if concat:
+            film_dict["List_URL"] = og_list_url
+
+        page_films.append(film_dict)
+
+    return page_films
+
+def scrape_user_lists(transport, lists_url, username):
+    """
+    Finds all public lists of a user by going through the pages of their lists overview.
+
+    Parameters:
+        transport (Transport):  The pooled HTTP session that is used for all requests.
+        lists_url (str):        The URL of the user's lists overview ('https://letterboxd.com/<user>/lists/').
+        username (str):         The username, links to lists of other users are left out.
+
+    Returns:
+        list_urls (list):       The URLs of the user's lists, in the order of the overview.
+    """
+
+    list_urls = []
+    page_url = lists_url
+    while page_url is not None:
+        page_response = transport.get(page_url)
+
+        # A user that does not exist has no lists
+        if page_response.status_code == 404:
+            break
+        check_status(page_response.status_code, page_url)
+
+        page_soup = BeautifulSoup(page_response.content, 'lxml')
+        for link in page_soup.find_all('a', href=True):
+            match = re.fullmatch(r"/([\w-]+)/list/[\w-]+/", link['href'])
+            list_url = _domain + link['href'][1:]
+            if match and match[1].lower() == username.lower() and list_url not in list_urls:
+                list_urls.append(list_url)
+
+        # Check if there is another page of lists
+        next_button = page_soup.find('a', class_='next')
+        page_url = None if next_button is None else _domain + next_button['href']
+
+    return list_urls
+
+def find_page_films(page_soup, list_type):
+    """
+    Finds the <li> poster objects of all films on a LB list page.
+
+    Parameters:
+        page_soup (BeautifulSoup):  The parsed HTML of the LB list page.
+        list_type (str):            Type of list, Cast/Crew pages use a different film grid.
+
+    Returns:
+        films (list):   The <li> objects of the films on the page, or None if no films were found.
+    """
 
-    page_soup = BeautifulSoup(page_response.content, 'lxml')
-    
     # Grab the main film grid
     if list_type == "Cast/Crew":
         table = page_soup.find("div", class_="poster-grid")
@@ -89,44 +341,398 @@ def scrape_page(list_url, og_list_url, output_file_extension, list_type, quiet=F
     films = table.find_all('li')
     if films == []:
         return 
-    
-    not_found = np.nan if output_file_extension == ".csv" else None
-    
-    # Iterate through films
-    for film in films if quiet else tqdm(films):
-        if list_type == "Cast/Crew" and "poster-container placeholder" in str(film):
-            break  # less than four entries
 
-        film_dict = scrape_film(film, not_found)
-        
-        # Adds an extra column with OG list URL
-        if concat:
-            film_dict["List_URL"] = og_list_url
-        
-        page_films.append(film_dict)
+    # Less than four entries on a Cast/Crew page are padded with placeholders
+    if list_type == "Cast/Crew":
+        for i, film in enumerate(films):
+            if "poster-container placeholder" in str(film):
+                return films[:i]
 
-    return page_films, page_soup
-        
-def scrape_film(film_html, not_found):
+    return films
+
+def check_status(status, url):
+    """
+    Raises an error if a Letterboxd page could not be loaded (after all retries of the transport),
+    so a failed or throttled request is never parsed as if it were a valid page.
+
+    Parameters:
+        status (int):   The HTTP status code of the response.
+        url (str):      The URL of the request.
+    """
+
+    if status != 200:
+        raise requests.HTTPError(f"Could not load {url} (status {status})")
+
+def film_urls(film_html):
+    """
+    Obtains the URLs of all Letterboxd pages that have to be requested for a film.
+
+    Parameters:
+        film_html (str):    The raw <li> HTML string of the film object obtained from the list page HTML.
+
+    Returns:
+        film_url (str):     The URL of the film page.
+        stats_url (str):    The URL of the film's stats (watches, lists, likes).
+        hist_url (str):     The URL of the film's rating histogram (fans, ratings).
+    """
+
+    film_card = film_html.find('div').get('data-target-link')[1:]
+    film_url = _domain + film_card
+    movie = film_url.split('/')[-2]                                         # Movie title in URL
+
+    stats_url = f'https://letterboxd.com/csi/film/{movie}/stats/'           # Stats page of said movie
+    hist_url = f'https://letterboxd.com/csi/film/{movie}/rating-histogram/' # Rating histogram page of said movie
+
+    return film_url, stats_url, hist_url
+
+def scrape_film(transport, film_html, not_found, cache=None, memo=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None, previous=None, dispatcher=None):
     """
     Scrapes all available information regarding a film. 
     The function makes multiple request calls to relevant Letterboxd film URLs and gets their raw HTML code.
+    Only the film pages that contain the selected columns are requested.
     Using manual text extraction, the wanted information is found and stored in a dictionary.
+    If the film was already scraped during this run, the memoized information is used instead.
+    In incremental mode, a film from the previous output is reused (only its stats are refreshed if they are outdated).
     
     Parameters:
-        film_html (str):    The raw <li> HTML string of the film object obtained from the list page HTML.
-        not_found (object): Either 'np.nan' if output is CSV or 'None' if output is JSON
+        transport (Transport):  The pooled HTTP session that is used for all requests.
+        film_html (str):        The raw <li> HTML string of the film object obtained from the list page HTML.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        cache (FilmCache):      The on-disk film cache, or None if caching is disabled.
+        memo (FilmMemo):        The in-process memo of films scraped during this run, or None.
+        fields (list):          The columns that should be scraped. Default is all columns.
+        parser (str):           The extractor backend used to parse the film pages ("lxml" or "bs4"). Default is "lxml".
+        parse_pool (ParsePool): The pool of processes that parses the film pages, or None to parse them in the current thread.
+        metrics (Metrics):      The metrics that parse times, cache hits and films are recorded in, or None.
+        previous (PreviousOutput): The previous output of the list in incremental mode, or None to scrape all films.
+        dispatcher (FilmDispatcher): The dispatcher of a distributed scrape, the film information is then scraped by the workers. Default is None.
     Returns:
-        film_dict (dict):   A dictionary containing all the film's information.
+        film_dict (dict):       A dictionary containing all the film's information.
     """
-    
+
+    film_url, stats_url, hist_url = film_urls(film_html)
+    slug = film_url.split('/')[-2]
+
+    if metrics:
+        metrics.observe_film()
+
+    film, stale = previous.get(slug) if previous else (None, False)
+    if film is not None:
+        stats = {}
+        if stale:
+            stats = scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, None, previous.refresh_fields, parser, parse_pool, metrics).columns(previous.refresh_fields)
+        previous.record(slug, "refreshed" if stale else "reused")
+        return reuse_film(film, film_html, stats, not_found, fields)
+
+    if dispatcher:
+        scrape = lambda: dispatcher.result(slug)
+    else:
+        scrape = lambda: scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, cache, fields, parser, parse_pool, metrics)
+    record = memo.get_or_scrape(slug, scrape) if memo else scrape()
+
+    if previous:
+        previous.record(slug, "added")
+
+    return build_film_dict(film_html, film_url, record, not_found, fields)
+
+def scrape_poster(film_html, not_found, fields=LIST_PAGE_COLUMNS, metrics=None):
+    """
+    Reads a film from its poster on the list page, without requesting any of its film pages.
+    The position is left empty here, it is filled in when the film is written out (see 'List.write_page()').
+
+    Parameters:
+        film_html (str):        The raw <li> HTML string of the film object obtained from the list page HTML.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        fields (list):          The columns that should be kept, in their output order. Default is all list page columns.
+        metrics (Metrics):      The metrics that the films are counted in, or None.
+    Returns:
+        film_dict (dict):       A dictionary containing the film's information from the list page.
+    """
+
+    film_url, _, _ = film_urls(film_html)
+    poster = film_html.find('div')
+
+    if metrics:
+        metrics.observe_film()
+
     film_dict = {}
+    for column in fields:
+        if column == "Position":
+            film_dict[column] = None
+        elif column == "Film_title":
+            img = poster.find('img')
+            film_dict[column] = poster.get('data-film-name') or (img.get('alt') if img else None) or not_found
+        elif column == "Film_ID":
+            film_id = poster.get('data-film-id')
+            film_dict[column] = int(film_id) if film_id and film_id.isdigit() else not_found
+        elif column == "Film_slug":
+            film_dict[column] = film_url.split('/')[-2]
+        elif column == "Owner_rating":
+            film_dict[column] = parse_owner_rating(film_html, not_found)
+        elif column == "Film_URL":
+            film_dict[column] = film_url
 
-    # Obtaining release year, director and average rating of the movie
-    film_card = film_html.find('div').get('data-target-link')[1:]
-    film_url = _domain + film_card
-    filmget = requests.get(film_url)
-    film_soup = BeautifulSoup(filmget.content, 'html.parser')
+    return film_dict
+
+def poster_futures(films, not_found, fields=LIST_PAGE_COLUMNS, metrics=None):
+    """
+    Reads the films of a list page from their posters and returns them as finished futures,
+    so they are collected in the same way as the films that are scraped by the film threads.
+    """
+
+    futures = []
+    for film in films:
+        future = concurrent.futures.Future()
+        future.set_result(scrape_poster(film, not_found, fields, metrics))
+        futures.append(future)
+
+    return futures
+
+def reuse_film(film, film_html, stats, not_found, fields):
+    """
+    Returns a film from the previous output in incremental mode, updated with its refreshed stats (if any).
+    The list owner's rating is taken from the list page again, as it can change without the film changing.
+
+    Parameters:
+        film (dict):            The film from the previous output.
+        film_html (str):        The raw <li> HTML string of the film object obtained from the list page HTML.
+        stats (dict):           The refreshed film stats, or an empty dict if they were not refreshed.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        fields (list):          The columns of the output.
+    Returns:
+        film_dict (dict):       A dictionary containing all the film's information.
+    """
+
+    film_dict = dict(film)
+    if "Owner_rating" in fields:
+        film_dict["Owner_rating"] = parse_owner_rating(film_html, not_found)
+    film_dict.update((column, value) for column, value in stats.items() if column in fields)
+
+    return film_dict
+
+def scrape_film_data(transport, slug, film_url, stats_url, hist_url, not_found, cache=None, fields=FILM_COLUMNS, parser="lxml", parse_pool=None, metrics=None):
+    """
+    Scrapes the general information and stats of a film, which are the same for every list that the film is in.
+    If a film cache is given, only the parts of the film that are not cached (or expired) are requested.
+    Pages that do not contain any of the selected columns are not requested at all.
+
+    Parameters:
+        transport (Transport):  The pooled HTTP session that is used for all requests.
+        slug (str):             The film slug.
+        film_url (str):         The URL of the film page.
+        stats_url (str):        The URL of the film's stats.
+        hist_url (str):         The URL of the film's rating histogram.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        cache (FilmCache):      The on-disk film cache, or None if caching is disabled.
+        fields (list):          The columns that should be scraped.
+        parser (str):           The extractor backend used to parse the film pages.
+        parse_pool (ParsePool): The pool of processes that parses the film pages, or None to parse them in the current thread.
+        metrics (Metrics):      The metrics that parse times, cache hits and films are recorded in, or None.
+    Returns:
+        record (FilmRecord):    The general film information and stats of the film.
+    """
+
+    meta, stats = cache.get(slug, not_found) if cache else (None, None)
+
+    pages = film_pages(film_url, stats_url, hist_url, meta, stats, fields)
+    if metrics and cache:
+        observe_cache(metrics, pages, meta, stats)
+    contents = {page: fetch(transport, url) for page, url in pages.items()}
+
+    # Pages that were not modified since they were parsed before are not parsed again
+    parsed = stored_parses(transport.responses, pages, parser, not_found)
+    contents = {page: content for page, content in contents.items() if page not in parsed}
+
+    # The raw pages are handed to the parse pool if there is one, this thread waits for the result
+    start = time.perf_counter()
+    if parse_pool and contents:
+        meta, stats, new_meta, new_stats = parse_pool.parse(parse_film_data, contents, meta, stats, not_found, parser, parsed)
+    else:
+        meta, stats, new_meta, new_stats = parse_film_data(contents, meta, stats, not_found, parser, parsed)
+    if metrics and contents:
+        metrics.observe_parse(time.perf_counter() - start)
+
+    store_parses(transport.responses, pages, contents, meta, stats, parser, not_found)
+
+    if cache:
+        cache.put(slug, new_meta, new_stats, not_found)
+
+    return FilmRecord(meta, stats)
+
+def film_pages(film_url, stats_url, hist_url, meta, stats, fields):
+    """
+    Selects the Letterboxd pages of a film that have to be requested: only the pages that contain
+    any of the selected columns, and only if that information was not found in the cache.
+
+    Parameters:
+        film_url (str):     The URL of the film page.
+        stats_url (str):    The URL of the film's stats.
+        hist_url (str):     The URL of the film's rating histogram.
+        meta (dict):        The cached general film information, or None.
+        stats (dict):       The cached film stats, or None.
+        fields (list):      The columns that should be scraped.
+    Returns:
+        pages (dict):       The URLs that have to be requested, keyed by "film", "stats" and/or "histogram".
+    """
+
+    pages = {}
+
+    if meta is None and any(column in fields for column in FILM_PAGE_COLUMNS):
+        pages["film"] = film_url
+
+    if stats is None:
+        if any(column in fields for column in STATS_COLUMNS):
+            pages["stats"] = stats_url
+        if any(column in fields for column in HISTOGRAM_COLUMNS):
+            pages["histogram"] = hist_url
+
+    return pages
+
+def observe_cache(metrics, pages, meta, stats):
+    """
+    Records the cache lookup of a film in the metrics: a section is a hit if it was cached, and a miss if its pages have to be requested.
+    Sections that are neither cached nor selected are not counted.
+    """
+
+    if meta is not None or "film" in pages:
+        metrics.observe_cache("film", meta is not None)
+    if stats is not None or "stats" in pages or "histogram" in pages:
+        metrics.observe_cache("stats", stats is not None)
+
+def parse_film_data(contents, meta, stats, not_found, parser="lxml", parsed=None):
+    """
+    Extracts the general information and stats of a film from the raw content of the requested pages.
+    Sections of which no page was requested are taken from the cache, or left empty if they were not selected.
+
+    Parameters:
+        contents (dict):        The raw content of the requested pages, keyed as in 'film_pages()'.
+        meta (dict):            The cached general film information, or None.
+        stats (dict):           The cached film stats, or None.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        parser (str):           The extractor backend used to parse the pages, see EXTRACTORS.
+        parsed (dict):          The stored parse results of requested pages that were not modified, keyed as in 'film_pages()'.
+                                These pages are not in 'contents'. Default is no stored parse results.
+    Returns:
+        meta (dict):            The general film information.
+        stats (dict):           The film stats.
+        new_meta (dict):        The newly scraped general film information that should be cached, or None.
+        new_stats (dict):       The newly scraped film stats that should be cached, or None.
+    """
+
+    new_meta, new_stats = None, None
+    parsed = parsed or {}
+
+    if "film" in contents:
+        meta = new_meta = EXTRACTORS[parser]["film"](contents["film"], not_found)
+    elif "film" in parsed:
+        meta = new_meta = parsed["film"]
+
+    requested = set(contents) | set(parsed)
+    if "stats" in requested or "histogram" in requested:
+        stats = parse_film_stats(contents.get("stats"), contents.get("histogram"), not_found, parser)
+        for page in ("stats", "histogram"):
+            stats.update(parsed.get(page, {}))
+
+        # Only complete stats are cached
+        if "stats" in requested and "histogram" in requested:
+            new_stats = stats
+
+    return meta or {}, stats or {}, new_meta, new_stats
+
+def stored_parses(responses, pages, parser, not_found):
+    """
+    Returns the stored parse results of the requested pages of a film that were not modified since they were parsed
+    (Letterboxd answered their conditional request with '304 Not Modified'), keyed as in 'film_pages()'.
+
+    Parameters:
+        responses (ResponseCache):  The cache of raw responses, or None if there is none.
+        pages (dict):               The URLs of the requested pages, keyed as in 'film_pages()'.
+        parser (str):               The extractor backend used to parse the pages.
+        not_found (object):         Either NaN if output is CSV or 'None' if output is JSON
+    """
+
+    parsed = {}
+    if responses is None:
+        return parsed
+
+    for page, url in pages.items():
+        result = responses.parsed(url, parser, not_found)
+        if result is not None:
+            parsed[page] = result
+
+    return parsed
+
+def store_parses(responses, pages, contents, meta, stats, parser, not_found):
+    """
+    Stores the parse results of the pages of a film that were parsed with their cached responses, see 'stored_parses()'.
+    The stats of the stats and rating histogram pages are stored separately, by their columns.
+    """
+
+    if responses is None:
+        return
+
+    for page in contents:
+        result = meta if page == "film" else {column: stats[column] for column in PAGE_COLUMNS[page] if column in stats}
+        responses.put_parsed(pages[page], parser, result, not_found)
+
+def fetch(transport, url):
+    """
+    Requests a Letterboxd page and returns its raw content, raises an error if the page could not be loaded.
+    """
+
+    response = transport.get(url)
+    check_status(response.status_code, url)
+
+    return response.content
+
+def parse_film_stats(stats_content, hist_content, not_found, parser="lxml"):
+    """
+    Extracts the stats of a film (watches, likes, fans, rating histogram, etc.) from the raw content of its stats pages.
+    A page whose content is None (i.e. it was not requested) is skipped.
+    """
+
+    stats = {}
+    if stats_content is not None:
+        stats.update(EXTRACTORS[parser]["stats"](stats_content, not_found))
+    if hist_content is not None:
+        stats.update(EXTRACTORS[parser]["histogram"](hist_content, not_found))
+
+    return stats
+
+def build_film_dict(film_html, film_url, record, not_found, fields=FILM_COLUMNS):
+    """
+    Combines the general information and stats of a film with its list-specific information.
+    The film dict is only built when the film is written out, only the selected columns are kept.
+
+    Parameters:
+        film_html (str):        The raw <li> HTML string of the film object obtained from the list page HTML.
+        film_url (str):         The URL of the film page.
+        record (FilmRecord):    The general film information and stats of the film.
+        not_found (object):     Either NaN if output is CSV or 'None' if output is JSON
+        fields (list):          The columns that should be kept, in their output order.
+    Returns:
+        film_dict (dict):       A dictionary containing all the film's information.
+    """
+
+    film_dict = {}
+    for column in fields:
+        if column == "Owner_rating":
+            film_dict[column] = parse_owner_rating(film_html, not_found)
+
+        # Save the film URL as an extra column
+        elif column == "Film_URL":
+            film_dict[column] = film_url
+        else:
+            film_dict[column] = record.get(column)
+
+    return film_dict
+
+def parse_film_page(film_soup, not_found):
+    """
+    Extracts the general film information (title, year, director, cast, etc.) from the film page.
+    """
+
+    film_dict = {}
 
     # Finding the film name
     film_dict["Film_title"] = film_soup.find("div", {"class" : "col-17"}).find("h1").text
@@ -151,8 +757,9 @@ def scrape_film(film_html, not_found):
     film_dict["Director"] = director
 
     # Finding the cast, if not found insert a nan
+    # (links are converted to plain strings, as a NavigableString keeps the whole page alive and cannot be sent to a parse worker)
     try:
-        cast = [ line.contents[0] for line in film_soup.find('div', attrs={'id':'tab-cast'}).find_all('a')]
+        cast = [ str(line.contents[0]) for line in film_soup.find('div', attrs={'id':'tab-cast'}).find_all('a')]
 
         # remove all the 'Show All...' tags if they are present
         film_dict["Cast"] = [i for i in cast if i != 'Show All…']
@@ -165,21 +772,6 @@ def scrape_film(film_html, not_found):
     except:
         film_dict["Average_rating"] = not_found
 
-    # Try to find the list owner's rating of a film if possible and converting to float
-    try:
-        stringval = film_html.attrs['data-owner-rating']
-        if stringval != '0':
-            film_dict["Owner_rating"] = float(int(stringval)/2)
-        else:
-            film_dict["Owner_rating"] = not_found
-    except:
-        # Extra clause for type 'film' lists
-        try:
-            starval = film_html.find_all("span")[-1].text
-            film_dict["Owner_rating"] = stars2val(starval, not_found)
-        except:
-            film_dict["Owner_rating"] = not_found
-        
     # Finding film's genres, if not found insert nan
     try: 
         genres = film_soup.find('div', {'class': 'text-sluglist capitalize'})
@@ -195,7 +787,7 @@ def scrape_film(film_html, not_found):
 
     # Finding countries
     try:
-        film_dict["Countries"] = [ line.contents[0] for line in film_soup.find('div', attrs={'id':'tab-details'}).find_all('a', href=re.compile(r'country'))]
+        film_dict["Countries"] = [ str(line.contents[0]) for line in film_soup.find('div', attrs={'id':'tab-details'}).find_all('a', href=re.compile(r'country'))]
         if film_dict["Countries"] == []:
             film_dict["Countries"] = not_found
     except:
@@ -226,16 +818,40 @@ def scrape_film(film_html, not_found):
 
     # Finding studios
     try:
-        film_dict["Studios"] = [ line.contents[0] for line in film_soup.find('div', attrs={'id':'tab-details'}).find_all('a', href=re.compile(r'studio'))]
+        film_dict["Studios"] = [ str(line.contents[0]) for line in film_soup.find('div', attrs={'id':'tab-details'}).find_all('a', href=re.compile(r'studio'))]
         if film_dict["Studios"] == []:
             film_dict["Studios"] = not_found
     except:
         film_dict["Studios"] = not_found
 
-    # Getting number of watches, appearances in lists and number of likes (requires new link) ## 
-    movie = film_url.split('/')[-2]                                        # Movie title in URL
-    r = requests.get(f'https://letterboxd.com/csi/film/{movie}/stats/')    # Stats page of said movie
-    stats_soup = BeautifulSoup(r.content, 'lxml')
+    return film_dict
+
+def parse_owner_rating(film_html, not_found):
+    """
+    Extracts the list owner's rating of a film from its <li> HTML on the list page.
+    """
+
+    # Try to find the list owner's rating of a film if possible and converting to float
+    try:
+        stringval = film_html.attrs['data-owner-rating']
+        if stringval != '0':
+            return float(int(stringval)/2)
+        else:
+            return not_found
+    except:
+        # Extra clause for type 'film' lists
+        try:
+            starval = film_html.find_all("span")[-1].text
+            return stars2val(starval, not_found)
+        except:
+            return not_found
+
+def parse_stats(stats_soup):
+    """
+    Extracts the number of watches, list appearances and likes from the film's stats page.
+    """
+
+    film_dict = {}
 
     # Get number of people that have watched the movie
     watches = stats_soup.find('a', {'class': 'has-icon icon-watched icon-16 tooltip'})["title"]
@@ -252,9 +868,14 @@ def scrape_film(film_html, not_found):
     likes = re.findall(r'\d+', likes)
     film_dict["Likes"] = int(''.join(likes))
 
-    # Getting info on rating histogram (requires new link)
-    r = requests.get(f'https://letterboxd.com/csi/film/{movie}/rating-histogram/')    # Rating histogram page of said movie
-    hist_soup = BeautifulSoup(r.content, 'lxml')
+    return film_dict
+
+def parse_histogram(hist_soup, not_found):
+    """
+    Extracts the number of fans and the rating histogram from the film's rating histogram page.
+    """
+
+    film_dict = {}
 
     # Get number of fans. Amount is given in 'K' notation, so if relevant rounded off to full thousands
     try:
@@ -293,11 +914,32 @@ def scrape_film(film_html, not_found):
             
     film_dict["Total_ratings"] = tot_ratings
 
-    # Thumbnail URL?
-
-    # Banner URL?
-    
-    # Save the film URL as an extra column
-    film_dict["Film_URL"] = film_url
-    
     return film_dict
+
+def soup_film_page(content, not_found):
+    """
+    Extracts the general film information from the raw content of the film page with BeautifulSoup.
+    """
+
+    return parse_film_page(BeautifulSoup(content, 'html.parser'), not_found)
+
+def soup_stats(content, not_found):
+    """
+    Extracts the film stats from the raw content of the film's stats page with BeautifulSoup.
+    """
+
+    return parse_stats(BeautifulSoup(content, 'lxml'))
+
+def soup_histogram(content, not_found):
+    """
+    Extracts the fans and rating histogram from the raw content of the film's rating histogram page with BeautifulSoup.
+    """
+
+    return parse_histogram(BeautifulSoup(content, 'lxml'), not_found)
+
+# The extractor backends that turn the raw content of the film pages into their information, keyed as in 'film_pages()'
+# "lxml" parses each page once and uses precompiled XPath expressions, "bs4" is the (slower) reference implementation
+EXTRACTORS = {
+    "lxml": {"film": xpath_film_page, "stats": xpath_stats, "histogram": xpath_histogram},
+    "bs4": {"film": soup_film_page, "stats": soup_stats, "histogram": soup_histogram},
+}
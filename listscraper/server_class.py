@@ -0,0 +1,363 @@
+from listscraper.instance_class import ScrapeInstance
+from listscraper.cli import cli_parser
+import listscraper.checkimport_functions as cef
+from urllib.parse import urlparse, unquote
+import http.server
+import socketserver
+import itertools
+import threading
+import shutil
+import queue
+import shlex
+import json
+import time
+import io
+import os
+
+# The options that a job can set, all other options are set when the server starts and are shared by all jobs
+# (a job can not read files of the server with -f, it gives the lines of an input file in the request instead)
+JOB_OPTIONS = {"listURL", "pages", "output_name", "output_path", "output_file_extension", "concat", "fields",
+               "list_only", "resume", "incremental", "refresh_after", "quiet"}
+
+def inside_directory(root, path):
+    """
+    Returns True if 'path' (after resolving '..' and symbolic links) is the directory 'root' or inside it.
+    """
+
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+def job_output_names(job_args, lines=None):
+    """
+    Returns the names that the output files of a job are built from, relative to its output path: the -on of the job
+    (also the name of a --concat file), the -on of every line and the directory of every user whose lists are exported.
+    """
+
+    names = [job_args.output_name]
+    urls = list(job_args.listURL)
+    for line in lines or []:
+        if line.startswith("#") or not line.strip():
+            continue
+        chunks = line.split(' ')
+        urls += [chunk for chunk in chunks if "https://" in chunk][:1]
+        for flag in ("-on", "--output_name"):
+            if flag in chunks:
+                names.append(chunks[chunks.index(flag) + 1] if chunks.index(flag) + 1 < len(chunks) else "")
+
+    for url in urls:
+        check, type, username, listname = cef.checkimport_url(url)
+        if check and type == "user":
+            names.append(os.path.join(username, listname))
+
+    return [name for name in names if name is not None]
+
+def parse_job_arguments(args, lines=None, output_root="scraper_outputs"):
+    """
+    Parses the arguments of a job with the parser of the command line, so a job takes the same list URLs and options as a run.
+    The output path of the job is a directory inside the output root of the server, and so are all of its output files.
+
+        Parameters:
+            args (list/str):    The arguments of the job, as a list or as a single command line string.
+            lines (list):       The lines of an input file (list URLs with their -p, -on and --priority options) instead of list URLs in 'args'.
+            output_root (str):  The directory that all jobs write their output in.
+
+        Returns:
+            job_args (Namespace):   The parsed arguments, 'file' holds the lines (if any) and 'output_path' is inside the output root.
+
+        Raises:
+            ValueError:     If the arguments are not valid, contain no lists, set an option that is set when the server starts,
+                            or have an output path or output name (-on) outside of the output root.
+    """
+
+    if isinstance(args, str):
+        args = shlex.split(args)
+    if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+        raise ValueError("'args' should be a list of strings or a command line string")
+    if lines is not None and (not isinstance(lines, list) or not all(isinstance(line, str) for line in lines)):
+        raise ValueError("'lines' should be a list of strings")
+
+    def error(message):
+        raise ValueError(message)
+
+    parser = cli_parser()
+    parser.error = error
+
+    # The input file is not opened by the parser, so a job can never read a file (or the stdin) of the server
+    for action in parser._actions:
+        if action.dest == "file":
+            action.type = str
+
+    try:
+        job_args = parser.parse_args(args)
+    except SystemExit:
+        raise ValueError("'--help' and '--version' are not jobs")
+
+    if job_args.file is not None:
+        raise ValueError("-f can not be used by a job, please give the lines of the input file as 'lines' instead")
+    for option, value in vars(job_args).items():
+        if option not in JOB_OPTIONS and value != parser.get_default(option):
+            raise ValueError(f"--{option.replace('_', '-')} is set when the server starts and can not be changed by a job")
+
+    if lines:
+        if job_args.listURL:
+            raise ValueError("please give either list URLs in 'args' or 'lines', not both")
+        job_args.file = io.StringIO("\n".join(lines))
+        job_args.file.name = "the lines of the job"
+    elif not job_args.listURL:
+        raise ValueError("no list URLs were given")
+
+    # Without -op the job writes to the output root itself
+    root = os.path.realpath(output_root)
+    if job_args.output_path == parser.get_default("output_path"):
+        job_args.output_path = root
+    else:
+        job_args.output_path = os.path.realpath(os.path.join(root, job_args.output_path))
+        if not inside_directory(root, job_args.output_path):
+            raise ValueError(f"-op should be a directory inside the output root of the server ({output_root})")
+
+    # The output files are named after the -on of the job or line (or the list URL), which are joined onto the output path
+    for name in job_output_names(job_args, lines):
+        if not name or not inside_directory(root, os.path.join(job_args.output_path, name)):
+            raise ValueError(f"the output name '{name}' should be a file name inside the output root of the server ({output_root})")
+
+    return job_args
+
+class Job:
+    """
+    A scrape job that was submitted to the server.
+
+    Attributes:
+        id (str):           The ID of the job.
+        args (list):        The arguments of the job, as given on the command line.
+        job_args (Namespace):   The parsed arguments of the job.
+        status (str):       The status of the job: "queued", "running", "finished" or "failed".
+        error (str):        The error message of a failed job, None otherwise.
+        log (StringIO):     Everything the scraper printed while running the job.
+        files (list):       The output files of a finished job, relative to its output path.
+        films (int):        The amount of films that were written out.
+        submitted, started, ended (float):  The times at which the job was submitted, started and ended.
+
+    Methods:
+        report():   Returns the status of the job as a dict.
+    """
+
+    def __init__(self, id, args, job_args):
+        self.id = id
+        self.args = args
+        self.job_args = job_args
+        self.status = "queued"
+        self.error = None
+        self.log = io.StringIO()
+        self.files = []
+        self.films = 0
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+
+    def report(self):
+        return {"id": self.id, "status": self.status, "error": self.error, "args": self.args,
+                "output_path": self.job_args.output_path, "files": self.files, "films": self.films,
+                "submitted": self.submitted, "started": self.started, "ended": self.ended}
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server that listens on a Unix socket instead of on a TCP port.
+    """
+
+    daemon_threads = True
+
+class ScrapeServer:
+    """
+    Long-running scraper that accepts jobs over a local HTTP API, on a TCP port or a Unix socket.
+    All jobs share the request layer and caches of the server (pooled connections, rate limiter, film and response cache),
+    so these stay warm between jobs and the startup of the program is only paid once. Jobs are run one at a time, in the
+    order in which they were submitted; every job scrapes its lists with all threads of the server.
+
+    API:
+        POST /jobs                  Submits a job, the body is {"args": [...]} with the list URLs and options of the command line
+                                    (e.g. -p, -on, -op, -ofe, --concat, --fields, --list-only). Returns the status of the job.
+                                    Instead of list URLs, the body can have "lines": [...] with the lines of an input file.
+                                    The -op of a job is a directory inside the output root of the server.
+        GET /jobs                   Returns the status of all jobs.
+        GET /jobs/<id>              Returns the status of a job, with its output files once it is finished.
+        GET /jobs/<id>/log          Returns everything the scraper printed while running the job.
+        GET /jobs/<id>/files/<name> Returns an output file of a finished job.
+        GET /metrics                Returns the metrics of the server in the Prometheus text format.
+
+    Attributes:
+        resources (ScrapeResources):    The request layer and caches that are shared by all jobs.
+        jobs (dict):                    All submitted jobs by their ID.
+        address (str):                  The address that the API listens on.
+        work_queue (str):               URL of the shared work queue if the films of all jobs are scraped by distributed workers, None otherwise.
+        output_root (str):              The directory that all jobs write their output in.
+
+    Methods:
+        submit(args, lines):    Submits a job and returns it.
+        serve_forever():    Handles requests to the API until the server is closed.
+        close():            Stops accepting requests and stops once the running job is finished.
+    """
+
+    def __init__(self, resources, host="127.0.0.1", port=8765, socket_path=None, work_queue=None, output_root="scraper_outputs"):
+        self.resources = resources
+        self.work_queue = work_queue
+        self.output_root = output_root
+        self.jobs = {}
+        self.queue = queue.Queue()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+        handler = self.handler()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.httpd = UnixHTTPServer(socket_path, handler)
+            self.address = f"unix:{socket_path}"
+        else:
+            self.httpd = http.server.ThreadingHTTPServer((host, port), handler)
+            self.httpd.daemon_threads = True
+            self.address = f"http://{host}:{self.httpd.server_address[1]}/"
+
+        self.runner = threading.Thread(target=self.run_jobs, daemon=True)
+        self.runner.start()
+
+    def submit(self, args, lines=None):
+        """
+        Checks the arguments of a job and adds it to the queue. Raises a ValueError if the arguments are not valid.
+        """
+
+        job_args = parse_job_arguments(args, lines, self.output_root)
+        with self.lock:
+            job = Job(str(next(self.ids)), args, job_args)
+            self.jobs[job.id] = job
+        self.queue.put(job)
+        return job
+
+    def run_jobs(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            self.run(job)
+
+    def run(self, job):
+        """
+        Runs a job with the shared resources. Everything the scraper prints for the job is kept in the log of the job,
+        the output of the server itself (and of other threads) is not.
+        """
+
+        print(f"Starting job {job.id}: {' '.join(job.args) if isinstance(job.args, list) else job.args}")
+        job.status, job.started = "running", time.time()
+
+        a = job.job_args
+        try:
+            instance = ScrapeInstance(a.listURL, a.pages, a.output_name, a.output_path, a.output_file_extension, a.file, a.concat, a.quiet, a.threads, a.film_threads,
+                                      resume=a.resume, fields=a.fields, incremental=a.incremental, refresh_after=a.refresh_after, resources=self.resources,
+                                      queue=None if a.list_only else self.work_queue, list_only=a.list_only, log=job.log)
+        except SystemExit as e:
+            job.status, job.error = "failed", str(e.code).strip()
+        except Exception as e:
+            job.status, job.error = "failed", repr(e)
+        else:
+            if instance.concat:
+                names = [instance.global_output_name + instance.output_file_extension]
+            else:
+                names = [listobj.output_name for listobj in instance.lists_to_scrape]
+            job.files = [name for name in names if os.path.exists(os.path.join(instance.output_path, name))]
+            job.films = sum(listobj.film_count for listobj in instance.lists_to_scrape)
+            job.status = "finished"
+        finally:
+            if a.file:
+                a.file.close()
+        job.ended = time.time()
+
+        print(f"    Job {job.id} {job.status} in {job.ended - job.started:.2f} seconds{f': {job.error}' if job.error else ''}.")
+
+    def handler(self):
+        """
+        Returns the request handler of the API.
+        """
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send_content(self, status, content, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def send_json(self, status, content):
+                self.send_content(status, json.dumps(content, indent=4).encode(), "application/json")
+
+            def route(self):
+                return [unquote(part) for part in urlparse(self.path).path.split("/") if part]
+
+            def do_GET(self):
+                parts = self.route()
+
+                if parts == ["metrics"] and server.resources.metrics:
+                    return self.send_content(200, server.resources.metrics.prometheus().encode(), "text/plain; version=0.0.4; charset=utf-8")
+                if parts == ["jobs"]:
+                    return self.send_json(200, [job.report() for job in list(server.jobs.values())])
+
+                job = server.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+                if job is None:
+                    return self.send_json(404, {"error": "not found"})
+
+                if len(parts) == 2:
+                    return self.send_json(200, job.report())
+                if parts[2:] == ["log"]:
+                    return self.send_content(200, job.log.getvalue().encode(), "text/plain; charset=utf-8")
+
+                # Only the output files of the job are served, and never a file outside of its output path
+                name = "/".join(parts[3:])
+                path = os.path.join(job.job_args.output_path, name)
+                if parts[2] == "files" and name in job.files and inside_directory(job.job_args.output_path, path):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(os.path.getsize(path)))
+                    self.end_headers()
+                    with open(path, "rb") as f:
+                        shutil.copyfileobj(f, self.wfile)
+                    return
+                return self.send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.route() != ["jobs"]:
+                    return self.send_json(404, {"error": "not found"})
+
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    if not isinstance(body, dict):
+                        raise ValueError("the body should be a JSON object")
+                    job = server.submit(body.get("args", []) if body.get("lines") else body.get("args"), body.get("lines"))
+                except ValueError as e:
+                    return self.send_json(400, {"error": str(e)})
+                return self.send_json(202, job.report())
+
+        return Handler
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def close(self):
+        """
+        Stops accepting requests, lets the running job finish and drops the jobs that are still queued.
+        """
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if isinstance(self.httpd, UnixHTTPServer):
+            os.remove(self.httpd.server_address)
+
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.queue.put(None)
+        self.runner.join()
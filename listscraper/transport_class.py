@@ -0,0 +1,366 @@
+from listscraper.ratelimit_class import RateLimiter, RETRY_STATUSES, THROTTLE_STATUSES, retry_delay
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+import requests
+import asyncio
+import time
+import sys
+
+class Transport:
+    """
+    Class that holds the pooled HTTP session that is shared by all scrape functions.
+    Connections to Letterboxd are kept alive and reused, so only the first requests pay for the TCP and TLS handshakes.
+    All requests go through the rate limiter, and requests that fail or are throttled are retried with a backoff.
+
+    Attributes:
+        pool_size (int):            The maximum amount of connections that are kept open per host.
+        limiter (RateLimiter):      The rate limiter that is shared by all requests.
+        retries (int):              The maximum amount of retries of a failed request.
+        timeout (float):            The timeout of a single request in seconds.
+        archive (ResponseArchive):  The archive that all responses are recorded in, or None.
+        metrics (Metrics):          The metrics that every request is recorded in, or None.
+        responses (ResponseCache):  The cache of raw responses that cached URLs are requested conditionally from, or None.
+        session (requests.Session): The session that performs all requests.
+
+    Methods:
+        get(url):               Requests a URL using a pooled connection, conditionally if the URL is in the response cache.
+        request(url, headers):  Requests a URL using a pooled connection, retrying if necessary.
+        close():                Closes all pooled connections.
+    """
+
+    def __init__(self, pool_size=10, limiter=None, retries=5, timeout=30, archive=None, metrics=None, responses=None):
+        """
+        Constructs the session and mounts an adapter with a connection pool of the given size.
+
+        Parameters:
+            pool_size (int):        The maximum amount of connections that are kept open per host.
+                                    This should equal the amount of threads that make requests at the same time.
+            limiter (RateLimiter):  The rate limiter that is shared by all requests. Default is no limit.
+            retries (int):          The maximum amount of retries of a failed request.
+            timeout (float):        The timeout of a single request in seconds.
+            archive (ResponseArchive):  The archive that all responses are recorded in. Default is no recording.
+            metrics (Metrics):          The metrics that every request is recorded in. Default is no metrics.
+            responses (ResponseCache):  The cache of raw responses. Default is no conditional requests.
+        """
+
+        self.pool_size = pool_size
+        self.limiter = limiter if limiter else RateLimiter()
+        self.retries = retries
+        self.timeout = timeout
+        self.archive = archive
+        self.metrics = metrics
+        self.responses = responses
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Accepts all compressions that urllib3 can decode (gzip, deflate, and brotli/zstd if their packages are installed)
+        self.session.headers.update(make_headers(accept_encoding=True))
+
+    def get(self, url):
+        """
+        Requests a URL using a pooled connection.
+        If the URL is in the response cache, it is requested conditionally and a '304 Not Modified' response is
+        served from the cache (as a normal response with status 200). New responses are stored in the cache.
+
+        Parameters:
+            url (str):  The URL that should be requested.
+
+        Returns:
+            response (requests.Response):   The response of the request. This is the last failed response if all retries failed.
+        """
+
+        if self.responses is None:
+            return self.request(url)
+
+        response = self.request(url, self.responses.validators(url))
+        if response.status_code == 304:
+            content = self.responses.get(url)
+
+            # The response can be evicted from the cache in the meantime, then it is requested in full
+            return ArchivedResponse(200, content) if content is not None else self.request(url)
+
+        if response.status_code == 200:
+            self.responses.put(url, response.headers, response.content)
+        return response
+
+    def request(self, url, headers=None):
+        """
+        Requests a URL using a pooled connection.
+        Connection errors, timeouts and server errors (including throttling) are retried with a backoff.
+
+        Parameters:
+            url (str):          The URL that should be requested.
+            headers (dict):     Extra headers of the request (e.g. the validators of a conditional request), or None.
+
+        Returns:
+            response (requests.Response):   The response of the request. This is the last failed response if all retries failed.
+        """
+
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            finally:
+                self.limiter.release()
+
+            if self.metrics:
+                self.metrics.observe_request(url, time.perf_counter() - start, response.status_code if response is not None else 0,
+                                             len(response.content) if response is not None else 0)
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self.limiter.record(throttled=False)
+                break
+
+            self.limiter.record(throttled=response is not None and response.status_code in THROTTLE_STATUSES)
+            if attempt < self.retries:
+                if self.metrics:
+                    self.metrics.observe_retry(url)
+                time.sleep(retry_delay(attempt, response.headers.get("Retry-After") if response is not None else None))
+
+        if response is None:
+            raise error
+
+        # Failed responses are not recorded, so they are fetched again when the archive is recorded again
+        if self.archive and response.status_code not in RETRY_STATUSES:
+            self.archive.record(url, response.status_code, response.content)
+        return response
+
+    def close(self):
+        """
+        Closes all pooled connections.
+        """
+
+        self.session.close()
+
+class AsyncTransport:
+    """
+    Class that holds the aiohttp session that is shared by all requests of the async engine.
+    It should be used as an async context manager, so the session is opened and closed on the event loop.
+    Requests go through the same rate limiting and retries as the Transport class, but the amount of requests
+    in flight is limited by the connector instead of the adaptive limit.
+
+    Attributes:
+        max_requests (int):     The maximum amount of requests that are in flight at the same time.
+        per_host (int):         The maximum amount of requests to a single host that are in flight at the same time.
+        limiter (RateLimiter):  The rate limiter that is shared by all requests.
+        retries (int):          The maximum amount of retries of a failed request.
+        timeout (float):        The timeout of a single request in seconds.
+        archive (ResponseArchive):  The archive that all responses are recorded in, or None.
+        metrics (Metrics):          The metrics that every request is recorded in, or None.
+        responses (ResponseCache):  The cache of raw responses that cached URLs are requested conditionally from, or None.
+
+    Methods:
+        get(url):               Coroutine that requests a URL, conditionally if the URL is in the response cache.
+        request(url, headers):  Coroutine that requests a URL, retrying if necessary.
+    """
+
+    def __init__(self, max_requests=64, per_host=16, limiter=None, retries=5, timeout=30, archive=None, metrics=None, responses=None):
+        """
+        Stores the options of the session, the session itself is created when the context is entered.
+        """
+
+        self.max_requests = max_requests
+        self.per_host = per_host
+        self.limiter = limiter if limiter else RateLimiter()
+        self.retries = retries
+        self.timeout = timeout
+        self.archive = archive
+        self.metrics = metrics
+        self.responses = responses
+
+    async def __aenter__(self):
+        try:
+            import aiohttp
+        except ImportError:
+            sys.exit("    The async engine requires the 'aiohttp' package. Please install it with 'pip install aiohttp' and try again.")
+
+        self.errors = (aiohttp.ClientError, asyncio.TimeoutError)
+        connector = aiohttp.TCPConnector(limit=self.max_requests, limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def get(self, url):
+        """
+        Requests a URL and reads its full content.
+        If the URL is in the response cache, it is requested conditionally and a '304 Not Modified' response is
+        served from the cache (with status 200). New responses are stored in the cache.
+
+        Returns:
+            status (int):       The HTTP status code of the response.
+            content (bytes):    The raw content of the response.
+        """
+
+        if self.responses is None:
+            status, content, _ = await self.request(url)
+            return status, content
+
+        status, content, headers = await self.request(url, self.responses.validators(url))
+        if status == 304:
+            content = self.responses.get(url)
+
+            # The response can be evicted from the cache in the meantime, then it is requested in full
+            if content is not None:
+                return 200, content
+            status, content, headers = await self.request(url)
+
+        if status == 200:
+            self.responses.put(url, headers, content)
+        return status, content
+
+    async def request(self, url, headers=None):
+        """
+        Requests a URL and reads its full content.
+        Connection errors, timeouts and server errors (including throttling) are retried with a backoff.
+
+        Parameters:
+            url (str):          The URL that should be requested.
+            headers (dict):     Extra headers of the request (e.g. the validators of a conditional request), or None.
+
+        Returns:
+            status (int):       The HTTP status code of the response.
+            content (bytes):    The raw content of the response.
+            headers (dict):     The headers of the response.
+        """
+
+        for attempt in range(self.retries + 1):
+            status, retry_after, error = None, None, None
+
+            await asyncio.sleep(self.limiter.wait_time())
+            start = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    status, content = response.status, await response.read()
+                    response_headers = response.headers
+                    retry_after = response.headers.get("Retry-After")
+            except self.errors as e:
+                error = e
+
+            if self.metrics:
+                self.metrics.observe_request(url, time.perf_counter() - start, status or 0, len(content) if status is not None else 0)
+
+            if status is not None and status not in RETRY_STATUSES:
+                break
+
+            if attempt < self.retries:
+                if self.metrics:
+                    self.metrics.observe_retry(url)
+                await asyncio.sleep(retry_delay(attempt, retry_after))
+
+        if status is None:
+            raise error
+
+        if self.archive and status not in RETRY_STATUSES:
+            self.archive.record(url, status, content)
+        return status, content, response_headers
+
+class ArchivedResponse:
+    """
+    A response that is served from a ResponseArchive (or the ResponseCache), with the same attributes as a 'requests.Response' that the scrape functions use.
+    """
+
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+class ReplayTransport:
+    """
+    Class that serves the responses of a recorded ResponseArchive instead of requesting them from Letterboxd.
+    It replaces the Transport class in replay mode, so a scrape can be repeated offline and deterministically.
+    An artificial latency can be added to every request, to mimic the timing of a real scrape.
+
+    Attributes:
+        archive (ResponseArchive):  The archive that the responses are served from.
+        latency (float):            The artificial latency of every request in seconds.
+        metrics (Metrics):          The metrics that every request is recorded in, or None.
+
+    Methods:
+        get(url):               Returns the recorded response of a URL.
+        lookup(url, start):     Looks up the recorded response of a URL and records it in the metrics.
+        close():                Does nothing, the archive is closed by its owner.
+    """
+
+    # Replays are deterministic, so nothing is requested conditionally
+    responses = None
+
+    def __init__(self, archive, latency=0, metrics=None):
+        """
+        Constructs the transport.
+
+        Parameters:
+            archive (ResponseArchive):  The archive that the responses are served from.
+            latency (float):            The artificial latency of every request in seconds. Default is no latency.
+            metrics (Metrics):          The metrics that every request is recorded in. Default is no metrics.
+        """
+
+        self.archive = archive
+        self.latency = latency
+        self.metrics = metrics
+
+    def lookup(self, url, start):
+        """
+        Looks up the recorded response of a URL and records it in the metrics, timed from 'start'.
+        """
+
+        status, content = self.archive.lookup(url)
+        if self.metrics:
+            self.metrics.observe_request(url, time.perf_counter() - start, status, len(content))
+        return status, content
+
+    def get(self, url):
+        """
+        Returns the recorded response of a URL, after waiting for the artificial latency.
+
+        Returns:
+            response (ArchivedResponse):    The recorded response. Its status code is 404 if the URL was not recorded.
+        """
+
+        start = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+
+        return ArchivedResponse(*self.lookup(url, start))
+
+    def close(self):
+        pass
+
+class AsyncReplayTransport(ReplayTransport):
+    """
+    Coroutine version of the ReplayTransport class, used by the async engine in replay mode.
+    It should be used as an async context manager, like the AsyncTransport class it replaces.
+
+    Methods:
+        get(url):   Coroutine that returns the recorded status and content of a URL.
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def get(self, url):
+        """
+        Returns the recorded response of a URL, after waiting for the artificial latency.
+
+        Returns:
+            status (int):       The recorded HTTP status code, 404 if the URL was not recorded.
+            content (bytes):    The recorded content of the response.
+        """
+
+        start = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        return self.lookup(url, start)
@@ -1,5 +1,21 @@
 # Some utility functions are stored here
 
+# The columns of a scraped film, in the order that they are written out
+FILM_COLUMNS = ["Film_title", "Release_year", "Director", "Cast", "Average_rating", "Owner_rating", "Genres", "Runtime",
+                "Countries", "Original_language", "Spoken_languages", "Description", "Studios",
+                "Watches", "List_appearances", "Likes", "Fans",
+                "½", "★", "★½", "★★", "★★½", "★★★", "★★★½", "★★★★", "★★★★½", "★★★★★",
+                "Total_ratings", "Film_URL"]
+
+# The columns that are found on each of the Letterboxd pages of a film, the other columns are found on the list page itself
+FILM_PAGE_COLUMNS = ["Film_title", "Release_year", "Director", "Cast", "Average_rating", "Genres", "Runtime",
+                     "Countries", "Original_language", "Spoken_languages", "Description", "Studios"]
+STATS_COLUMNS = ["Watches", "List_appearances", "Likes"]
+HISTOGRAM_COLUMNS = ["Fans", "½", "★", "★½", "★★", "★★½", "★★★", "★★★½", "★★★★", "★★★★½", "★★★★★", "Total_ratings"]
+
+# The columns of a list-only scrape, which are all found on the posters of the list page (no film pages are requested)
+LIST_PAGE_COLUMNS = ["Position", "Film_title", "Film_ID", "Film_slug", "Owner_rating", "Film_URL"]
+
 def stars2val(stars, not_found):
     """
     Transforms star rating into float value.
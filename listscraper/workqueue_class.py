@@ -0,0 +1,216 @@
+import importlib.util
+import threading
+import sqlite3
+import time
+import sys
+import os
+
+# The amount of times a task is leased before it is marked as failed
+MAX_ATTEMPTS = 3
+
+def open_work_queue(url):
+    """
+    Opens the shared work queue of a distributed scrape.
+
+        Parameters:
+            url (str):  'redis://<host>:<port>/<db>' for a Redis server (requires the 'redis' package),
+                        or 'sqlite:///<path>' (or just a path) for a SQLite file, e.g. on a shared disk or for testing on one machine.
+                        Like in SQLAlchemy, 'sqlite:///q.db' is the relative path 'q.db' and 'sqlite:////data/q.db' the absolute path '/data/q.db'.
+
+        Returns:
+            work_queue (SQLiteWorkQueue/RedisWorkQueue):    The opened work queue.
+    """
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        if importlib.util.find_spec("redis") is None:
+            sys.exit("    A Redis work queue requires the 'redis' package. Please install it with 'pip install redis' and try again.")
+        return RedisWorkQueue(url)
+
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    elif url.startswith("sqlite:"):
+        sys.exit(f"    Unknown SQLite work queue {url}, please give its path as 'sqlite:///<relative path>' or 'sqlite:////<absolute path>'.")
+    if not url:
+        sys.exit("    The SQLite work queue has no path, please give it as 'sqlite:///<relative path>' or 'sqlite:////<absolute path>'.")
+    return SQLiteWorkQueue(url)
+
+class SQLiteWorkQueue:
+    """
+    Work queue with leases, stored in a SQLite database. Every task has an ID and a payload (a JSON string).
+    A worker leases a task for a limited time; if the worker crashes, the task can be leased again once its lease expired.
+    A task that failed (or whose lease expired) MAX_ATTEMPTS times is marked as failed, with the error of its last attempt.
+
+    Attributes:
+        path (str):     The path of the database.
+
+    Methods:
+        push(tasks):                            Adds tasks, tasks whose ID is already in the queue are skipped.
+        lease(worker, seconds):                 Leases the oldest available task and returns its ID and payload, or None.
+        complete(task_id, result):              Stores the result of a task.
+        fail(task_id, error):                   Releases a failed task, so it is tried again (or marks it as failed).
+        results(task_ids):                      Returns the results and errors of the finished tasks.
+        remove(task_ids):                       Removes tasks from the queue.
+        close():                                Closes the database.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # The connection is shared by all threads, so all access goes through a lock. Other processes use their own connection.
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+                               id TEXT PRIMARY KEY, payload TEXT, created REAL,
+                               status TEXT, worker TEXT, lease_until REAL, attempts INTEGER,
+                               result TEXT, error TEXT)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created)")
+
+    def push(self, tasks):
+        now = time.time()
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO tasks (id, payload, created, status, attempts) VALUES (?, ?, ?, 'pending', 0)",
+                                [(task_id, payload, now) for task_id, payload in tasks])
+
+    def lease(self, worker, seconds):
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # Tasks of crashed workers are given to another worker, until they used up their attempts
+                self.db.execute("""UPDATE tasks SET status = 'failed', error = 'the lease of the task expired ' || attempts || ' times'
+                                   WHERE status = 'leased' AND lease_until < ? AND attempts >= ?""", (now, MAX_ATTEMPTS))
+                row = self.db.execute("""SELECT id, payload FROM tasks
+                                         WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?)
+                                         ORDER BY created LIMIT 1""", (now,)).fetchone()
+                if row:
+                    self.db.execute("UPDATE tasks SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                                    (worker, now + seconds, row[0]))
+                self.db.execute("COMMIT")
+            except:
+                self.db.execute("ROLLBACK")
+                raise
+        return row
+
+    def complete(self, task_id, result):
+        with self.lock:
+            self.db.execute("UPDATE tasks SET status = 'done', result = ?, error = NULL WHERE id = ?", (result, task_id))
+
+    def fail(self, task_id, error):
+        with self.lock:
+            self.db.execute("""UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?
+                               WHERE id = ? AND status = 'leased'""", (MAX_ATTEMPTS, error, task_id))
+
+    def results(self, task_ids):
+        """
+        Returns a dict with the (result, error) of every finished task, the result is None for failed tasks.
+        """
+
+        finished = {}
+        task_ids = list(task_ids)
+        with self.lock:
+            for i in range(0, len(task_ids), 500):
+                chunk = task_ids[i:i + 500]
+                rows = self.db.execute(f"""SELECT id, status, result, error FROM tasks
+                                           WHERE id IN ({','.join('?' * len(chunk))}) AND status IN ('done', 'failed')""", chunk)
+                for task_id, status, result, error in rows:
+                    finished[task_id] = (result, None) if status == "done" else (None, error)
+        return finished
+
+    def remove(self, task_ids):
+        task_ids = list(task_ids)
+        with self.lock:
+            for i in range(0, len(task_ids), 500):
+                chunk = task_ids[i:i + 500]
+                self.db.execute(f"DELETE FROM tasks WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+class RedisWorkQueue:
+    """
+    Work queue with leases, stored on a Redis server, with the same methods as the SQLiteWorkQueue.
+    The pending tasks are a list, the leases a sorted set by their expiry time, and the payloads, attempts, results
+    and errors are hashes by task ID. All keys start with 'listscraper:'.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.url = url
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.keys = {name: f"listscraper:{name}" for name in ("tasks", "pending", "leases", "attempts", "results", "errors")}
+
+    def push(self, tasks):
+        for task_id, payload in tasks:
+            if self.redis.hsetnx(self.keys["tasks"], task_id, payload):
+                self.redis.rpush(self.keys["pending"], task_id)
+
+    def lease(self, worker, seconds):
+        now = time.time()
+
+        # Tasks of crashed workers are given to another worker, until they used up their attempts (only one client can remove a lease)
+        for task_id in self.redis.zrangebyscore(self.keys["leases"], 0, now):
+            if self.redis.zrem(self.keys["leases"], task_id):
+                attempts = int(self.redis.hget(self.keys["attempts"], task_id) or 0)
+                if attempts >= MAX_ATTEMPTS:
+                    self.redis.hset(self.keys["errors"], task_id, f"the lease of the task expired {attempts} times")
+                else:
+                    self.redis.rpush(self.keys["pending"], task_id)
+
+        while True:
+            task_id = self.redis.lpop(self.keys["pending"])
+            if task_id is None:
+                return None
+
+            # Tasks that were removed while they were pending are skipped
+            payload = self.redis.hget(self.keys["tasks"], task_id)
+            if payload is not None:
+                break
+
+        self.redis.zadd(self.keys["leases"], {task_id: now + seconds})
+        self.redis.hincrby(self.keys["attempts"], task_id, 1)
+        return task_id, payload
+
+    def complete(self, task_id, result):
+        self.redis.hset(self.keys["results"], task_id, result)
+        self.redis.hdel(self.keys["errors"], task_id)
+        self.redis.zrem(self.keys["leases"], task_id)
+
+    def fail(self, task_id, error):
+        if not self.redis.zrem(self.keys["leases"], task_id):
+            return
+        if int(self.redis.hget(self.keys["attempts"], task_id) or 0) >= MAX_ATTEMPTS:
+            self.redis.hset(self.keys["errors"], task_id, error)
+        else:
+            self.redis.rpush(self.keys["pending"], task_id)
+
+    def results(self, task_ids):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+
+        finished = {}
+        results = self.redis.hmget(self.keys["results"], task_ids)
+        errors = self.redis.hmget(self.keys["errors"], task_ids)
+        for task_id, result, error in zip(task_ids, results, errors):
+            if result is not None:
+                finished[task_id] = (result, None)
+            elif error is not None:
+                finished[task_id] = (None, error)
+        return finished
+
+    def remove(self, task_ids):
+        task_ids = list(task_ids)
+        for i in range(0, len(task_ids), 500):
+            chunk = task_ids[i:i + 500]
+            for name in ("tasks", "attempts", "results", "errors"):
+                self.redis.hdel(self.keys[name], *chunk)
+            self.redis.zrem(self.keys["leases"], *chunk)
+
+    def close(self):
+        self.redis.close()
@@ -0,0 +1,444 @@
+from listscraper.utility_functions import STATS_COLUMNS, HISTOGRAM_COLUMNS
+import threading
+import shutil
+import json
+import csv
+import sys
+import os
+
+# The types of the columns in the columnar (Parquet and Arrow) output, any other column is a string
+LIST_COLUMNS = ["Cast", "Genres", "Countries", "Spoken_languages", "Studios"]
+INT_COLUMNS = ["Release_year", "Runtime", "Position", "Film_ID"] + STATS_COLUMNS + HISTOGRAM_COLUMNS
+FLOAT_COLUMNS = ["Average_rating", "Owner_rating"]
+
+class FilmWriter:
+    """
+    Base class of the streaming output writers. Films are written out page by page as soon as they are scraped,
+    so memory use stays flat and everything that was scraped before a crash is already on disk.
+    The output file is only created once the first films are written. All writers are thread-safe,
+    so multiple lists can stream into the same (concatenated) file.
+    In append mode, films are added to an existing output file (used to resume interrupted scrapes).
+    After every batch, the position of its end in the file is handed to a checkpoint (which records it in the journal)
+    before any other batch is written. When resuming from that position, everything after it is removed first, so
+    films that were written (or partly written) without being recorded are not written twice.
+
+    Attributes:
+        outpath (str):      The path of the output file.
+        append (bool):      Whether films are appended to an existing output file.
+        count (int):        The amount of films that were written out.
+        position (int):     The position of the end of the written films: the size of the file in bytes
+                            (the amount of rows for the columnar writers).
+
+    Methods:
+        write(films, checkpoint):   Writes a batch of films to the file.
+        close():                    Finishes and closes the file.
+    """
+
+    def __init__(self, outpath, append=False, position=None):
+        """
+        Constructs the writer, the output file is opened on the first write.
+
+        Parameters:
+            outpath (str):      The path of the output file.
+            append (bool):      Whether films are appended to an existing output file.
+            position (int):     In append mode, the position of the last batch that was recorded in the journal.
+                                Everything after it is removed. None to keep the whole file.
+        """
+
+        self.outpath = outpath
+        self.append = append
+        self.count = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+        self.position = 0
+        if append:
+            self._rewind(position)
+
+    def write(self, films, checkpoint=None):
+        """
+        Writes a batch of films to the file and flushes it to disk.
+
+        Parameters:
+            films (list):           List of dicts containing information on each film.
+            checkpoint (function):  Called with the position of the end of the batch once it is on disk, before other batches
+                                    can be written (also if there are no films). None if the batch is not recorded.
+        """
+
+        with self.lock:
+            if films:
+                if self.file is None:
+                    self._open(films[0])
+
+                for film in films:
+                    self._write_film(film)
+                    self.count += 1
+
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.position = os.fstat(self.file.fileno()).st_size
+
+            if checkpoint:
+                checkpoint(self.position)
+
+    def close(self):
+        """
+        Finishes and closes the file. Nothing is written if no films were written out.
+        """
+
+        with self.lock:
+
+            # An appended file is finished again, even if no new films were written
+            if self.file is None and self._appending():
+                self._open(None)
+
+            if self.file is not None:
+                self._finish()
+                self.file.close()
+                self.file = None
+
+    def _appending(self):
+        return self.append and os.path.exists(self.outpath) and os.path.getsize(self.outpath) > 0
+
+    def _rewind(self, position):
+        # Cut the file back to the last recorded batch, a file without any recorded batch is started again
+        if not os.path.exists(self.outpath):
+            return
+        if position is not None and position < os.path.getsize(self.outpath):
+            if position == 0:
+                os.remove(self.outpath)
+                return
+            os.truncate(self.outpath, position)
+        self.position = os.path.getsize(self.outpath)
+
+    def _open(self, first_film):
+        if self._appending():
+            self._resume()
+        else:
+            self.file = open(self.outpath, "w", newline="", encoding="utf-8")
+            self._start(first_film)
+
+    def _start(self, first_film):
+        pass
+
+    def _resume(self):
+        self.file = open(self.outpath, "a", newline="", encoding="utf-8")
+
+    def _write_film(self, film):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+class CSVWriter(FilmWriter):
+    """
+    Writes the films as rows of a CSV file. The header is taken from the columns of the first film.
+    """
+
+    def _start(self, first_film):
+        self.csv_writer = csv.DictWriter(self.file, delimiter=",", fieldnames=list(first_film.keys()))
+        self.csv_writer.writeheader()
+
+    def _resume(self):
+        # Continue with the header of the existing file
+        with open(self.outpath, newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f))
+
+        super()._resume()
+        self.csv_writer = csv.DictWriter(self.file, delimiter=",", fieldnames=header)
+
+    def _write_film(self, film):
+        self.csv_writer.writerow(film)
+
+class JSONWriter(FilmWriter):
+    """
+    Writes the films as a streamed JSON array, formatted the same as 'json.dumps(films, indent=4)'.
+    The closing bracket is only written when the file is closed.
+    """
+
+    def _start(self, first_film):
+        self.file.write("[")
+        self.separator = "\n"
+
+    def _resume(self):
+        # Remove the closing bracket (if the previous run got to write it), so the array can be continued
+        with open(self.outpath, "rb+") as f:
+            tail_start = max(f.seek(0, os.SEEK_END) - 64, 0)
+            f.seek(tail_start)
+            tail = f.read().rstrip()
+            if tail.endswith(b"]"):
+                tail = tail[:-1].rstrip()
+            f.truncate(tail_start + len(tail))
+
+            # Check if the array already contains films
+            empty = tail.endswith(b"[") or tail == b""
+
+        super()._resume()
+        self.separator = "\n" if empty else ",\n"
+
+    def _write_film(self, film):
+        film_json = json.dumps(film, indent=4, ensure_ascii=False)
+        self.file.write(self.separator + "    " + film_json.replace("\n", "\n    "))
+        self.separator = ",\n"
+
+    def _finish(self):
+        self.file.write("\n]")
+
+class NDJSONWriter(FilmWriter):
+    """
+    Writes the films as newline-delimited JSON, one film object per line.
+    Every line is a complete JSON object, so the file is always readable up to the last written film.
+    """
+
+    def _write_film(self, film):
+        self.file.write(json.dumps(film, ensure_ascii=False) + "\n")
+
+def import_pyarrow():
+    """
+    Imports the optional 'pyarrow' package, which is only needed for the columnar output formats.
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        sys.exit("    The .parquet and .arrow output formats require the 'pyarrow' package. Please install it with 'pip install pyarrow' and try again.")
+    return pyarrow
+
+def film_schema(columns):
+    """
+    Returns the typed Arrow schema of the given output columns: counts, positions and IDs are integers, ratings are floats,
+    cast, genres, countries, languages and studios are lists of strings and all other columns are strings.
+    """
+
+    pa = import_pyarrow()
+
+    def column_type(column):
+        if column in LIST_COLUMNS:
+            return pa.list_(pa.string())
+        if column in INT_COLUMNS:
+            return pa.int64()
+        if column in FLOAT_COLUMNS:
+            return pa.float64()
+        return pa.string()
+
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+class ColumnarWriter(FilmWriter):
+    """
+    Base class of the columnar writers, which write the films with a fixed typed schema (see 'film_schema()').
+    A columnar file can only be read once it is finished (its footer is written last), so every batch of films
+    (i.e. every scraped page) is written to a complete part file in the '<outpath>.parts' directory as soon as it is scraped.
+    On close, the parts are merged into the output file through a temporary file, with a row group or record batch per part.
+    The parts of a run that was killed are kept, so in append mode the new films are added after them (a finished output
+    file becomes the first part). Part files and the output file are replaced atomically, so a crash never loses films that were written.
+    The position of a columnar writer is the amount of rows in its parts, the rows after the recorded position are removed when resuming.
+    """
+
+    def __init__(self, outpath, append=False, position=None):
+        self.rewind_to = None
+        super().__init__(outpath, append, position)
+        self.partdir = outpath + ".parts"
+        self.extension = os.path.splitext(outpath)[1]
+        self.parts = None
+
+    def write(self, films, checkpoint=None):
+        with self.lock:
+            # In append mode the position is only known once the parts are read
+            if self.parts is None and (films or self.append):
+                self._open(films[0] if films else None)
+
+            if films:
+                self._write_part(self.pa.Table.from_pylist(films, schema=self.schema))
+                self.count += len(films)
+                self.position += len(films)
+
+            if checkpoint:
+                checkpoint(self.position)
+
+    def close(self):
+        """
+        Merges the parts into the output file and removes them. Nothing is written if no films were written out.
+        """
+
+        with self.lock:
+
+            # An appended file is merged again, even if no new films were written
+            if self.parts is None and self.append and (self._appending() or os.path.isdir(self.partdir)):
+                self._open(None)
+
+            if self.parts is not None:
+                if self.parts:
+                    self._write_file(self.outpath, (self._read_table(path) for path in self.parts))
+                shutil.rmtree(self.partdir, ignore_errors=True)
+                self.parts = None
+
+    def _open(self, first_film):
+        self.pa = import_pyarrow()
+
+        if not self.append:
+            shutil.rmtree(self.partdir, ignore_errors=True)
+        elif os.path.isdir(self.partdir):
+            # An output file next to the parts was merged from them (the run was killed before the parts were removed)
+            if os.path.exists(self.outpath):
+                os.remove(self.outpath)
+        elif self._appending():
+            try:
+                self._read_table(self.outpath)
+            except Exception as e:
+                raise ValueError(f"The output file {self.outpath} was not finished and can not be resumed from ({e}). "
+                                 "Please scrape the list again without --resume.")
+            os.makedirs(self.partdir)
+            os.replace(self.outpath, os.path.join(self.partdir, f"{0:08d}{self.extension}"))
+
+        os.makedirs(self.partdir, exist_ok=True)
+        self.parts = sorted(os.path.join(self.partdir, name) for name in os.listdir(self.partdir) if name.endswith(self.extension))
+
+        if self.parts:
+            self.schema = film_schema(self._read_table(self.parts[0]).schema.names)
+            self._trim_parts()
+        elif first_film is not None:
+            self.schema = film_schema(list(first_film.keys()))
+
+    def _rewind(self, position):
+        # The parts are only read once the writer is opened, see '_trim_parts()'
+        self.rewind_to = position
+
+    def _trim_parts(self):
+        """
+        Removes the rows after the recorded position from the parts (they were written without being recorded in the journal),
+        and sets the position to the amount of rows that are kept.
+        """
+
+        rows, parts = 0, []
+        for path in self.parts:
+            if self.rewind_to is not None and rows >= self.rewind_to:
+                os.remove(path)
+                continue
+
+            table = self._read_table(path)
+            if self.rewind_to is not None and rows + table.num_rows > self.rewind_to:
+                table = table.slice(0, self.rewind_to - rows)
+                self._write_file(path, [table])
+            rows += table.num_rows
+            parts.append(path)
+
+        self.parts = parts
+        self.position = rows
+
+    def _write_part(self, table):
+        number = int(os.path.basename(self.parts[-1])[:8]) + 1 if self.parts else 0
+        path = os.path.join(self.partdir, f"{number:08d}{self.extension}")
+        self._write_file(path, [table])
+        self.parts.append(path)
+
+    def _write_file(self, path, tables):
+        """
+        Writes the tables to a temporary file, which replaces the file at 'path' once it is finished and flushed to disk.
+        """
+
+        temppath = path + ".tmp"
+        with open(temppath, "wb") as f:
+            table_writer = self._table_writer(f)
+            for table in tables:
+                table_writer.write_table(table.cast(self.schema))
+            table_writer.close()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temppath, path)
+
+    def _table_writer(self, f):
+        raise NotImplementedError
+
+    @staticmethod
+    def _read_table(path):
+        raise NotImplementedError
+
+class ParquetWriter(ColumnarWriter):
+    """
+    Writes the films to a Parquet file, with a row group for every scraped page.
+    """
+
+    def _table_writer(self, f):
+        return self.pa.parquet.ParquetWriter(f, self.schema)
+
+    @staticmethod
+    def _read_table(path):
+        return import_pyarrow().parquet.read_table(path)
+
+class ArrowWriter(ColumnarWriter):
+    """
+    Writes the films to an Arrow IPC file (Feather v2), with a record batch for every scraped page.
+    """
+
+    def _table_writer(self, f):
+        return self.pa.ipc.new_file(f, self.schema)
+
+    @staticmethod
+    def _read_table(path):
+        with import_pyarrow().ipc.open_file(path) as reader:
+            return reader.read_all()
+
+WRITERS = {
+    ".csv": CSVWriter,
+    ".json": JSONWriter,
+    ".ndjson": NDJSONWriter,
+    ".parquet": ParquetWriter,
+    ".arrow": ArrowWriter,
+}
+
+def open_writer(outpath, output_file_extension, append=False, position=None):
+    """
+    Returns the streaming writer that belongs to the output file extension.
+
+    Parameters:
+        outpath (str):                  The path of the output file.
+        output_file_extension (str):    Type of file outputted (".csv", ".json", ".ndjson", ".parquet" or ".arrow").
+        append (bool):                  Whether films are appended to an existing output file.
+        position (int):                 In append mode, the position in the file of the last batch that was recorded in the journal.
+
+    Returns:
+        writer (FilmWriter):    The writer of the output file.
+    """
+
+    return WRITERS[output_file_extension](outpath, append, position)
+
+def read_output(outpath, output_file_extension):
+    """
+    Reads the films of an existing output file, e.g. to compare a list with its previous scrape.
+    Films from a CSV file have string values. A JSON array that was not closed (e.g. by a crash) is closed before reading,
+    incomplete lines of an NDJSON file are skipped. Files that cannot be read give no films.
+
+    Parameters:
+        outpath (str):                  The path of the output file.
+        output_file_extension (str):    Type of the output file (".csv", ".json", ".ndjson", ".parquet" or ".arrow").
+
+    Returns:
+        films (list):   List of dicts containing information on each film, empty if the file does not exist.
+    """
+
+    if not os.path.exists(outpath):
+        return []
+
+    if issubclass(WRITERS[output_file_extension], ColumnarWriter):
+        return WRITERS[output_file_extension]._read_table(outpath).to_pylist()
+
+    with open(outpath, newline="", encoding="utf-8") as f:
+        if output_file_extension == ".csv":
+            return list(csv.DictReader(f))
+
+        if output_file_extension == ".json":
+            content = f.read().rstrip()
+            try:
+                return json.loads(content if content.endswith("]") else content.rstrip(",") + "\n]")
+            except json.JSONDecodeError:
+                return []
+
+        films = []
+        for line in f:
+            try:
+                films.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return films
@@ -0,0 +1,235 @@
+# This file contains the 'lxml' extractor backend, which extracts the film information from the raw content of the Letterboxd pages
+# Every page is parsed once, after which all information is found with precompiled XPath expressions
+# The results are identical to the (slower) BeautifulSoup functions in 'scrape_functions.py', which are kept as the reference implementation
+
+from listscraper.utility_functions import val2stars
+from lxml import etree
+import re
+
+def _has_class(name):
+    """
+    Returns an XPath condition that matches elements with 'name' as one of their classes (like 'class_=name' in BeautifulSoup).
+    """
+
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Film page
+_title_header = etree.XPath(f"(//div[{_has_class('col-17')}])[1]/descendant::h1[1]")
+_release_years = etree.XPath(f"//div[{_has_class('releaseyear')}]")
+_first_link = etree.XPath("descendant::a[1]")
+_meta_content = etree.XPath("(//meta[@name = $name])[1]")
+_cast_tab = etree.XPath("(//div[@id = 'tab-cast'])[1]")
+_links = etree.XPath("descendant::a")
+_genre_list = etree.XPath("(//div[normalize-space(@class) = 'text-sluglist capitalize'])[1]")
+_genre_links = etree.XPath(f"descendant::a[{_has_class('text-slug')}]")
+_runtime_footer = etree.XPath("(//p[normalize-space(@class) = 'text-link text-footer'])[1]")
+_details_tab = etree.XPath("(//div[@id = 'tab-details'])[1]")
+_detail_links = etree.XPath("descendant::a[contains(@href, $kind)]")
+
+# Stats and rating histogram pages
+_stat_title = etree.XPath("(//a[normalize-space(@class) = $cls])[1]/@title", smart_strings=False)
+_fans_link = etree.XPath("(//a[normalize-space(@class) = 'all-link more-link'])[1]")
+_histogram_bars = etree.XPath(f"//li[{_has_class('rating-histogram-bar')}]")
+
+# String results are returned as plain strings, so the extracted information does not keep the parsed page alive
+_text = etree.XPath("string()", smart_strings=False)
+
+def parse_html(content):
+    """
+    Parses the raw content of a Letterboxd page into an lxml tree.
+    """
+
+    return etree.HTML(content.decode("utf-8", errors="replace") if isinstance(content, bytes) else content)
+
+def _first(nodes):
+    """
+    Returns the first node of an XPath result, raises an error if nothing was found (like BeautifulSoup does when chaining on None).
+    """
+
+    if not nodes:
+        raise AttributeError("Element not found")
+    return nodes[0]
+
+def _link_text(link, tags=True):
+    """
+    Returns the text at the start of a link (the equivalent of 'str(line.contents[0])' in BeautifulSoup).
+    If the link starts with a nested tag, that tag is returned as HTML like BeautifulSoup does,
+    or an error is raised if 'tags' is False (where BeautifulSoup fails on the tag, e.g. for the languages).
+    """
+
+    if link.text is not None:
+        return link.text
+    if len(link) == 0:
+        raise IndexError("Link has no text")
+    if not tags:
+        raise TypeError("Link starts with a tag")
+    return etree.tostring(link[0], method="html", encoding=str, with_tail=False)
+
+def xpath_film_page(content, not_found):
+    """
+    Extracts the general film information (title, year, director, cast, etc.) from the raw content of the film page.
+    'lxml' version of 'parse_film_page()'.
+    """
+
+    tree = parse_html(content)
+    film_dict = {}
+
+    # Finding the film name
+    film_dict["Film_title"] = _text(_first(_title_header(tree)))
+
+    # Try to find release year, handle cases where it's missing
+    try:
+        release_years = _release_years(tree)
+        if len(release_years) > 1:
+            year_text = _text(_first(_first_link(release_years[1]))).strip()
+            release_year = int(year_text) if year_text else 0
+        else:
+            release_year = 0
+    except (AttributeError, IndexError, ValueError):
+        release_year = 0
+
+    film_dict["Release_year"] = not_found if release_year == 0 else release_year
+
+    # Try to find director, if missing insert nan
+    director = _first(_meta_content(tree, name="twitter:data1")).attrib["content"]
+    if director == "":
+        director = not_found
+    film_dict["Director"] = director
+
+    # Finding the cast, if not found insert a nan
+    try:
+        cast = [_link_text(link) for link in _links(_first(_cast_tab(tree)))]
+
+        # remove all the 'Show All...' tags if they are present
+        film_dict["Cast"] = [i for i in cast if i != 'Show All…']
+    except (AttributeError, IndexError):
+        film_dict["Cast"] = not_found
+
+    # Finding average rating, if not found insert a nan
+    try:
+        film_dict["Average_rating"] = float(_first(_meta_content(tree, name="twitter:data2")).attrib["content"][:4])
+    except (AttributeError, KeyError, ValueError):
+        film_dict["Average_rating"] = not_found
+
+    # Finding film's genres, if not found insert nan
+    try:
+        film_dict["Genres"] = [_text(genre) for genre in _genre_links(_first(_genre_list(tree)))]
+    except AttributeError:
+        film_dict["Genres"] = not_found
+
+    # Get movie runtime by searching for first sequence of digits in the p element with the runtime, if not found insert nan
+    try:
+        film_dict["Runtime"] = int(re.search(r'\d+', _text(_first(_runtime_footer(tree)))).group())
+    except AttributeError:
+        film_dict["Runtime"] = not_found
+
+    # The details tab (countries, languages and studios) is only looked up once
+    details = _details_tab(tree)
+
+    # Finding countries
+    try:
+        film_dict["Countries"] = _detail_texts(details, "country")
+        if film_dict["Countries"] == []:
+            film_dict["Countries"] = not_found
+    except (AttributeError, IndexError):
+        film_dict["Countries"] = not_found
+
+    # Finding spoken and original languages
+    try:
+        # Replace non-breaking spaces (\xa0) by a normal space
+        languages = [text.replace('\xa0', ' ') for text in _detail_texts(details, "language", tags=False)]
+        film_dict["Original_language"] = languages[0]                                      # original language (always first)
+        film_dict["Spoken_languages"] = list(sorted(set(languages), key=languages.index))   # all unique spoken languages
+    except (AttributeError, IndexError, TypeError):
+        film_dict["Original_language"] = not_found
+        film_dict["Spoken_languages"] = not_found
+
+    # Finding the description, if not found insert a nan
+    try:
+        film_dict['Description'] = _first(_meta_content(tree, name="description")).attrib["content"]
+    except (AttributeError, KeyError):
+        film_dict['Description'] = not_found
+
+    # Finding studios
+    try:
+        film_dict["Studios"] = _detail_texts(details, "studio")
+        if film_dict["Studios"] == []:
+            film_dict["Studios"] = not_found
+    except (AttributeError, IndexError):
+        film_dict["Studios"] = not_found
+
+    return film_dict
+
+def _detail_texts(details, kind, tags=True):
+    """
+    Returns the texts of the links in the details tab whose URL contains 'kind' (e.g. "country" or "studio").
+    Raises an error if the film page has no details tab, see '_link_text()' for 'tags'.
+    """
+
+    return [_link_text(link, tags) for link in _detail_links(_first(details), kind=kind)]
+
+def xpath_stats(content, not_found):
+    """
+    Extracts the number of watches, list appearances and likes from the raw content of the film's stats page.
+    'lxml' version of 'parse_stats()'.
+    """
+
+    tree = parse_html(content)
+    film_dict = {}
+
+    # Get number of people that have watched the movie, appeared in lists and liked the movie (filter out commas from large numbers)
+    for column, cls in [("Watches", "has-icon icon-watched icon-16 tooltip"),
+                        ("List_appearances", "has-icon icon-list icon-16 tooltip"),
+                        ("Likes", "has-icon icon-like icon-liked icon-16 tooltip")]:
+        title = _first(_stat_title(tree, cls=cls))
+        film_dict[column] = int(''.join(re.findall(r'\d+', title)))
+
+    return film_dict
+
+def xpath_histogram(content, not_found):
+    """
+    Extracts the number of fans and the rating histogram from the raw content of the film's rating histogram page.
+    'lxml' version of 'parse_histogram()'.
+    """
+
+    tree = parse_html(content)
+    film_dict = {}
+
+    # Get number of fans. Amount is given in 'K' notation, so if relevant rounded off to full thousands
+    try:
+        fans = _text(_first(_fans_link(tree)))
+        fans = re.findall(r'\d+.\d+K?|\d+K?', fans)[0]
+        if "." and "K" in fans:
+            fans = int(float(fans[:-1]) * 1000)
+        elif "K" in fans:
+            fans = int(fans[-1]) * 1000
+        else:
+            fans = int(fans)
+    except (AttributeError, IndexError, ValueError):
+        fans = 0
+    film_dict["Fans"] = fans
+
+    # Get rating histogram (i.e. how many star ratings were given) and total ratings (sum of rating histogram)
+    ratings = _histogram_bars(tree)
+    tot_ratings = 0
+    if len(ratings) != 0:
+        for i, r in enumerate(ratings):
+            string = _text(r).strip(" ")
+            stars = val2stars((i+1)/2, not_found)
+            if string == "":
+                film_dict[f"{stars}"] = 0
+            else:
+                Nratings = re.findall(r'\d+', string)[:-1]
+                Nratings = int(''.join(Nratings))
+                film_dict[f"{stars}"] = Nratings
+                tot_ratings += Nratings
+
+    # If the film has not been released yet (i.e. no ratings)
+    else:
+        for i in range(10):
+            stars = val2stars((i+1)/2, not_found)
+            film_dict[f"{stars}"] = 0
+
+    film_dict["Total_ratings"] = tot_ratings
+
+    return film_dict
@@ -0,0 +1,39 @@
+"""
+Shared fixtures of the behaviour tests, which scrape the local stub of Letterboxd in 'benchmarks/stub_server.py'.
+"""
+
+import functools
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_server import StubServer, StubTransport
+import listscraper.transport_class
+
+import pytest
+
+@pytest.fixture
+def stub(monkeypatch):
+    """
+    A stub server with lists of 72 films, all requests of a ScrapeInstance go to it.
+    """
+
+    server = StubServer(films_per_list=72)
+    monkeypatch.setattr(listscraper.transport_class, "Transport", functools.partial(StubTransport, server.url))
+    yield server
+    server.close()
+
+def stub_script(stub_url, args):
+    """
+    Returns the code of a Python process that runs the command line of the scraper with 'args' against the stub server.
+    """
+
+    return (f"import functools, runpy, sys\n"
+            f"sys.path.insert(0, {ROOT!r})\n"
+            f"from benchmarks.stub_server import StubTransport\n"
+            f"import listscraper.transport_class\n"
+            f"listscraper.transport_class.Transport = functools.partial(StubTransport, {stub_url!r})\n"
+            f"sys.argv = ['listscraper'] + {list(args)!r}\n"
+            f"runpy.run_module('listscraper', run_name='__main__')\n")
@@ -0,0 +1,61 @@
+"""
+Checks that a recorded response archive can be replayed, and that a recording that was stopped leaves no broken archive.
+"""
+
+from listscraper.archive_class import ResponseArchive
+import zipfile
+
+import pytest
+
+URL = "https://letterboxd.com/film/film-1/"
+
+def record(path, mode, responses, close=True):
+    archive = ResponseArchive(str(path), mode)
+    for url, (status, content) in responses.items():
+        archive.record(url, status, content)
+    if close:
+        archive.close()
+    return archive
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / "archive.zip"
+    record(path, "w", {URL: (200, b"<html>film</html>"), URL + "missing/": (404, b"")})
+    assert not (tmp_path / "archive.zip.part").exists()
+
+    archive = ResponseArchive(str(path), "r")
+    assert archive.lookup(URL) == (200, b"<html>film</html>")
+    assert archive.lookup(URL + "missing/") == (404, b"")
+    assert archive.lookup(URL + "other/") == (404, b"")
+    archive.close()
+
+def test_stopped_recording_keeps_the_previous_archive(tmp_path):
+    path = tmp_path / "archive.zip"
+    record(path, "w", {URL: (200, b"first")})
+
+    # A recording that is never closed (e.g. killed) only leaves its temporary file behind
+    stopped = record(path, "w", {URL: (200, b"second"), URL + "2/": (200, b"other")}, close=False)
+    stopped.file.flush()
+    assert ResponseArchive(str(path), "r").lookup(URL) == (200, b"first")
+
+    # Resuming the recording adds to the previous archive
+    record(path, "a", {URL + "3/": (200, b"third")})
+    with zipfile.ZipFile(path) as z:
+        assert len(z.infolist()) == 2
+    archive = ResponseArchive(str(path), "r")
+    assert archive.lookup(URL) == (200, b"first") and archive.lookup(URL + "3/") == (200, b"third")
+
+def test_resume_without_archive_records_a_new_one(tmp_path):
+    path = tmp_path / "archive.zip"
+    record(path, "a", {URL: (200, b"film")})
+    assert ResponseArchive(str(path), "r").lookup(URL) == (200, b"film")
+
+@pytest.mark.parametrize("mode", ["r", "a"])
+def test_incomplete_archive_is_reported(tmp_path, mode):
+    path = tmp_path / "archive.zip"
+    record(path, "w", {URL + f"{i}/": (200, bytes(range(256)) * 40) for i in range(5)})
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2])
+
+    with pytest.raises(SystemExit, match="incomplete"):
+        ResponseArchive(str(path), mode)
+    assert path.read_bytes() == content[:len(content) // 2]
@@ -0,0 +1,133 @@
+"""
+Checks the work queue of a distributed scrape and the dispatcher that waits for the results of the workers.
+"""
+
+from listscraper.workqueue_class import open_work_queue, SQLiteWorkQueue, MAX_ATTEMPTS
+import listscraper.distributed_class as distributed
+import concurrent.futures
+import json
+import io
+import os
+
+import pytest
+
+class FlakyQueue:
+    """
+    Work queue whose results can not be read for the first 'errors' polls.
+    """
+
+    def __init__(self, errors, results):
+        self.errors = errors
+        self.results_ = results
+        self.polls = 0
+
+    def results(self, task_ids):
+        self.polls += 1
+        if self.polls <= self.errors:
+            raise OSError("database is locked")
+        return {task_id: self.results_[task_id] for task_id in task_ids if task_id in self.results_}
+
+    def remove(self, task_ids):
+        pass
+
+    def close(self):
+        pass
+
+def wait_for(dispatcher, slug):
+    future = concurrent.futures.Future()
+    with dispatcher.lock:
+        dispatcher.futures[f"{dispatcher.run}:{slug}"] = future
+    return future
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(distributed, "POLL_INTERVAL", 0.001)
+
+def test_collector_survives_queue_errors():
+    log = io.StringIO()
+    work_queue = FlakyQueue(distributed.MAX_POLL_ERRORS - 1, {})
+    dispatcher = distributed.FilmDispatcher(work_queue, log)
+    work_queue.results_[f"{dispatcher.run}:film"] = (json.dumps({"Film_title": "Film", "Watches": 3}), None)
+
+    future = wait_for(dispatcher, "film")
+    record = future.result(timeout=10)
+    dispatcher.close()
+
+    assert record.get("Film_title") == "Film" and record.get("Watches") == 3
+    assert log.getvalue().count("Error while polling the work queue") == distributed.MAX_POLL_ERRORS - 1
+
+def test_collector_fails_waiting_films_after_repeated_errors():
+    log = io.StringIO()
+    dispatcher = distributed.FilmDispatcher(FlakyQueue(10 ** 6, {}), log)
+
+    future = wait_for(dispatcher, "film")
+    with pytest.raises(RuntimeError, match="could not be read from the work queue"):
+        future.result(timeout=10)
+    dispatcher.close()
+
+def test_invalid_result_fails_the_film():
+    dispatcher = distributed.FilmDispatcher(FlakyQueue(0, {}), io.StringIO())
+    dispatcher.work_queue.results_[f"{dispatcher.run}:film"] = ("not json", None)
+
+    with pytest.raises(RuntimeError, match="invalid result"):
+        wait_for(dispatcher, "film").result(timeout=10)
+    dispatcher.close()
+
+def test_sqlite_url_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    work_queue = open_work_queue("sqlite:///relative.db")
+    work_queue.close()
+    assert work_queue.path == "relative.db" and (tmp_path / "relative.db").exists()
+
+    absolute = tmp_path / "sub" / "absolute.db"
+    work_queue = open_work_queue(f"sqlite:///{absolute}")
+    work_queue.close()
+    assert work_queue.path == str(absolute) and absolute.exists()
+
+    work_queue = open_work_queue("plain.db")
+    work_queue.close()
+    assert isinstance(work_queue, SQLiteWorkQueue) and (tmp_path / "plain.db").exists()
+
+@pytest.mark.parametrize("url", ["sqlite://queue.db", "sqlite:///"])
+def test_invalid_sqlite_urls(url):
+    with pytest.raises(SystemExit):
+        open_work_queue(url)
+
+def test_expired_lease_is_given_to_another_worker(tmp_path):
+    work_queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    work_queue.push([("run:film", "payload")])
+
+    # A negative lease has expired as soon as it is taken, like the lease of a worker that crashed
+    assert work_queue.lease("crashed", -1) == ("run:film", "payload")
+    assert work_queue.lease("worker", 300) == ("run:film", "payload")
+    assert work_queue.lease("other", 300) is None
+
+    work_queue.complete("run:film", "result")
+    assert work_queue.results(["run:film"]) == {"run:film": ("result", None)}
+    work_queue.close()
+
+def test_lease_expires_too_often(tmp_path):
+    work_queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    work_queue.push([("run:film", "payload")])
+
+    for _ in range(MAX_ATTEMPTS):
+        assert work_queue.lease("crashed", -1) is not None
+        assert work_queue.results(["run:film"]) == {}
+
+    assert work_queue.lease("worker", 300) is None
+    assert work_queue.results(["run:film"]) == {"run:film": (None, f"the lease of the task expired {MAX_ATTEMPTS} times")}
+    work_queue.close()
+
+def test_failed_task_is_retried_until_the_limit(tmp_path):
+    work_queue = SQLiteWorkQueue(str(tmp_path / "queue.db"))
+    work_queue.push([("run:film", "payload")])
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        assert work_queue.lease("worker", 300) == ("run:film", "payload")
+        work_queue.fail("run:film", f"error {attempt}")
+        finished = work_queue.results(["run:film"])
+        assert finished == ({} if attempt < MAX_ATTEMPTS else {"run:film": (None, f"error {MAX_ATTEMPTS}")})
+
+    assert work_queue.lease("worker", 300) is None
+    work_queue.close()
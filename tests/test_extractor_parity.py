@@ -0,0 +1,76 @@
+"""
+Checks that the 'lxml' extractor backend gives the same results as the BeautifulSoup reference backend ('bs4')
+on the saved HTML fixtures in 'benchmarks/fixtures', and on variants of the film page with nested and missing tags.
+"""
+
+from listscraper.scrape_functions import EXTRACTORS
+import pathlib
+import math
+import re
+
+import pytest
+
+FIXTURES = pathlib.Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures"
+
+# The not-found values of the CSV output (NaN) and of the other outputs (None)
+NOT_FOUND = [float("nan"), None]
+
+def read_fixture(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+def same(a, b):
+    """
+    Compares two extracted values, NaN is equal to NaN (so the not-found values of the CSV output compare equal).
+    """
+
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    return type(a) == type(b) and a == b
+
+def assert_parity(kind, content, not_found):
+    lxml_result = EXTRACTORS["lxml"][kind](content, not_found)
+    bs4_result = EXTRACTORS["bs4"][kind](content, not_found)
+
+    assert list(lxml_result) == list(bs4_result)
+    for column in bs4_result:
+        assert same(lxml_result[column], bs4_result[column]), f"{column}: lxml {lxml_result[column]!r} != bs4 {bs4_result[column]!r}"
+
+@pytest.mark.parametrize("not_found", NOT_FOUND)
+@pytest.mark.parametrize("kind, name", [("film", "film.html"), ("stats", "stats.html"), ("histogram", "histogram.html")])
+def test_fixture_parity(kind, name, not_found):
+    assert_parity(kind, read_fixture(name), not_found)
+
+@pytest.mark.parametrize("not_found", NOT_FOUND)
+def test_fixture_parity_bytes(not_found):
+    # The transport hands raw bytes to the extractors
+    assert_parity("film", read_fixture("film.html").encode("utf-8"), not_found)
+
+# Variants of the film page: (description, pattern, replacement)
+FILM_VARIANTS = [
+    ("nested tags in detail links", r'class="text-slug">USA</a>', 'class="text-slug"><span class="flag">USA</span> (US)</a>'),
+    ("nested tag in a studio link", r'class="text-slug">Castle Rock Entertainment</a>', 'class="text-slug"><b>Castle Rock</b> Entertainment</a>'),
+    ("nested tag in a language link", r'class="text-slug">English</a>', 'class="text-slug"><i>English</i></a>'),
+    ("nested tag in a cast link", r'(<div id="tab-cast".*?<a[^>]*>)([^<]+)(</a>)', r'\1<span>\2</span>\3'),
+    ("no details tab", r'id="tab-details"', 'id="tab-other"'),
+    ("no cast tab", r'id="tab-cast"', 'id="tab-other"'),
+    ("no genres", r'text-sluglist capitalize', 'text-sluglist'),
+    ("no runtime", r'text-link text-footer', 'text-footer'),
+    ("no release year", r'releaseyear', 'year'),
+    ("no average rating", r'name="twitter:data2"', 'name="twitter:other"'),
+    ("no description", r'name="description"', 'name="other"'),
+]
+
+@pytest.mark.parametrize("not_found", NOT_FOUND)
+@pytest.mark.parametrize("description, pattern, replacement", FILM_VARIANTS, ids=[variant[0] for variant in FILM_VARIANTS])
+def test_film_variant_parity(description, pattern, replacement, not_found):
+    content, count = re.subn(pattern, replacement, read_fixture("film.html"), count=1, flags=re.S)
+    assert count == 1, f"the fixture has no match for the variant '{description}'"
+    assert_parity("film", content, not_found)
+
+@pytest.mark.parametrize("not_found", NOT_FOUND)
+def test_histogram_without_fans_parity(not_found):
+    content, count = re.subn(r'all-link more-link', 'all-link', read_fixture("histogram.html"))
+    assert count >= 1
+    assert_parity("histogram", content, not_found)
@@ -0,0 +1,50 @@
+"""
+Checks that the '--incremental' mode only scrapes the films that were added to a list since the previous run, leaves out
+the films that were removed and keeps the order of the list.
+"""
+
+from listscraper.instance_class import ScrapeInstance
+from listscraper.writer_class import read_output
+import importlib.util
+import os
+
+import pytest
+
+EXTENSIONS = [".csv", ".json"] + ([".parquet"] if importlib.util.find_spec("pyarrow") else [])
+
+def scrape(stub, output_path, extension, **options):
+    options = {"fields": "title,watches", "no_cache": True, "incremental": True, **options}
+    return ScrapeInstance([stub.list_url(0)], "*", None, str(output_path), extension, None, False, True, 1, 2, **options)
+
+def slugs(output_path, extension):
+    return [film["Film_URL"].split('/')[-2] for film in read_output(os.path.join(output_path, "list-0" + extension), extension)]
+
+def film_requests(stub):
+    return sorted(path.split('/')[2] for path in stub.paths if path.startswith("/film/"))
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_added_and_removed_films(stub, tmp_path, extension):
+    stub.list_films[0] = list(range(100))
+    scrape(stub, tmp_path, extension)
+    assert slugs(tmp_path, extension) == [f"film-0-{i}" for i in range(100)]
+
+    # Films 10-19 are removed, 100-104 are added at the front and 105-109 in the middle
+    stub.list_films[0] = [100, 101, 102, 103, 104] + list(range(10)) + list(range(105, 110)) + list(range(20, 100))
+    stub.paths.clear()
+    scrape(stub, tmp_path, extension)
+
+    assert slugs(tmp_path, extension) == [f"film-0-{i}" for i in stub.list_films[0]]
+    assert film_requests(stub) == sorted(f"film-0-{i}" for i in range(100, 110))
+    assert not os.path.exists(os.path.join(tmp_path, "list-0" + extension + ".part"))
+
+def test_unchanged_list_makes_no_film_requests(stub, tmp_path):
+    scrape(stub, tmp_path, ".csv")
+    with open(os.path.join(tmp_path, "list-0.csv"), "rb") as f:
+        previous = f.read()
+
+    stub.paths.clear()
+    scrape(stub, tmp_path, ".csv")
+
+    assert film_requests(stub) == []
+    with open(os.path.join(tmp_path, "list-0.csv"), "rb") as f:
+        assert f.read() == previous
@@ -0,0 +1,44 @@
+"""
+Checks the retry delays and the adaptive limit of requests in flight of the rate limiter.
+"""
+
+from listscraper.ratelimit_class import RateLimiter, retry_delay
+import email.utils
+import time
+import io
+
+import pytest
+
+@pytest.mark.parametrize("retry_after, delay", [("3", 3.0), ("0.5", 0.5), ("0", 0.0), ("-5", 0.0), ("-0.1", 0.0), ("1000", 300.0)])
+def test_numeric_retry_after(retry_after, delay):
+    assert retry_delay(0, retry_after) == delay
+
+@pytest.mark.parametrize("retry_after", ["nan", "NaN", "inf", "-inf", "soon", ""])
+def test_invalid_retry_after_falls_back_to_backoff(retry_after):
+    for attempt in range(8):
+        delay = retry_delay(attempt, retry_after, base=1.0, cap=60.0)
+        assert 0.0 <= delay <= min(60.0, 2 ** attempt)
+
+def test_date_retry_after():
+    assert 8.0 < retry_delay(0, email.utils.formatdate(time.time() + 10, usegmt=True)) <= 10.0
+    assert retry_delay(0, email.utils.formatdate(time.time() - 10, usegmt=True)) == 0.0
+
+def test_delays_can_be_slept():
+    for retry_after in ["-1", "nan", None]:
+        time.sleep(min(retry_delay(0, retry_after, base=0.001), 0.01))
+
+def test_throttling_is_reported_to_the_log(capsys):
+    log = io.StringIO()
+    limiter = RateLimiter(adaptive=True, max_inflight=8, log=log)
+    limiter.record(throttled=True)
+
+    assert limiter.inflight_limit == 4
+    assert "Throttled by Letterboxd, lowering to 4" in log.getvalue()
+    assert capsys.readouterr().out == ""
+
+def test_adaptive_limit_is_raised_after_successes():
+    limiter = RateLimiter(adaptive=True, max_inflight=8, log=io.StringIO())
+    limiter.record(throttled=True)
+    for _ in range(4):
+        limiter.record(throttled=False)
+    assert limiter.inflight_limit == 5
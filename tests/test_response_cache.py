@@ -0,0 +1,68 @@
+"""
+Checks that pages which did not change since the previous run are requested conditionally and served from the response cache.
+"""
+
+from listscraper.instance_class import ScrapeInstance
+from listscraper.cache_class import ResponseCache
+from listscraper.writer_class import read_output
+import os
+
+import pytest
+
+def scrape(stub, output_path, cache_dir, **options):
+    ScrapeInstance([stub.list_url(0)], "*", None, str(output_path), ".json", None, False, True, 2, 2, cache_dir=str(cache_dir), **options)
+    return read_output(os.path.join(output_path, "list-0.json"), ".json")
+
+def test_not_modified_pages_are_reused(stub, tmp_path):
+    stub.etags = True
+    stub.films_per_list = 100
+
+    first = scrape(stub, tmp_path / "first", tmp_path / "cache")
+    assert stub.not_modified == 0
+
+    # The film information is still cached, the expired stats and the list pages are requested conditionally
+    paths = dict(stub.paths)
+    second = scrape(stub, tmp_path / "second", tmp_path / "cache", stats_ttl=0)
+    requested = {path for path, count in stub.paths.items() if count > paths.get(path, 0)}
+
+    assert second == first
+    assert not any(path.startswith("/film/") for path in requested)
+    assert {"/bench/list/list-0/", "/bench/list/list-0/page/2/", "/csi/film/film-0-0/stats/"} <= requested
+    assert stub.not_modified == len(requested)
+
+def test_changed_page_is_downloaded_again(stub, tmp_path):
+    stub.etags = True
+    stub.films_per_list = 10
+    first = scrape(stub, tmp_path / "first", tmp_path / "cache")
+
+    # A changed list page has a new ETag, so it is downloaded in full instead of served from the cache
+    stub.list_films = {0: list(range(5, 15))}
+    not_modified = stub.not_modified
+    second = scrape(stub, tmp_path / "second", tmp_path / "cache")
+
+    assert stub.not_modified == not_modified
+    assert [film["Film_URL"] for film in second] == [f"https://letterboxd.com/film/film-0-{i}/" for i in range(5, 15)]
+    assert second[:5] == first[5:]
+
+def test_without_etags_nothing_is_cached(stub, tmp_path):
+    stub.films_per_list = 10
+    scrape(stub, tmp_path / "first", tmp_path / "cache")
+    scrape(stub, tmp_path / "second", tmp_path / "cache", stats_ttl=0)
+    assert stub.not_modified == 0
+
+    responses = ResponseCache(str(tmp_path / "cache"))
+    assert responses.validators(stub.list_url(0)) == {}
+    responses.close()
+
+def test_response_without_validators_is_removed(tmp_path):
+    responses = ResponseCache(str(tmp_path))
+    url = "https://letterboxd.com/film/film-1/"
+
+    responses.put(url, {"ETag": '"1"'}, b"first")
+    assert responses.validators(url) == {"If-None-Match": '"1"'} and responses.get(url) == b"first"
+
+    # The page came back without validators, the cached body is outdated
+    responses.put(url, {}, b"second")
+    assert responses.validators(url) == {} and responses.get(url) is None
+    assert responses.size == 0
+    responses.close()
@@ -0,0 +1,100 @@
+"""
+Checks that a scrape that was killed in the middle of a list can be resumed with '--resume', and that the resumed output
+is the same as the output of a complete run (no films are missing or written twice).
+"""
+
+from listscraper.instance_class import ScrapeInstance
+from listscraper.writer_class import read_output
+from conftest import stub_script
+import importlib.util
+import subprocess
+import signal
+import sys
+import time
+import os
+
+import pytest
+
+EXTENSIONS = [".csv", ".json", ".ndjson"] + ([".parquet", ".arrow"] if importlib.util.find_spec("pyarrow") else [])
+
+def scrape(stub, output_path, extension, **options):
+    options = {"fields": "title,watches", "no_cache": True, **options}
+    return ScrapeInstance([stub.list_url(0)], "*", None, str(output_path), extension, None, False, True, 1, 2, **options)
+
+def slugs(output_path, extension):
+    return [film["Film_URL"].split('/')[-2] for film in read_output(os.path.join(output_path, "list-0" + extension), extension)]
+
+def kill_after_pages(stub, output_path, extension, pages):
+    """
+    Runs the scraper in another process and kills it (SIGKILL) once 'pages' pages were recorded in the journal.
+    """
+
+    args = ["-op", str(output_path), "-ofe", extension, "--fields", "title,watches", "--threads", "1", "--film-threads", "2",
+            "--no-cache", "--quiet", stub.list_url(0)]
+    process = subprocess.Popen([sys.executable, "-c", stub_script(stub.url, args)], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    journal = os.path.join(output_path, ".listscraper_journal.jsonl")
+    deadline = time.time() + 60
+    try:
+        while time.time() < deadline and process.poll() is None:
+            if os.path.exists(journal):
+                with open(journal, encoding="utf-8") as f:
+                    if len(f.readlines()) >= pages:
+                        break
+            time.sleep(0.01)
+        assert process.poll() is None, f"the scrape finished before it could be killed: {process.stderr.read().decode()}"
+        os.kill(process.pid, signal.SIGKILL)
+    finally:
+        process.wait()
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_resume_after_kill(stub, tmp_path, extension):
+    stub.films_per_list = 72 * 4
+    stub.latency = 0.01
+    kill_after_pages(stub, tmp_path / "killed", extension, 2)
+
+    stub.latency = 0
+    requests = stub.requests
+    scrape(stub, tmp_path / "killed", extension, resume=True)
+    resumed_requests = stub.requests - requests
+
+    requests = stub.requests
+    scrape(stub, tmp_path / "full", extension)
+    full_requests = stub.requests - requests
+
+    expected = [f"film-0-{i}" for i in range(72 * 4)]
+    assert slugs(tmp_path / "full", extension) == expected
+    assert slugs(tmp_path / "killed", extension) == expected
+    assert read_output(str(tmp_path / "killed" / f"list-0{extension}"), extension) == read_output(str(tmp_path / "full" / f"list-0{extension}"), extension)
+
+    # The recorded pages were not scraped again, and the journal and parts of the killed run are removed
+    assert resumed_requests < full_requests
+    assert sorted(os.listdir(tmp_path / "killed")) == [f"list-0{extension}"]
+
+def test_resume_after_failed_page(stub, tmp_path):
+    stub.films_per_list = 72 * 3
+    stub.failing = {"/bench/list/list-0/page/3/"}
+    with pytest.raises(SystemExit, match="--resume"):
+        scrape(stub, tmp_path, ".csv", retries=0)
+    assert slugs(tmp_path, ".csv") == [f"film-0-{i}" for i in range(72 * 2)]
+
+    stub.failing = set()
+    paths = dict(stub.paths)
+    scrape(stub, tmp_path, ".csv", resume=True)
+    assert slugs(tmp_path, ".csv") == [f"film-0-{i}" for i in range(72 * 3)]
+
+    # Only the failed page (and its films) are requested again
+    requested = {path for path, count in stub.paths.items() if count > paths.get(path, 0)}
+    assert "/bench/list/list-0/" not in requested and "/bench/list/list-0/page/2/" not in requested
+    assert "/film/film-0-0/" not in requested and "/film/film-0-200/" in requested
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_resume_with_page_selection(stub, tmp_path, extension):
+    stub.films_per_list = 72 * 4
+    stub.failing = {"/bench/list/list-0/page/4/"}
+    with pytest.raises(SystemExit):
+        ScrapeInstance([stub.list_url(0)], "1,2,4", None, str(tmp_path), extension, None, False, True, 1, 2, fields="title", no_cache=True, retries=0)
+
+    stub.failing = set()
+    ScrapeInstance([stub.list_url(0)], "1,2,4", None, str(tmp_path), extension, None, False, True, 1, 2, fields="title", no_cache=True, resume=True)
+    assert slugs(tmp_path, extension) == [f"film-0-{i}" for i in list(range(144)) + list(range(216, 288))]
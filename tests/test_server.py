@@ -0,0 +1,150 @@
+"""
+Checks that the jobs of the serve mode can only write their output inside the output root of the server.
+"""
+
+from listscraper.server_class import parse_job_arguments, ScrapeServer
+from listscraper.instance_class import ScrapeResources
+from listscraper.cli import serve_arguments
+import urllib.request
+import urllib.error
+import json
+import threading
+import time
+import os
+
+import pytest
+
+LIST_URL = "https://letterboxd.com/user/list/films/"
+
+def test_default_output_path_is_the_root(tmp_path):
+    job_args = parse_job_arguments([LIST_URL], output_root=str(tmp_path))
+    assert job_args.output_path == os.path.realpath(tmp_path)
+
+def test_output_path_inside_the_root(tmp_path):
+    job_args = parse_job_arguments([LIST_URL, "-op", "sub"], output_root=str(tmp_path))
+    assert job_args.output_path == os.path.join(os.path.realpath(tmp_path), "sub")
+
+@pytest.mark.parametrize("output_path", ["/tmp/escaped", "..", "sub/../../x"])
+def test_output_path_outside_the_root(tmp_path, output_path):
+    with pytest.raises(ValueError, match="-op"):
+        parse_job_arguments([LIST_URL, "-op", output_path], output_root=str(tmp_path))
+
+@pytest.mark.parametrize("output_name", ["films", "sub/films", "x/../films"])
+def test_output_name_inside_the_root(tmp_path, output_name):
+    job_args = parse_job_arguments([LIST_URL, "-on", output_name], output_root=str(tmp_path))
+    assert job_args.output_name == output_name
+
+@pytest.mark.parametrize("output_name", ["/tmp/escaped", "../x", "../../x", "sub/../../x", ".."])
+def test_output_name_outside_the_root(tmp_path, output_name):
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([LIST_URL, "-on", output_name], output_root=str(tmp_path))
+
+def test_output_name_outside_the_output_path(tmp_path):
+    # An -on that leaves the -op of the job is fine, as long as it stays inside the root
+    parse_job_arguments([LIST_URL, "-op", "sub", "-on", "../films"], output_root=str(tmp_path))
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([LIST_URL, "-op", "sub", "-on", "../../films"], output_root=str(tmp_path))
+
+def test_output_name_through_a_symlink(tmp_path):
+    (tmp_path / "root").mkdir()
+    (tmp_path / "root" / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([LIST_URL, "-on", "link/escaped"], output_root=str(tmp_path / "root"))
+
+@pytest.mark.parametrize("flag", ["-on", "--output_name"])
+@pytest.mark.parametrize("output_name", ["/tmp/escaped", "../x"])
+def test_line_output_name_outside_the_root(tmp_path, flag, output_name):
+    lines = [f"{LIST_URL} -p 1", f"{LIST_URL} {flag} {output_name}"]
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([], lines, output_root=str(tmp_path))
+
+def test_line_output_names_inside_the_root(tmp_path):
+    lines = ["# a comment with -on ../x", "", f"{LIST_URL} -on films", f"{LIST_URL} -p 1 -on sub/other"]
+    job_args = parse_job_arguments([], lines, output_root=str(tmp_path))
+    assert job_args.file.read().splitlines() == lines
+
+def test_line_without_output_name_value(tmp_path):
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([], [f"{LIST_URL} -on"], output_root=str(tmp_path))
+
+@pytest.mark.parametrize("output_name", ["/tmp/escaped", "../x"])
+def test_concat_output_name_outside_the_root(tmp_path, output_name):
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments([LIST_URL, LIST_URL, "--concat", "-on", output_name], output_root=str(tmp_path))
+
+def test_concat_output_name_inside_the_root(tmp_path):
+    job_args = parse_job_arguments([LIST_URL, LIST_URL, "--concat", "-on", "all"], output_root=str(tmp_path))
+    assert job_args.concat and job_args.output_name == "all"
+
+def test_user_directory_outside_the_root(tmp_path):
+    # The lists of a user are written to a directory named after the user
+    parse_job_arguments(["https://letterboxd.com/user/lists/"], output_root=str(tmp_path))
+    with pytest.raises(ValueError, match="output name"):
+        parse_job_arguments(["https://letterboxd.com/../lists/"], output_root=str(tmp_path))
+
+def test_file_option_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="-f"):
+        parse_job_arguments(["-f", "/etc/passwd"], output_root=str(tmp_path))
+
+def test_server_options_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="--threads"):
+        parse_job_arguments([LIST_URL, "--threads", "8"], output_root=str(tmp_path))
+
+@pytest.fixture
+def server(stub, tmp_path):
+    """
+    A server on a free port whose jobs scrape the stub server and write in 'tmp_path / "root"'.
+    """
+
+    args = serve_arguments(["--port", "0", "--output-root", str(tmp_path / "root"), "--no-cache", "--film-threads", "2"])
+    resources = ScrapeResources(args.threads, args.film_threads, args.engine, args.max_requests, args.per_host, None,
+                                args.cache_ttl, args.stats_ttl, args.cache_size, args.rate, args.retries, args.adaptive, args.timeout,
+                                args.parser, args.parse_workers, None, None, args.replay_latency, True)
+    server = ScrapeServer(resources, args.host, args.port, output_root=args.output_root)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.close()
+    resources.close()
+
+def post_job(server, body):
+    request = urllib.request.Request(server.address + "jobs", json.dumps(body).encode(), {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+def wait_for_job(server, job_id):
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        with urllib.request.urlopen(f"{server.address}jobs/{job_id}") as response:
+            report = json.load(response)
+        if report["status"] in ("finished", "failed"):
+            return report
+        time.sleep(0.05)
+    raise TimeoutError(f"job {job_id} did not finish")
+
+@pytest.mark.parametrize("body", [{"args": ["LIST", "-on", "../escaped"]},
+                                  {"args": ["LIST", "-op", "../escaped"]},
+                                  {"args": ["LIST", "LIST", "--concat", "-on", "/tmp/escaped"]},
+                                  {"lines": ["LIST -on ../escaped"]}])
+def test_job_outside_the_root_is_rejected(server, stub, tmp_path, body):
+    body = {key: [value.replace("LIST", stub.list_url(0)) for value in values] for key, values in body.items()}
+    status, report = post_job(server, body)
+
+    assert status == 400 and "root" in report["error"]
+    assert server.jobs == {} and stub.requests == 0
+    assert not os.path.exists(tmp_path / "escaped")
+
+def test_job_writes_inside_the_root(server, stub, tmp_path):
+    status, report = post_job(server, {"args": [stub.list_url(0), "-op", "sub", "-on", "films", "--fields", "title"]})
+    assert status == 202
+
+    report = wait_for_job(server, report["id"])
+    assert report["status"] == "finished" and report["files"] == ["films.csv"] and report["films"] == 72
+    assert os.path.isfile(tmp_path / "root" / "sub" / "films.csv")
+
+    with urllib.request.urlopen(f"{server.address}jobs/{report['id']}/files/films.csv") as response:
+        assert response.read() == (tmp_path / "root" / "sub" / "films.csv").read_bytes()
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"{server.address}jobs/{report['id']}/files/..%2F..%2F..%2Fescaped")
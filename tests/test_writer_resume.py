@@ -0,0 +1,163 @@
+"""
+Checks that an output file is resumed after the last page that was recorded in the journal: films that were written
+(or partly written) after it by a run that was killed are removed, so they are not written twice.
+"""
+
+from listscraper.writer_class import open_writer, read_output
+from listscraper.journal_class import Journal
+import importlib.util
+import os
+
+import pytest
+
+EXTENSIONS = [".csv", ".json", ".ndjson"] + ([".parquet", ".arrow"] if importlib.util.find_spec("pyarrow") else [])
+
+def films(start, stop):
+    return [{"Film_title": f"Film {i}", "Release_year": 2000 + i, "Watches": i * 10, "Film_URL": f"https://letterboxd.com/film/film-{i}/"}
+            for i in range(start, stop)]
+
+def normalize(rows):
+    # CSV output is read back as strings
+    return [{column: str(value) for column, value in row.items()} for row in rows]
+
+def write_page(writer, journal, page, page_films):
+    def checkpoint(position):
+        journal.record_page("list", f"page/{page}/", f"page/{page + 1}/", [film["Film_URL"].split('/')[-2] for film in page_films], position)
+    writer.write(page_films, checkpoint)
+
+def resume(tmp_path, extension):
+    journal = Journal(str(tmp_path), resume=True)
+    entry = journal.entry("list")
+    return journal, open_writer(str(tmp_path / f"list{extension}"), extension, entry is not None, entry and entry["position"])
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_unrecorded_page_is_removed(tmp_path, extension):
+    outpath = tmp_path / f"list{extension}"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), extension)
+    write_page(writer, journal, 1, films(0, 3))
+    write_page(writer, journal, 2, films(3, 6))
+
+    # The run is killed after page 3 was written, but before it was recorded
+    writer.write(films(6, 9))
+    if extension in {".csv", ".json", ".ndjson"}:
+        writer.file.close()
+        with open(outpath, "a", encoding="utf-8") as f:
+            f.write('Film 9,20')
+    journal.close()
+
+    journal, writer = resume(tmp_path, extension)
+    assert journal.entry("list")["films"] == {f"film-{i}" for i in range(6)}
+    write_page(writer, journal, 3, films(6, 9))
+    writer.close()
+
+    assert normalize(read_output(str(outpath), extension)) == normalize(films(0, 9))
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_finished_file_is_resumed_after_the_recorded_pages(tmp_path, extension):
+    # A list that failed is still finished (closed), the pages after the last recorded one are removed when resuming
+    outpath = tmp_path / f"list{extension}"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), extension)
+    write_page(writer, journal, 1, films(0, 3))
+    writer.write(films(3, 5))
+    writer.close()
+    journal.close()
+
+    journal, writer = resume(tmp_path, extension)
+    write_page(writer, journal, 2, films(3, 6))
+    writer.close()
+
+    assert normalize(read_output(str(outpath), extension)) == normalize(films(0, 6))
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_nothing_recorded_starts_again(tmp_path, extension):
+    outpath = tmp_path / f"list{extension}"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), extension)
+    writer.write(films(0, 3))
+    writer.close()
+    journal.close()
+
+    # The list was started (e.g. it has a journal entry as a finished list without films), but none of its pages were recorded
+    journal = Journal(str(tmp_path), resume=True)
+    writer = open_writer(str(outpath), extension, True, 0)
+    write_page(writer, journal, 1, films(0, 2))
+    writer.close()
+
+    assert normalize(read_output(str(outpath), extension)) == normalize(films(0, 2))
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_empty_page_keeps_the_position(tmp_path, extension):
+    # A resumed page whose films were all written before is recorded with the position of the end of the file
+    outpath = tmp_path / f"list{extension}"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), extension)
+    write_page(writer, journal, 1, films(0, 3))
+    position = journal.entry("list")["position"]
+    journal.close()
+
+    journal, writer = resume(tmp_path, extension)
+    write_page(writer, journal, 2, [])
+    assert journal.entry("list")["position"] == position
+    writer.close()
+    journal.close()
+
+    journal, writer = resume(tmp_path, extension)
+    writer.close()
+    assert normalize(read_output(str(outpath), extension)) == normalize(films(0, 3))
+
+def test_concatenated_lists_share_the_positions(tmp_path):
+    outpath = tmp_path / "all.csv"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), ".csv")
+    for key, page_films in [("a", films(0, 2)), ("b", films(2, 4)), ("a", films(4, 6))]:
+        writer.write(page_films, lambda position, key=key, page_films=page_films: journal.record_page(key, "page", None, [film["Film_URL"].split('/')[-2] for film in page_films], position))
+    writer.write(films(6, 8))
+    writer.close()
+    journal.close()
+
+    journal = Journal(str(tmp_path), resume=True)
+    position = max(journal.entry(key)["position"] for key in ["a", "b"])
+    writer = open_writer(str(outpath), ".csv", True, position)
+    writer.close()
+
+    assert normalize(read_output(str(outpath), ".csv")) == normalize(films(0, 6))
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="requires pyarrow")
+def test_parquet_parts_are_merged_on_close(tmp_path):
+    import pyarrow.parquet
+
+    outpath = tmp_path / "list.parquet"
+    writer = open_writer(str(outpath), ".parquet")
+    for start in range(0, 9, 3):
+        writer.write(films(start, start + 3))
+
+    # Every batch is a complete part file, the output file is only written when the writer is closed
+    parts = sorted(os.listdir(tmp_path / "list.parquet.parts"))
+    assert parts == ["00000000.parquet", "00000001.parquet", "00000002.parquet"]
+    assert all(pyarrow.parquet.read_table(tmp_path / "list.parquet.parts" / part).num_rows == 3 for part in parts)
+    assert not outpath.exists()
+
+    writer.close()
+    assert sorted(os.listdir(tmp_path)) == ["list.parquet"]
+    assert pyarrow.parquet.ParquetFile(outpath).num_row_groups == 3
+    assert read_output(str(outpath), ".parquet") == films(0, 9)
+
+@pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="requires pyarrow")
+def test_parquet_parts_of_a_killed_merge(tmp_path):
+    # A run that was killed after the merge, but before the parts were removed, is merged again from its parts
+    outpath = tmp_path / "list.parquet"
+    journal = Journal(str(tmp_path))
+    writer = open_writer(str(outpath), ".parquet")
+    write_page(writer, journal, 1, films(0, 3))
+    write_page(writer, journal, 2, films(3, 6))
+    writer._write_file(str(outpath), [writer._read_table(path) for path in writer.parts])
+    journal.close()
+
+    journal, writer = resume(tmp_path, ".parquet")
+    write_page(writer, journal, 3, films(6, 9))
+    writer.close()
+
+    assert sorted(os.listdir(tmp_path)) == [".listscraper_journal.jsonl", "list.parquet"]
+    assert read_output(str(outpath), ".parquet") == films(0, 9)